@@ -0,0 +1,53 @@
+import json
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """PostgreSQL's row estimate for a queryset, or None on other databases.
+
+    An unfiltered table uses pg_class.reltuples, kept current by
+    autovacuum/ANALYZE; a filtered queryset uses the planner's estimate from
+    EXPLAIN. Neither reads the rows.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            # -1 until the table is first analyzed
+            return row[0] if row and row[0] >= 0 else None
+        sql, params = queryset.order_by().query.get_compiler(using=queryset.db).as_sql()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that does not COUNT(*) large results.
+
+    When the estimate is at least ADMIN_EXACT_COUNT_THRESHOLD rows it is used
+    as the count; smaller results, and databases without estimates, are
+    counted exactly. Past the real end of a large result, pages are empty.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_THRESHOLD:
+            return super().count
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist defaults for tables with millions of rows: estimated page
+    counts and no second count of the unfiltered table"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
\ No newline at end of file
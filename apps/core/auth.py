@@ -0,0 +1,28 @@
+import jwt
+from django.conf import settings
+
+
+def get_request_user_data(request):
+    """user_data set by JWTAuthenticationMiddleware, or None for anonymous requests.
+
+    Works with both Django and DRF requests (DRF proxies unknown attributes to
+    the wrapped Django request).
+    """
+    return getattr(request, 'user_data', None)
+
+
+def is_partner(request):
+    user_data = get_request_user_data(request)
+    return bool(user_data) and user_data.get('role') == 'Partner'
+
+
+def get_token_user_id(request):
+    """user_id from the request's bearer token if its signature is valid, else
+    None. The user is not looked up - for views the JWT middleware skips."""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        return str(jwt.decode(header[len('Bearer '):], settings.JWT_SECRET, algorithms=['HS256'])['user_id'])
+    except (jwt.InvalidTokenError, KeyError):
+        return None
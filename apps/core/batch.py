@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from .querybudget import QueryInspector, get_budget, report
+
+logger = logging.getLogger(__name__)
+
+# Request headers a sub-request does not inherit from the batch call
+BODY_META = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'wsgi.input', 'HTTP_IDEMPOTENCY_KEY')
+# URL names answering GET with files or documentation rather than JSON. They
+# are refused before anything runs: their output could not be returned, and
+# building it (e.g. an export, which also spends the caller's rate budget)
+# would be wasted
+NOT_JSON = frozenset({'export_requests', 'export_report_pack', 'request_attachment', 'schema', 'swagger-ui', 'redoc'})
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+class BatchError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def get_pool():
+    """This process's sub-request threads, started on first use"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(settings.BATCH_WORKERS, thread_name_prefix='batch')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def prepare(request, item):
+    """Resolve one sub-request to (view, args, kwargs, HttpRequest).
+
+    Only GETs of JSON endpoints under /api/ are allowed. The sub-request carries the batch
+    call's headers and the user it was authenticated as, so views see the
+    same caller without the token being checked again.
+    """
+    path, _, query = item['path'].partition('?')
+    if not path.startswith('/api/'):
+        raise BatchError(f'{item["path"]}: only /api/ paths can be batched')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        raise BatchError(f'{item["path"]}: not found', status.HTTP_404_NOT_FOUND)
+    if match.url_name == 'batch':
+        raise BatchError('Batch calls cannot be nested')
+    if match.url_name in NOT_JSON:
+        raise BatchError(f'{item["path"]}: response is not JSON; request it directly')
+
+    params = QueryDict(query, mutable=True)
+    for key, value in item.get('params', {}).items():
+        params.setlist(key, [str(v) for v in value] if isinstance(value, list) else [str(value)])
+
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {key: value for key, value in request.META.items() if key not in BODY_META}
+    sub.META.update({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': params.urlencode()})
+    sub.GET = params
+    sub.resolver_match = match
+    sub.user_data = getattr(request, 'user_data', None)
+    return match.func, match.args, match.kwargs, sub
+
+
+def dispatch(view, args, kwargs, sub):
+    """Run one sub-request's view and return (status, body)"""
+    close_old_connections()
+    inspector = QueryInspector()
+    try:
+        if settings.QUERY_BUDGET_ENABLED:
+            # Worker threads use their own connections, out of sight of
+            # QueryBudgetMiddleware, so hold each sub-request to its budget here
+            with inspector.watch():
+                response = view(sub, *args, **kwargs)
+            url_name = sub.resolver_match.url_name
+            report(inspector.violations(f'GET {url_name} (batch)', get_budget(url_name), settings.QUERY_REPEAT_THRESHOLD))
+        else:
+            response = view(sub, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Batched GET %s failed', sub.path)
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'error': 'Internal server error'}
+    finally:
+        close_old_connections()
+
+    if response.streaming or not response.get('Content-Type', '').startswith('application/json'):
+        return response.status_code, {'error': 'Response is not JSON; request it directly'}
+    return response.status_code, json.loads(response.content) if response.content else None
+
+
+def run(request, items):
+    """Execute the sub-requests, concurrently when there are several, and
+    return their results in the order given.
+
+    Raises BatchError for a sub-request that cannot be dispatched; nothing
+    runs in that case.
+    """
+    prepared = [prepare(request, item) for item in items]
+    if len(prepared) == 1 or settings.BATCH_WORKERS <= 1:
+        outcomes = [dispatch(*call) for call in prepared]
+    else:
+        pool = get_pool()
+        outcomes = [future.result() for future in [pool.submit(dispatch, *call) for call in prepared]]
+
+    results = []
+    for item, (status_code, body) in zip(items, outcomes):
+        result = {'status': status_code, 'body': body}
+        if 'id' in item:
+            result['id'] = item['id']
+        results.append(result)
+    return results
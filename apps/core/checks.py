@@ -0,0 +1,18 @@
+from django.core.checks import Error, register
+from .ratelimit import get_config
+
+
+@register()
+def check_rate_limit_costs(app_configs, **kwargs):
+    """A cost above the bucket capacity could never be paid: every call
+    would get a 429 with a Retry-After that never comes true"""
+    config = get_config()
+    return [
+        Error(
+            f"RATE_LIMIT['COSTS'][{scope!r}] is {cost}, more than RATE_LIMIT['CAPACITY'] ({config['CAPACITY']})",
+            hint='Lower the cost or raise the capacity.',
+            id='core.E001',
+        )
+        for scope, cost in sorted(config['COSTS'].items())
+        if cost > config['CAPACITY']
+    ]
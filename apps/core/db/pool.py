@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """A small thread-safe pool of DB-API connections.
+
+    Connections are created lazily up to ``max_size``. Callers that find the
+    pool exhausted wait up to ``timeout`` seconds for a connection to be
+    released before PoolTimeout is raised. Connections older than
+    ``max_lifetime`` or idle for longer than ``max_idle`` are closed instead of
+    being handed out, and connections idle for longer than
+    ``health_check_after`` are pinged before reuse.
+    """
+
+    def __init__(self, connect, max_size=10, min_size=0, timeout=10.0,
+                 max_lifetime=3600.0, max_idle=300.0, health_check_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        # Idle connections as (connection, created_at, released_at), newest last
+        self._idle = []
+        self._created_at = {}
+        self._size = 0
+        self._in_use = 0
+
+        self.stats = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'acquired': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+            'failed_health_checks': 0,
+        }
+
+    def _expired(self, created_at, released_at, now):
+        if self.max_lifetime and now - created_at >= self.max_lifetime:
+            return True
+        # Keep min_size connections around even when idle
+        if self.max_idle and now - released_at >= self.max_idle and self._size > self.min_size:
+            return True
+        return False
+
+    def _forget(self, connection):
+        """Give a connection's slot back. Call with the lock held, and close
+        the connection with _close() once the lock is released."""
+        self._created_at.pop(id(connection), None)
+        self._size -= 1
+        self.stats['connections_closed'] += 1
+        self._cond.notify()
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        # Health checks and closes talk to the server, so they run outside the
+        # lock like _connect(): a slow or dead server must not stall release()
+        while True:
+            stale = []
+            connection = None
+            check = False
+            try:
+                with self._cond:
+                    while True:
+                        now = time.monotonic()
+                        while self._idle and connection is None:
+                            candidate, created_at, released_at = self._idle.pop()
+                            if getattr(candidate, 'closed', False) or self._expired(created_at, released_at, now):
+                                self._forget(candidate)
+                                stale.append(candidate)
+                                continue
+                            connection = candidate
+                            check = self.health_check_after is not None and now - released_at >= self.health_check_after
+                            if not check:
+                                self._checked_out(started, waited)
+                        if connection is not None:
+                            break
+
+                        if self._size < self.max_size:
+                            # Reserve a slot and open the connection outside the lock
+                            self._size += 1
+                            self._checked_out(started, waited)
+                            break
+
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.stats['timeouts'] += 1
+                            raise PoolTimeout(
+                                f'No database connection available within {self.timeout}s '
+                                f'(pool size {self.max_size})'
+                            )
+                        if not waited:
+                            waited = True
+                            self.stats['waits'] += 1
+                        self._cond.wait(remaining)
+            finally:
+                for candidate in stale:
+                    self._close(candidate)
+
+            if connection is None:
+                break
+            if not check:
+                return connection
+            if self._is_alive(connection):
+                with self._cond:
+                    self._checked_out(started, waited)
+                return connection
+            with self._cond:
+                self.stats['failed_health_checks'] += 1
+                self._forget(connection)
+            self._close(connection)
+
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._created_at[id(connection)] = time.monotonic()
+            self.stats['connections_created'] += 1
+        return connection
+
+    def _checked_out(self, started, waited):
+        self._in_use += 1
+        self.stats['acquired'] += 1
+        if waited:
+            self.stats['wait_seconds'] += time.monotonic() - started
+
+    def release(self, connection, broken=False):
+        """Return a connection, discarding it if it is broken or expired"""
+        with self._cond:
+            owned = id(connection) in self._created_at
+        if not owned:
+            # Opened by another pool (e.g. before a fork) - just close it
+            self._close(connection)
+            return
+
+        if not broken and not getattr(connection, 'closed', False):
+            try:
+                # Never hand out a connection with a transaction still open
+                if connection.info.transaction_status != 0:
+                    connection.rollback()
+            except Exception:
+                broken = True
+
+        with self._cond:
+            self._in_use -= 1
+            now = time.monotonic()
+            created_at = self._created_at[id(connection)]
+            discard = broken or getattr(connection, 'closed', False) or self._expired(created_at, now, now)
+            if discard:
+                self._forget(connection)
+            else:
+                self._idle.append((connection, created_at, now))
+                self._cond.notify()
+        if discard:
+            self._close(connection)
+
+    def close_all(self):
+        with self._cond:
+            idle = [connection for connection, _, _ in self._idle]
+            self._idle.clear()
+            for connection in idle:
+                self._forget(connection)
+        for connection in idle:
+            self._close(connection)
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                **self.stats,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(alias, factory):
+    """Return the pool for a database alias, creating it with ``factory()``"""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked worker - connections inherited from the parent must not be
+            # shared, so start from empty pools without closing their sockets
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = factory()
+        return pool
+
+
+def find_pool(alias):
+    """Return the existing pool for an alias in this process, or None"""
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            return None
+        return _pools.get(alias)
+
+
+def pool_stats():
+    """Usage counters for every pool in this process, keyed by alias"""
+    with _pools_lock:
+        pools = dict(_pools) if _pools_pid == os.getpid() else {}
+    return {alias: pool.snapshot() for alias, pool in pools.items()}
@@ -0,0 +1,59 @@
+"""PostgreSQL backend that borrows connections from a process-wide pool.
+
+Configure with ENGINE 'apps.core.db.postgresql_pool' and an optional POOL dict
+in the database settings (MIN_SIZE, MAX_SIZE, TIMEOUT, MAX_LIFETIME, MAX_IDLE,
+HEALTH_CHECK_AFTER). Keep CONN_MAX_AGE at 0 so Django hands the connection
+back to the pool at the end of every request.
+"""
+import functools
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from apps.core.db.pool import ConnectionPool, find_pool, get_pool
+
+
+def open_connection(database, conn_params, isolation_level):
+    """Open a physical connection the way Django's get_new_connection() does"""
+    connection = database.connect(**conn_params)
+    if isolation_level is not None:
+        connection.isolation_level = isolation_level
+    if not is_psycopg3:
+        import psycopg2.extras
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        try:
+            isolation_level = IsolationLevel(isolation_level) if isolation_level is not None else None
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} "
+                f"specified. Use one of the psycopg.IsolationLevel values."
+            )
+        self.isolation_level = isolation_level or IsolationLevel.READ_COMMITTED
+
+        options = self.settings_dict.get('POOL', {})
+        pool = get_pool(self.alias, lambda: ConnectionPool(
+            functools.partial(open_connection, self.Database, conn_params, isolation_level),
+            max_size=options.get('MAX_SIZE', 10),
+            min_size=options.get('MIN_SIZE', 0),
+            timeout=options.get('TIMEOUT', 10.0),
+            max_lifetime=options.get('MAX_LIFETIME', 3600.0),
+            max_idle=options.get('MAX_IDLE', 300.0),
+            health_check_after=options.get('HEALTH_CHECK_AFTER', 30.0),
+        ))
+        return pool.acquire()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                pool = find_pool(self.alias)
+                if pool is None:
+                    return self.connection.close()
+                # Connections that raised anything other than data/integrity
+                # errors are not trusted back into the pool
+                pool.release(self.connection, broken=self.errors_occurred)
@@ -0,0 +1,34 @@
+"""SQLite backend with a configurable transaction mode.
+
+Set OPTIONS['transaction_mode'] to 'IMMEDIATE' to open every atomic() block
+with BEGIN IMMEDIATE. The write lock is then taken up front and waits on
+busy_timeout, instead of a DEFERRED transaction failing with "database is
+locked" when it tries to upgrade from reading to writing. This mirrors the
+transaction_mode option Django added to the stock backend in 5.1.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"settings.DATABASES[{self.alias!r}]['OPTIONS']['transaction_mode'] "
+                f"is improperly configured to '{mode}'. Use one of {', '.join(TRANSACTION_MODES)}."
+            )
+        return mode.upper() if mode else None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.transaction_mode
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,120 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+# Outcomes a retry should re-run rather than replay: server errors, rate
+# limiting and concurrent-modification conflicts are transient
+NOT_STORED = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+
+def fingerprint(request):
+    """Hash of what the key was first used for, so reuse for another call is caught"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode('utf-8')).hexdigest()
+
+
+def replay(stored):
+    return Response(stored.data, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def check_stored(stored, request):
+    if stored.fingerprint != fingerprint(request):
+        return Response(
+            {'error': 'Idempotency-Key was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return replay(stored)
+
+
+def in_progress():
+    return Response(
+        {'error': 'A request with this Idempotency-Key is already in progress'},
+        status=status.HTTP_409_CONFLICT,
+        headers={'Retry-After': '1'},
+    )
+
+
+def claim(scope, request, stored):
+    """Take the key for this call; False when another call got it first"""
+    now = timezone.now()
+    values = {
+        'fingerprint': fingerprint(request), 'status_code': None, 'data': None,
+        'locked_until': now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+        'expires_at': now + timedelta(seconds=settings.IDEMPOTENCY_TTL),
+    }
+    if stored is None:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(scope=scope, **values)
+            return True
+        except IntegrityError:
+            return False
+    # An expired key, or one whose call died without releasing it, is reused
+    reusable = Q(expires_at__lte=now) | Q(status_code__isnull=True, locked_until__lte=now)
+    return bool(IdempotencyKey.objects.filter(reusable, scope=scope).update(**values))
+
+
+def idempotent(view):
+    """Replay the stored response when a client retries with the same Idempotency-Key.
+
+    Responses are kept per (user, key) in the idempotency_keys table for
+    IDEMPOTENCY_TTL seconds, so every worker process sees them. The key's row
+    is inserted before the view runs, and a concurrent duplicate that fails
+    to take it gets a 409 instead of running the view again. Calls without
+    the header are unaffected.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user_data = getattr(request, 'user_data', None) or {}
+        scope = hashlib.sha256(f"{user_data.get('id', 'anonymous')}:{key}".encode('utf-8')).hexdigest()
+
+        stored = IdempotencyKey.objects.filter(scope=scope).first()
+        now = timezone.now()
+        if stored is not None and stored.expires_at > now:
+            if stored.status_code is not None:
+                return check_stored(stored, request)
+            if stored.locked_until > now:
+                return in_progress()
+        if not claim(scope, request, stored):
+            return in_progress()
+
+        stored_response = False
+        try:
+            response = view(request, *args, **kwargs)
+            if response.status_code < 500 and response.status_code not in NOT_STORED:
+                IdempotencyKey.objects.filter(scope=scope).update(
+                    status_code=response.status_code, data=response.data, locked_until=None,
+                )
+                stored_response = True
+            return response
+        finally:
+            if not stored_response:
+                # Let a retry run the view again
+                IdempotencyKey.objects.filter(scope=scope, status_code__isnull=True).delete()
+    return wrapper
+
+
+def purge_expired():
+    """Delete keys past their IDEMPOTENCY_TTL; returns how many"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
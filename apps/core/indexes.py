@@ -0,0 +1,20 @@
+from django.contrib.postgres.indexes import OpClass
+from django.db import models
+
+
+class PrefixIndex(models.Index):
+    """An expression index that also serves LIKE 'prefix%' lookups.
+
+    Under any collation other than C, PostgreSQL only uses a btree for LIKE
+    when it is built with text_pattern_ops, so each expression is wrapped in
+    that operator class there. Other databases take no operator class and
+    get the plain expression index.
+    """
+    opclass = 'text_pattern_ops'
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().create_sql(model, schema_editor, using=using, **kwargs)
+        index = self.clone()
+        index.expressions = tuple(OpClass(expression, name=self.opclass) for expression in self.expressions)
+        return models.Index.create_sql(index, model, schema_editor, using=using, **kwargs)
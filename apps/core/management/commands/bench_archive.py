@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from apps.requests import archive
+from apps.requests.models import ArchivedRequest, Request
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the queries behind the request list and export with every request in the '
+        'live table, then again after archive_requests has moved closed requests out, and '
+        'restore them afterwards. Seed a large table first, e.g. '
+        '`manage.py seed_data --requests 10000000`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Archive requests closed longer ago than this')
+        parser.add_argument('--rounds', type=int, default=5, help='Timed runs per query; the median is reported')
+        parser.add_argument('--keep', action='store_true', help='Leave the requests archived afterwards')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if ArchivedRequest.objects.exists():
+            raise CommandError('The archive is not empty; run `manage.py archive_requests --restore` first')
+
+        # The Partner with the most pending approvals, and one of the busiest requesters
+        busiest = (
+            Request.objects.filter(status='Pending').values('approver_id')
+            .annotate(pending=Count('id')).order_by('-pending').first()
+        )
+        if busiest is None:
+            raise CommandError('No pending requests to benchmark; run `manage.py seed_data` first')
+        self.approver_id = busiest['approver_id']
+        self.requester_id = Request.objects.order_by('-updated_at').values_list('request_by', flat=True).first()
+
+        results = {'rows': Request.objects.count()}
+        results['single_table'] = self.run_queries(options['rounds'])
+
+        started = time.perf_counter()
+        moved = archive.archive_closed(options['days'])
+        elapsed = time.perf_counter() - started
+        results['archive'] = {
+            'moved': moved,
+            'live_rows': Request.objects.count(),
+            'seconds': round(elapsed, 1),
+            'rows_per_second': round(moved / elapsed) if elapsed else None,
+        }
+        try:
+            results['archived'] = self.run_queries(options['rounds'])
+        finally:
+            if not options['keep']:
+                archive.restore()
+
+        self.report(results, options['json'])
+
+    def queries(self):
+        """The reads get_requests and export_requests issue, by scenario"""
+        everyone, approver = Q(), Q(approver_id=self.approver_id)
+        requester = Q(request_by=self.requester_id)
+        pending, approved = Q(status='Pending'), Q(status='Approved')
+        search = Q(purpose__icontains='Fuel')
+
+        def page(filters, status=None, offset=0, limit=10):
+            include = archive.needs_archive(status)
+            return lambda: list(
+                archive.select(filters, include).order_by('-updated_at', '-id')
+                .values_list('id', flat=True)[offset:offset + limit]
+            )
+
+        return {
+            'pending_page': page(pending, 'Pending'),
+            'approver_pending_page': page(approver & pending, 'Pending'),
+            'approver_pending_count': lambda: archive.count(approver & pending, False),
+            'all_page_1': page(everyone),
+            'all_page_50': page(everyone, offset=49 * 20, limit=20),
+            'approved_page_1': page(approved, 'Approved'),
+            'status_counts': lambda: archive.status_counts(),
+            'requester_page_1': page(requester),
+            'requester_status_counts': lambda: archive.status_counts(self.requester_id),
+            'requester_export': lambda: list(
+                archive.select(requester & approved).order_by('-initiated_on')
+                .values_list('request_by', 'approver_id', 'currency', 'amount', 'purpose', 'initiated_on')
+            ),
+            'search_count': lambda: archive.count(search),
+        }
+
+    def run_queries(self, rounds):
+        timings = {}
+        for name, query in self.queries().items():
+            query()  # Warm the cache and the archive count cache
+            samples = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                query()
+                samples.append(time.perf_counter() - started)
+            timings[name] = round(statistics.median(samples) * 1000, 2)
+        return timings
+
+    def report(self, results, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        moved = results['archive']
+        self.stdout.write(
+            f"{results['rows']} requests; archived {moved['moved']} in {moved['seconds']}s "
+            f"({moved['rows_per_second']} rows/s), {moved['live_rows']} left live\n"
+        )
+        self.stdout.write(f"{'query':<26}{'single table':>14}{'archived':>12}")
+        for name, before in results['single_table'].items():
+            after = results['archived'][name]
+            self.stdout.write(f'{name:<26}{before:>12.2f}ms{after:>10.2f}ms')
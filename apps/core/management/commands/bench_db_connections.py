@@ -0,0 +1,85 @@
+import copy
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+POOL_ENGINE = 'apps.core.db.postgresql_pool'
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request database connection overhead with fresh, persistent '
+        'and pooled connections. Each iteration mimics one HTTP request: run a '
+        'query, then apply the same end-of-request connection handling Django does.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to benchmark')
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per mode')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def make_connection(self, base_settings, mode):
+        settings_dict = copy.deepcopy(base_settings)
+        if settings_dict['ENGINE'] == POOL_ENGINE:
+            # Compare against the stock backend even when pooling is configured
+            settings_dict['ENGINE'] = 'django.db.backends.postgresql'
+        if mode == 'fresh':
+            settings_dict['CONN_MAX_AGE'] = 0
+        elif mode == 'persistent':
+            settings_dict['CONN_MAX_AGE'] = None
+            settings_dict['CONN_HEALTH_CHECKS'] = True
+        elif mode == 'pooled':
+            settings_dict['ENGINE'] = POOL_ENGINE
+            settings_dict['CONN_MAX_AGE'] = 0
+        backend = load_backend(settings_dict['ENGINE'])
+        return backend.DatabaseWrapper(settings_dict, alias=f'bench_{mode}')
+
+    def run_mode(self, base_settings, mode, iterations):
+        connection = self.make_connection(base_settings, mode)
+        samples = []
+        try:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                # What the request_finished signal does
+                connection.close_if_unusable_or_obsolete()
+                samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+        return {
+            'mean_ms': round(statistics.mean(samples), 3),
+            'p50_ms': round(percentile(samples, 0.50), 3),
+            'p95_ms': round(percentile(samples, 0.95), 3),
+            'p99_ms': round(percentile(samples, 0.99), 3),
+        }
+
+    def handle(self, *args, **options):
+        base_settings = connections[options['database']].settings_dict
+        modes = ['fresh', 'persistent']
+        if connections[options['database']].vendor == 'postgresql':
+            modes.append('pooled')
+
+        results = {mode: self.run_mode(base_settings, mode, options['requests']) for mode in modes}
+        for mode in modes[1:]:
+            results[mode]['saved_per_request_ms'] = round(results['fresh']['mean_ms'] - results[mode]['mean_ms'], 3)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'mode':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'saved':>10}  (ms)")
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<12}{result['mean_ms']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['p99_ms']:>10}{result.get('saved_per_request_ms', '-'):>10}"
+            )
@@ -0,0 +1,77 @@
+import json
+import statistics
+import time
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.urls import path
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+JWT_MIDDLEWARE = 'apps.requests.middleware.JWTAuthenticationMiddleware'
+
+
+@api_view(['GET', 'POST'])
+def bench_view(request):
+    return Response({'ok': True})
+
+
+# Served as ROOT_URLCONF while benchmarking, so only the middleware differs
+urlpatterns = [
+    path('api/bench/', bench_view),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request middleware overhead on an /api/ route with the lean API '
+        'stack (LEAN_API_MIDDLEWARE) on and off. Runs the configured MIDDLEWARE, minus '
+        'JWT auth, around a trivial DRF view.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per round')
+        parser.add_argument('--rounds', type=int, default=5, help='Alternating rounds per mode')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def make_handler(self):
+        handler = BaseHandler()
+        handler.load_middleware()
+        return handler
+
+    def run_round(self, handler, count):
+        factory = RequestFactory()
+        requests = [
+            factory.post('/api/bench/', data='{}', content_type='application/json')
+            if i % 4 == 0 else factory.get('/api/bench/')
+            for i in range(count)
+        ]
+        started = time.perf_counter()
+        for request in requests:
+            response = handler.get_response(request)
+            response.close()
+        return (time.perf_counter() - started) / count
+
+    def handle(self, *args, **options):
+        middleware = [name for name in settings.MIDDLEWARE if name != JWT_MIDDLEWARE]
+        timings = {'full': [], 'lean': []}
+
+        with override_settings(ROOT_URLCONF=__name__, MIDDLEWARE=middleware, QUERY_BUDGET_RAISE=False):
+            handler = self.make_handler()
+            for _ in range(options['rounds']):
+                # Alternate modes so drift affects both equally
+                for mode in ('full', 'lean'):
+                    with override_settings(LEAN_API_MIDDLEWARE=(mode == 'lean')):
+                        timings[mode].append(self.run_round(handler, options['requests']))
+
+        results = {mode: round(statistics.median(values) * 1e6, 2) for mode, values in timings.items()}
+        results['saved_us'] = round(results['full'] - results['lean'], 2)
+        results['saved_percent'] = round(100 * results['saved_us'] / results['full'], 1)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"full stack: {results['full']} us/request")
+        self.stdout.write(f"lean API:   {results['lean']} us/request")
+        self.stdout.write(f"saved:      {results['saved_us']} us/request ({results['saved_percent']}%)")
@@ -0,0 +1,152 @@
+import copy
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.db.utils import load_backend
+
+# The baseline is the stock backend with SQLite's defaults (rollback journal,
+# DEFERRED transactions); the tuned profile matches backend.settings_sqlite
+BASELINE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'OPTIONS': {},
+    'PRAGMAS': {},
+}
+TUNED = {
+    'ENGINE': 'apps.core.db.sqlite',
+    'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    'PRAGMAS': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Concurrent read/write benchmark comparing default SQLite settings with the '
+        'tuned WAL + BEGIN IMMEDIATE profile. Reports throughput and "database is '
+        'locked" errors for each.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent workers')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration per profile')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Fraction of operations that write')
+        parser.add_argument(
+            '--think-ms', type=float, default=1.0,
+            help='Time spent between the read and the write of a transaction, like view logic would',
+        )
+        parser.add_argument('--rows', type=int, default=10000, help='Rows seeded before the run')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def make_connection(self, path, profile, alias):
+        settings_dict = copy.deepcopy(connections['default'].settings_dict)
+        settings_dict.update(copy.deepcopy(profile), NAME=path)
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias=alias)
+
+    def seed(self, path, profile, rows):
+        connection = self.make_connection(path, profile, 'bench_seed')
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE bench (id INTEGER PRIMARY KEY, counter INTEGER NOT NULL, payload TEXT)')
+            cursor.execute('CREATE TABLE bench_log (id INTEGER PRIMARY KEY AUTOINCREMENT, bench_id INTEGER, created REAL)')
+            cursor.executemany(
+                'INSERT INTO bench (id, counter, payload) VALUES (%s, 0, %s)',
+                [(i, 'x' * 100) for i in range(1, rows + 1)],
+            )
+        connection.close()
+
+    def worker(self, path, profile, index, options, deadline, totals, lock):
+        connection = self.make_connection(path, profile, f'bench_{index}')
+        rng = random.Random(index)
+        counts = {'reads': 0, 'writes': 0, 'lock_errors': 0}
+        rows = options['rows']
+        think = options['think_ms'] / 1000
+        try:
+            while time.monotonic() < deadline:
+                row_id = rng.randint(1, rows)
+                try:
+                    if rng.random() < options['write_ratio']:
+                        # Read-then-write, the pattern that makes a DEFERRED
+                        # transaction fail when it upgrades to a write lock
+                        # Open the transaction exactly like atomic() does
+                        connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                        with connection.cursor() as cursor:
+                            cursor.execute('SELECT counter FROM bench WHERE id = %s', [row_id])
+                            counter = cursor.fetchone()[0]
+                            time.sleep(think)
+                            cursor.execute('UPDATE bench SET counter = %s WHERE id = %s', [counter + 1, row_id])
+                            cursor.execute('INSERT INTO bench_log (bench_id, created) VALUES (%s, %s)', [row_id, time.time()])
+                        connection.commit()
+                        connection.set_autocommit(True)
+                        counts['writes'] += 1
+                    else:
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                'SELECT COUNT(*), SUM(counter) FROM bench WHERE id BETWEEN %s AND %s',
+                                [row_id, row_id + 500],
+                            )
+                            cursor.fetchone()
+                        counts['reads'] += 1
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    counts['lock_errors'] += 1
+                    if not connection.get_autocommit():
+                        connection.rollback()
+                        connection.set_autocommit(True)
+        finally:
+            connection.close()
+            with lock:
+                for key, value in counts.items():
+                    totals[key] += value
+
+    def run_profile(self, name, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'{name}.sqlite3')
+            self.seed(path, profile, options['rows'])
+
+            totals = {'reads': 0, 'writes': 0, 'lock_errors': 0}
+            lock = threading.Lock()
+            started = time.monotonic()
+            deadline = started + options['seconds']
+            threads = [
+                threading.Thread(target=self.worker, args=(path, profile, i, options, deadline, totals, lock))
+                for i in range(options['threads'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+
+        return {
+            **totals,
+            'ops_per_second': round((totals['reads'] + totals['writes']) / elapsed, 1),
+            'writes_per_second': round(totals['writes'] / elapsed, 1),
+        }
+
+    def handle(self, *args, **options):
+        results = {
+            'default': self.run_profile('default', BASELINE, options),
+            'tuned': self.run_profile('tuned', TUNED, options),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f"{'profile':<10}{'ops/s':>10}{'writes/s':>10}{'reads':>10}{'writes':>10}{'locked':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<10}{result['ops_per_second']:>10}{result['writes_per_second']:>10}"
+                f"{result['reads']:>10}{result['writes']:>10}{result['lock_errors']:>10}"
+            )
@@ -0,0 +1,242 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from apps.requests.models import Request
+from apps.users.models import User
+from .seed_data import PURPOSES, SEED_DOMAIN
+
+OPERATIONS = ('login', 'list', 'search', 'detail', 'create', 'approve', 'export')
+DEFAULT_MIX = 'login=2,list=35,search=15,detail=20,create=10,approve=13,export=5'
+SEARCH_TERMS = ['Fuel', 'Office', 'Loan', 'Travel', 'Banda', 'Phiri', 'Grace', '250', 'Vehicle', 'Staff']
+PAGE_SIZES = [10, 10, 20, 50]
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f"Unknown operation {name!r} in --mix; choose from {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = int(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name!r} in --mix')
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of sorted latencies, in milliseconds"""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return round(ordered[index] * 1000, 2)
+
+
+def summarize(latencies, statuses, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'throughput_rps': round(len(ordered) / elapsed, 1),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2) if ordered else None,
+        'p50_ms': percentile(ordered, 0.50),
+        'p95_ms': percentile(ordered, 0.95),
+        'p99_ms': percentile(ordered, 0.99),
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else None,
+        'errors': sum(count for code, count in statuses.items() if code == 0 or code >= 500),
+        'rate_limited': statuses.get(429, 0),
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+class Client:
+    """One keep-alive HTTP connection, like one browser tab"""
+
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+
+    def call(self, method, path, token=None, body=None):
+        """Return (status, body); status is 0 when the connection failed"""
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return 0, b''
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a running server with a realistic mix of login, list, search, detail, create, '
+        'approve and export calls and report throughput and p50/p95/p99 latency per operation '
+        'as JSON. Run seed_data first: accounts and request ids are read from the database the '
+        'server uses. Disable rate limiting on the server (RATE_LIMIT_ENABLED=False) unless the '
+        'limiter itself is under test.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:5100', help='Server base URL')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='Operation weights, e.g. "list=50,detail=50"')
+        parser.add_argument('--password', default='password123', help='Password of the seeded accounts')
+        parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.mix = parse_mix(options['mix'])
+        self.load_fixtures()
+
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in self.mix}
+        self.statuses = {name: {} for name in self.mix}
+
+        client = Client(options['url'], options['timeout'])
+        self.partner_token = self.login(client, self.partner.email)
+        self.employee_token = self.login(client, self.employee.email)
+
+        deadline = time.monotonic() + options['duration']
+        threads = [
+            threading.Thread(target=self.worker, args=(index, deadline), daemon=True)
+            for index in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = self.report(elapsed)
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        if report['overall']['rate_limited']:
+            self.stderr.write('Some calls were rate limited (429); set RATE_LIMIT_ENABLED=False on the server')
+
+    def load_fixtures(self):
+        rng = random.Random(self.options['seed'])
+        seeded = User.objects.filter(email__endswith=f'@{SEED_DOMAIN}')
+        # The seeded Partner with the most pending approvals gives approve the most work
+        busiest = (
+            Request.objects.filter(status='Pending', approver_id__in=seeded.filter(role='Partner').values('user_id'))
+            .values('approver_id').annotate(pending=Count('id')).order_by('-pending').first()
+        )
+        self.employee = seeded.filter(role='Employee').first()
+        if busiest is None or self.employee is None:
+            raise CommandError('No seeded accounts with requests found; run `manage.py seed_data` first')
+        self.partner = User.objects.get(user_id=busiest['approver_id'])
+
+        self.pending_ids = [
+            str(pk) for pk in Request.objects.filter(approver_id=self.partner.user_id, status='Pending')
+            .values_list('id', flat=True)[:20000]
+        ]
+        rng.shuffle(self.pending_ids)
+
+        numbers = Request.objects.values_list('request_number', flat=True)
+        low, high = numbers.order_by('request_number').first(), numbers.order_by('-request_number').first()
+        sample = [rng.randint(low, high) for _ in range(5000)]
+        self.detail_ids = [str(pk) for pk in Request.objects.filter(request_number__in=sample).values_list('id', flat=True)]
+        if not self.detail_ids:
+            raise CommandError('No requests found for the detail operation; run `manage.py seed_data` first')
+
+    def login(self, client, email):
+        status, body = client.call('POST', '/api/users/login/', body={'email': email, 'password': self.options['password']})
+        if status != 200:
+            raise CommandError(f'Login as {email} failed with HTTP {status}: {body[:200]!r}')
+        return json.loads(body)['token']
+
+    def worker(self, index, deadline):
+        rng = random.Random(None if self.options['seed'] is None else self.options['seed'] + index)
+        client = Client(self.options['url'], self.options['timeout'])
+        names, weights = list(self.mix), list(self.mix.values())
+        approver_id = str(self.partner.user_id)
+        samples = {name: [] for name in names}
+        statuses = {name: {} for name in names}
+
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            if name == 'login':
+                call = ('POST', '/api/users/login/', None, {'email': self.employee.email, 'password': self.options['password']})
+            elif name == 'list':
+                params = {'page': min(int(rng.expovariate(0.3)) + 1, 50), 'limit': rng.choice(PAGE_SIZES)}
+                if rng.random() < 0.3:
+                    params['status'] = rng.choice(['Pending', 'Approved', 'Rejected'])
+                call = ('GET', f'/api/requests/?{urlencode(params)}', self.partner_token, None)
+            elif name == 'search':
+                params = {'search': rng.choice(SEARCH_TERMS), 'limit': 10}
+                call = ('GET', f'/api/requests/?{urlencode(params)}', self.partner_token, None)
+            elif name == 'detail':
+                call = ('GET', f'/api/requests/{rng.choice(self.detail_ids)}/', self.partner_token, None)
+            elif name == 'create':
+                body = {
+                    'amount': f'{rng.lognormvariate(11.9, 1.0):.2f}',
+                    'currency': 'MWK',
+                    'approver_id': approver_id,
+                    'purpose': rng.choice(PURPOSES)[0],
+                    'description': 'Load test',
+                    'required_on': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(time.time() + 86400 * 14)),
+                }
+                call = ('POST', '/api/requests/', self.employee_token, body)
+            elif name == 'approve':
+                with self.lock:
+                    request_id = self.pending_ids.pop() if self.pending_ids else None
+                if request_id is None:
+                    continue
+                call = ('PATCH', f'/api/requests/{request_id}/', self.partner_token,
+                        {'status': rng.choice(['Approved', 'Approved', 'Rejected'])})
+            else:
+                # An Employee's own export - a Partner exporting every approved row is a batch job
+                call = ('GET', '/api/requests/export/', self.employee_token, None)
+
+            method, path, token, body = call
+            started = time.perf_counter()
+            status, _ = client.call(method, path, token, body)
+            samples[name].append(time.perf_counter() - started)
+            statuses[name][status] = statuses[name].get(status, 0) + 1
+
+        with self.lock:
+            for name in names:
+                self.latencies[name].extend(samples[name])
+                for status, count in statuses[name].items():
+                    self.statuses[name][status] = self.statuses[name].get(status, 0) + count
+
+    def report(self, elapsed):
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        all_statuses = {}
+        for statuses in self.statuses.values():
+            for status, count in statuses.items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+        return {
+            'config': {
+                'url': self.options['url'],
+                'duration_s': self.options['duration'],
+                'concurrency': self.options['concurrency'],
+                'mix': self.mix,
+                'requests_in_db': Request.objects.count(),
+            },
+            'elapsed_s': round(elapsed, 2),
+            'overall': summarize(all_latencies, all_statuses, elapsed),
+            'operations': {
+                name: summarize(self.latencies[name], self.statuses[name], elapsed) for name in self.mix
+            },
+        }
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from apps.core import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key responses older than IDEMPOTENCY_TTL. Run it daily, e.g. from cron.'
+
+    def handle(self, *args, **options):
+        purged = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Removed {purged} expired idempotency key(s)'))
@@ -0,0 +1,45 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.core.slowlog import SORT_KEYS, summarize
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow query log by normalized SQL fingerprint, with origins and captured query plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=None, help='Log file (defaults to SLOW_QUERY_LOG_FILE)')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total_ms', help='Order of the shapes')
+        parser.add_argument('--limit', type=int, default=20, help='Number of shapes to show')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+        parser.add_argument('--clear', action='store_true', help='Truncate the log after printing')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.SLOW_QUERY_LOG_FILE
+        if not path:
+            raise CommandError('SLOW_QUERY_LOG_FILE is disabled; pass --file')
+
+        shapes = summarize(path, sort=options['sort'], limit=options['limit'], with_params=True)
+        if options['json']:
+            self.stdout.write(json.dumps(shapes, indent=2))
+        elif not shapes:
+            self.stdout.write(f'No slow queries logged in {path}')
+        else:
+            for shape in shapes:
+                self.stdout.write(self.style.WARNING(
+                    f"[{shape['fingerprint']}] {shape['count']}x  total {shape['total_ms']:.1f} ms  "
+                    f"mean {shape['mean_ms']:.1f} ms  max {shape['max_ms']:.1f} ms"
+                ))
+                self.stdout.write(f"  {shape['normalized']}")
+                for origin in shape['origins']:
+                    self.stdout.write(f'  from {origin}')
+                for line in shape['explain'] or []:
+                    self.stdout.write(f'    {line}')
+                self.stdout.write('')
+
+        if options['clear'] and os.path.exists(path):
+            open(path, 'w').close()
+            if os.path.exists(f'{path}.1'):
+                os.remove(f'{path}.1')
+            self.stdout.write(self.style.SUCCESS(f'Cleared {path}'))
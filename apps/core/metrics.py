@@ -0,0 +1,348 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from .db.pool import pool_stats
+
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Each thread records into its own shard, so the request path never takes a
+# lock; only shard registration and scraping do. _shards holds (thread,
+# shard) pairs; a finished thread's shard is folded into _retired, so a server
+# starting a thread per request (runserver) does not keep one per thread.
+_shards = []
+_retired = {}
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+# Gunicorn serves /metrics from whichever worker accepts the scrape, so with
+# METRICS_DIR set every worker writes its totals to <pid>-<token>.json there
+# (from a thread every METRICS_FLUSH_SECONDS, and at exit) and a scrape sums
+# them.
+# Files of workers that have exited are folded into retired.json, so their
+# counts survive recycling (max_requests) without double counting.
+_process_file = None
+_flush_lock = threading.Lock()
+
+
+class EndpointStats:
+    __slots__ = ('count', 'latency_sum', 'buckets', 'queries', 'db_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.count = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        with _shards_lock:
+            _retire_finished()
+            _shards.append((threading.current_thread(), shard))
+    return shard
+
+
+def _retire_finished():
+    """Fold the shards of threads that have exited into _retired; they can no
+    longer record, and their counts must not go missing. Hold _shards_lock."""
+    live = []
+    for thread, shard in _shards:
+        if thread.is_alive():
+            live.append((thread, shard))
+        else:
+            _merge(_retired, shard)
+    _shards[:] = live
+
+
+def _merge(merged, shard):
+    for endpoint, stats in list(shard.items()):
+        total = merged.get(endpoint)
+        if total is None:
+            total = merged[endpoint] = EndpointStats()
+        total.count += stats.count
+        total.latency_sum += stats.latency_sum
+        total.buckets = [a + b for a, b in zip(total.buckets, stats.buckets)]
+        total.queries += stats.queries
+        total.db_seconds += stats.db_seconds
+        total.response_bytes += stats.response_bytes
+        for key, count in list(stats.statuses.items()):
+            total.statuses[key] = total.statuses.get(key, 0) + count
+
+
+def record(endpoint, method, status_code, seconds, queries, db_seconds, response_bytes):
+    shard = _shard()
+    stats = shard.get(endpoint)
+    if stats is None:
+        stats = shard[endpoint] = EndpointStats()
+
+    stats.count += 1
+    stats.latency_sum += seconds
+    for index, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            stats.buckets[index] += 1
+            break
+    else:
+        stats.buckets[-1] += 1
+    stats.queries += queries
+    stats.db_seconds += db_seconds
+    stats.response_bytes += response_bytes
+    key = (method, status_code)
+    stats.statuses[key] = stats.statuses.get(key, 0) + 1
+
+
+def collect():
+    """Merge every thread's shard into one EndpointStats per endpoint"""
+    merged = {}
+    with _shards_lock:
+        _retire_finished()
+        _merge(merged, _retired)
+        shards = [shard for _, shard in _shards]
+
+    for shard in shards:
+        _merge(merged, shard)
+    return merged
+
+
+def reset():
+    with _shards_lock:
+        _retired.clear()
+        for _, shard in _shards:
+            shard.clear()
+
+
+def _dump(stats_by_endpoint):
+    return {
+        endpoint: {
+            'count': stats.count,
+            'latency_sum': stats.latency_sum,
+            'buckets': stats.buckets,
+            'queries': stats.queries,
+            'db_seconds': stats.db_seconds,
+            'response_bytes': stats.response_bytes,
+            'statuses': [[method, status_code, count] for (method, status_code), count in stats.statuses.items()],
+        }
+        for endpoint, stats in stats_by_endpoint.items()
+    }
+
+
+def _load(path):
+    try:
+        data = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    loaded = {}
+    for endpoint, values in data.items():
+        stats = loaded[endpoint] = EndpointStats()
+        stats.count = values['count']
+        stats.latency_sum = values['latency_sum']
+        stats.buckets = values['buckets']
+        stats.queries = values['queries']
+        stats.db_seconds = values['db_seconds']
+        stats.response_bytes = values['response_bytes']
+        stats.statuses = {(method, status_code): count for method, status_code, count in values['statuses']}
+    return loaded
+
+
+def _write(path, stats_by_endpoint):
+    temporary = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+    temporary.write_text(json.dumps(_dump(stats_by_endpoint)))
+    os.replace(temporary, path)
+
+
+def _own_file():
+    """This process's file in METRICS_DIR; the token keeps a recycled pid
+    from overwriting the last totals of the worker that had it before"""
+    global _process_file
+    pid = os.getpid()
+    if _process_file is None or _process_file[0] != pid:
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        _process_file = (pid, directory / f'{pid}-{uuid.uuid4().hex[:8]}.json')
+        atexit.register(flush)
+        threading.Thread(target=_flush_periodically, name='metrics-flusher', daemon=True).start()
+    return _process_file[1]
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_SECONDS)
+        flush()
+
+
+def flush():
+    """Write this process's totals to METRICS_DIR"""
+    if settings.METRICS_DIR:
+        with _flush_lock:
+            _write(_own_file(), collect())
+
+
+def _ensure_flushing():
+    if settings.METRICS_DIR and (_process_file is None or _process_file[0] != os.getpid()):
+        with _flush_lock:
+            _own_file()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_all():
+    """collect() summed over every process sharing METRICS_DIR, or this
+    process's alone without one"""
+    if not settings.METRICS_DIR:
+        return collect()
+    flush()
+    directory = Path(settings.METRICS_DIR)
+    merged = {}
+    with open(directory / 'retired.lock', 'a') as lock:
+        # Scrapes fold files into retired.json one at a time, so a file is
+        # never counted both on its own and in retired.json
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = directory / 'retired.json'
+        retired = _load(retired_path)
+        finished = []
+        for path in directory.glob('*-*.json'):
+            stats = _load(path)
+            if _alive(int(path.name.split('-')[0])):
+                _merge(merged, stats)
+            else:
+                _merge(retired, stats)
+                finished.append(path)
+        if finished:
+            _write(retired_path, retired)
+            for path in finished:
+                path.unlink()
+        _merge(merged, retired)
+    return merged
+
+
+def render_prometheus():
+    lines = []
+
+    def metric(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    stats = sorted(collect_all().items())
+
+    metric('http_requests_total', 'counter', 'Requests served, by endpoint, method and status.')
+    for endpoint, endpoint_stats in stats:
+        for (method, status_code), count in sorted(endpoint_stats.statuses.items()):
+            lines.append(f'http_requests_total{{endpoint="{endpoint}",method="{method}",status="{status_code}"}} {count}')
+
+    metric('http_request_duration_seconds', 'histogram', 'Request latency, by endpoint.')
+    for endpoint, endpoint_stats in stats:
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, endpoint_stats.buckets):
+            cumulative += count
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+        lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {endpoint_stats.count}')
+        lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {endpoint_stats.latency_sum:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {endpoint_stats.count}')
+
+    metric('http_db_queries_total', 'counter', 'Database queries executed while serving requests, by endpoint.')
+    for endpoint, endpoint_stats in stats:
+        lines.append(f'http_db_queries_total{{endpoint="{endpoint}"}} {endpoint_stats.queries}')
+
+    metric('http_db_duration_seconds_total', 'counter', 'Time spent in database queries, by endpoint.')
+    for endpoint, endpoint_stats in stats:
+        lines.append(f'http_db_duration_seconds_total{{endpoint="{endpoint}"}} {endpoint_stats.db_seconds:.6f}')
+
+    metric('http_response_bytes_total', 'counter', 'Response body bytes, by endpoint.')
+    for endpoint, endpoint_stats in stats:
+        lines.append(f'http_response_bytes_total{{endpoint="{endpoint}"}} {endpoint_stats.response_bytes}')
+
+    pools = pool_stats()
+    if pools:
+        metric('db_pool_connections', 'gauge', 'Connections held by the pool, by state.')
+        for alias, pool in sorted(pools.items()):
+            lines.append(f'db_pool_connections{{alias="{alias}",state="in_use"}} {pool["in_use"]}')
+            lines.append(f'db_pool_connections{{alias="{alias}",state="idle"}} {pool["idle"]}')
+        metric('db_pool_waits_total', 'counter', 'Checkouts that had to wait for a free connection.')
+        for alias, pool in sorted(pools.items()):
+            lines.append(f'db_pool_waits_total{{alias="{alias}"}} {pool["waits"]}')
+        metric('db_pool_timeouts_total', 'counter', 'Checkouts that gave up waiting.')
+        for alias, pool in sorted(pools.items()):
+            lines.append(f'db_pool_timeouts_total{{alias="{alias}"}} {pool["timeouts"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """connection.execute_wrapper() hook counting queries and their time"""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Record latency, query count, DB time and response size per URL name,
+    and report them to the client in a Server-Timing header."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        if match is None:
+            # Rejected before URL resolution (e.g. by JWT auth) - still label it
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                pass
+        endpoint = (match.url_name or match.view_name) if match else 'unresolved'
+
+        if response.streaming:
+            response_bytes = int(response.get('Content-Length') or 0)
+        else:
+            response_bytes = len(response.content)
+
+        record(endpoint, request.method, response.status_code, elapsed, timer.count, timer.seconds, response_bytes)
+        _ensure_flushing()
+        response['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"'
+        )
+        return response
+
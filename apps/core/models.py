@@ -0,0 +1,23 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+class IdempotencyKey(models.Model):
+    """A call made with an Idempotency-Key, kept for replay until expires_at.
+
+    The row is inserted before the view runs and holds the key until
+    locked_until; status_code and data are filled in once the response is
+    known. Stored in the database so every worker process sees it.
+    """
+    # sha256 of the caller and the key
+    scope = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder, blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+
+    def __str__(self):
+        return f"{self.scope} ({self.status_code or 'running'})"
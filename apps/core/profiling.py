@@ -0,0 +1,236 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from .auth import is_partner
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SECRET_HEADER = 'X-Profile-Secret'
+MODES = ('cprofile', 'sample')
+MAX_SQL_STATEMENTS = 500
+TOP_FUNCTIONS = 60
+
+
+def presents_secret(request):
+    """Whether the request carries the configured PROFILING_SECRET"""
+    secret = settings.PROFILING_SECRET
+    presented = request.headers.get(SECRET_HEADER, '')
+    # Compare bytes: compare_digest() rejects non-ASCII str
+    return bool(secret) and hmac.compare_digest(presented.encode(), secret.encode())
+
+
+def is_profiling_allowed(request):
+    """Partners, or anyone presenting PROFILING_SECRET, may profile and read reports"""
+    return is_partner(request) or presents_secret(request)
+
+
+def requested_mode(request):
+    """The profiler asked for via X-Profile or ?profile=, or None.
+
+    Only looks at the raw header and query string so unprofiled requests pay
+    nothing more than two lookups.
+    """
+    value = request.META.get(PROFILE_HEADER)
+    if value is None:
+        if 'profile=' not in request.META.get('QUERY_STRING', ''):
+            return None
+        value = request.GET.get('profile')
+        if value is None:
+            return None
+    value = value.strip().lower()
+    if value in ('', '0', 'false', 'off'):
+        return None
+    return value if value in MODES else 'cprofile'
+
+
+class SQLRecorder:
+    """execute_wrapper() hook keeping every statement with its timing"""
+
+    def __init__(self):
+        self.statements = []
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.statements) < MAX_SQL_STATEMENTS:
+                self.statements.append({
+                    'sql': sql,
+                    'params': repr(params)[:500],
+                    'many': many,
+                    'duration_ms': round(elapsed * 1000, 3),
+                })
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval=0.001):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.total = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = tuple(
+                f'{entry.filename}:{entry.lineno}({entry.name})'
+                for entry in traceback.extract_stack(frame, limit=40)
+            )
+            self.samples[stack] += 1
+            self.total += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def report(self):
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            if stack:
+                leaves[stack[-1]] += count
+        return {
+            'interval_ms': self.interval * 1000,
+            'samples': self.total,
+            'top_frames': [
+                {'frame': frame, 'samples': count} for frame, count in leaves.most_common(TOP_FUNCTIONS)
+            ],
+            'top_stacks': [
+                {'stack': list(stack), 'samples': count} for stack, count in self.samples.most_common(10)
+            ],
+        }
+
+
+def get_profile_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_report(report):
+    """Write a report into the ring buffer, dropping the oldest beyond PROFILING_MAX_REPORTS"""
+    directory = get_profile_dir()
+    path = directory / f"{report['id']}.json"
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(report, default=str))
+    os.replace(tmp_path, path)
+
+    reports = sorted(directory.glob('*.json'))
+    for stale in reports[:max(0, len(reports) - settings.PROFILING_MAX_REPORTS)]:
+        stale.unlink(missing_ok=True)
+
+
+def list_reports():
+    summaries = []
+    for path in sorted(get_profile_dir().glob('*.json'), reverse=True):
+        try:
+            report = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        summaries.append({key: report.get(key) for key in (
+            'id', 'created_at', 'method', 'path', 'endpoint', 'status', 'mode', 'duration_ms', 'sql_count', 'sql_ms',
+        )})
+    return summaries
+
+
+def load_report(report_id):
+    # Report ids are generated here; refuse anything that could escape the directory
+    if not report_id.replace('-', '').isalnum():
+        return None
+    path = get_profile_dir() / f'{report_id}.json'
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+class ProfilingMiddleware:
+    """Profile a single request on demand.
+
+    Send X-Profile: 1 (or ?profile=1) to run the view under cProfile, or
+    X-Profile: sample for a 1 ms stack sampler. Only Partners or callers with
+    the X-Profile-Secret header may profile. The report, with every SQL
+    statement and its timing, is stored in a bounded on-disk ring buffer and
+    its id returned in X-Profile-Id. Requests without the flag go straight
+    through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not is_profiling_allowed(request):
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode):
+        recorder = SQLRecorder()
+        profiler = cProfile.Profile() if mode == 'cprofile' else None
+        sampler = StackSampler(threading.get_ident()) if mode == 'sample' else None
+
+        started = time.perf_counter()
+        with connections['default'].execute_wrapper(recorder):
+            if profiler is not None:
+                profiler.enable()
+            else:
+                sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                else:
+                    sampler.stop()
+        elapsed = time.perf_counter() - started
+
+        if profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            profile = {'stats': stream.getvalue()}
+        else:
+            profile = sampler.report()
+
+        match = request.resolver_match
+        user_data = getattr(request, 'user_data', None)
+        report = {
+            # Time-ordered so the ring buffer can evict by name
+            'id': f'{time.time_ns()}-{uuid.uuid4().hex[:8]}',
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'endpoint': match.url_name if match else None,
+            'status': response.status_code,
+            'user': user_data['id'] if user_data else None,
+            'mode': mode,
+            'duration_ms': round(elapsed * 1000, 3),
+            'sql_count': recorder.count,
+            'sql_ms': round(recorder.seconds * 1000, 3),
+            'sql': recorder.statements,
+            'profile': profile,
+        }
+        save_report(report)
+
+        response['X-Profile-Id'] = report['id']
+        return response
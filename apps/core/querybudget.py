@@ -0,0 +1,127 @@
+import logging
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from .sql import fingerprint, normalize_sql
+
+logger = logging.getLogger(__name__)
+
+# Nested atomic() blocks - and every atomic() under TestCase - are transaction
+# bookkeeping, not queries a view chose to run
+SAVEPOINT_SQL = ('SAVEPOINT ', 'RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def cache_tables():
+    """Quoted tables of the DatabaseCache caches. Which cache backend runs is
+    deployment configuration - Redis costs no queries at all - so its
+    statements do not count against a view's budget."""
+    quote = connections[DEFAULT_DB_ALIAS].ops.quote_name
+    return tuple(
+        quote(cache['LOCATION']) for cache in settings.CACHES.values()
+        if cache['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+    )
+
+
+class QueryInspector:
+    """execute_wrapper() hook counting each distinct statement.
+
+    Only the raw SQL string is counted while the request runs - Django emits
+    the same text for every execution of a query shape, so repetition shows
+    up without normalizing anything. Fingerprinting happens once, afterwards.
+    """
+
+    __slots__ = ('total', 'statements', 'cache_tables')
+
+    def __init__(self):
+        self.total = 0
+        self.statements = {}
+        self.cache_tables = cache_tables()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(SAVEPOINT_SQL) or any(table in sql for table in self.cache_tables):
+            return execute(sql, params, many, context)
+        self.total += 1
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """Query shapes executed more than ``threshold`` times, most repeated first"""
+        shapes = {}
+        for sql, count in self.statements.items():
+            if count <= 1:
+                continue
+            shape = fingerprint(sql)
+            if shape in shapes:
+                shapes[shape]['count'] += count
+            else:
+                shapes[shape] = {'fingerprint': shape, 'sql': normalize_sql(sql), 'count': count}
+        found = [shape for shape in shapes.values() if shape['count'] > threshold]
+        return sorted(found, key=lambda shape: shape['count'], reverse=True)
+
+    def violations(self, label, budget, threshold):
+        problems = []
+        if budget is not None and self.total > budget:
+            problems.append(f'{label}: {self.total} queries, budget is {budget}')
+        for shape in self.repeated(threshold):
+            problems.append(
+                f"{label}: possible N+1 - same query ran {shape['count']} times "
+                f"[{shape['fingerprint']}] {shape['sql'][:300]}"
+            )
+        return problems
+
+    @contextmanager
+    def watch(self):
+        """Count queries on every configured database while the block runs"""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+def get_budget(url_name):
+    return settings.QUERY_BUDGETS.get(url_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+def report(problems):
+    """Log budget violations, raising instead when QUERY_BUDGET_RAISE is on"""
+    if not problems:
+        return
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded('\n'.join(problems))
+    for problem in problems:
+        logger.warning(problem)
+
+
+class QueryBudgetMiddleware:
+    """Enforce QUERY_BUDGETS per URL name and flag repeated query shapes.
+
+    A request breaks its budget when it runs more queries than the budget for
+    its URL name (QUERY_BUDGET_DEFAULT otherwise), or when one query shape
+    runs more than QUERY_REPEAT_THRESHOLD times. Violations are logged, or
+    raised as QueryBudgetExceeded when QUERY_BUDGET_RAISE is set (tests).
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        inspector = QueryInspector()
+        with inspector.watch():
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        if match is None:
+            # Never reached a view - nothing to hold to a budget
+            return response
+        url_name = match.url_name or match.view_name
+        report(inspector.violations(
+            f'{request.method} {url_name}', get_budget(url_name), settings.QUERY_REPEAT_THRESHOLD,
+        ))
+        return response
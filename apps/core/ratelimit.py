@@ -0,0 +1,172 @@
+import functools
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'ENABLED': True,
+    # 'local' keeps buckets in this process; 'cache' shares them through the
+    # Django cache so every worker draws from the same buckets
+    'BACKEND': 'local',
+    'CAPACITY': 60,
+    'REFILL_RATE': 1.0,
+    'COSTS': {},
+    # Reverse proxies in front of the app that append to X-Forwarded-For;
+    # 0 uses REMOTE_ADDR
+    'TRUSTED_PROXIES': 0,
+    'MAX_LOCAL_KEYS': 10000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RATE_LIMIT', {})}
+
+
+def _refill(state, now, capacity, refill_rate):
+    if state is None:
+        return float(capacity)
+    tokens, updated = state
+    return min(float(capacity), tokens + (now - updated) * refill_rate)
+
+
+def _take(states, keys, cost, now, capacity, refill_rate):
+    """Charge ``cost`` to every bucket or to none of them.
+
+    Returns (new_states, retry_after); new_states is None when refused.
+    """
+    levels = {key: _refill(states.get(key), now, capacity, refill_rate) for key in keys}
+    short = max(cost - tokens for tokens in levels.values())
+    if short > 0:
+        return None, short / refill_rate if refill_rate else math.inf
+    return {key: (tokens - cost, now) for key, tokens in levels.items()}, 0.0
+
+
+class LocalBackend:
+    """Token buckets held in process memory behind a single short lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, keys, cost, capacity, refill_rate, max_keys):
+        now = time.monotonic()
+        with self._lock:
+            new_states, retry_after = _take(self._buckets, keys, cost, now, capacity, refill_rate)
+            if new_states is not None:
+                self._buckets.update(new_states)
+                if len(self._buckets) > max_keys:
+                    self._prune(now, capacity, refill_rate)
+        return retry_after
+
+    def _prune(self, now, capacity, refill_rate):
+        # Buckets that have refilled completely carry no state worth keeping
+        full = [
+            key for key, state in self._buckets.items()
+            if _refill(state, now, capacity, refill_rate) >= capacity
+        ]
+        for key in full:
+            del self._buckets[key]
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBackend:
+    """Token buckets shared through the Django cache.
+
+    The read-modify-write is not atomic across processes, so two workers racing
+    on the same bucket can both spend the last tokens. That slack is bounded by
+    the worker count and acceptable for load shedding.
+    """
+
+    def consume(self, keys, cost, capacity, refill_rate, max_keys):
+        now = time.time()
+        cache_keys = {key: f'ratelimit:{key}' for key in keys}
+        cached = cache.get_many(cache_keys.values())
+        states = {key: cached.get(cache_key) for key, cache_key in cache_keys.items()}
+
+        new_states, retry_after = _take(states, keys, cost, now, capacity, refill_rate)
+        if new_states is not None:
+            # Expire once the bucket would be full again anyway
+            timeout = math.ceil(capacity / refill_rate) if refill_rate else None
+            cache.set_many({cache_keys[key]: state for key, state in new_states.items()}, timeout)
+        return retry_after
+
+    def reset(self):
+        pass
+
+
+_local_backend = LocalBackend()
+_cache_backend = CacheBackend()
+
+
+def get_backend(config):
+    return _cache_backend if config['BACKEND'] == 'cache' else _local_backend
+
+
+def get_client_ip(request, config):
+    """The caller's address. Behind TRUSTED_PROXIES proxies it is the
+    X-Forwarded-For entry the outermost one appended; entries to its left
+    come from the client and could be forged to dodge the limit."""
+    hops = config['TRUSTED_PROXIES']
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR') if hops else None
+    if forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(hops, len(addresses))]
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def get_bucket_keys(request, config):
+    keys = [f'ip:{get_client_ip(request, config)}']
+    user_data = getattr(request, 'user_data', None)
+    if user_data:
+        keys.append(f"user:{user_data['id']}")
+    return keys
+
+
+def check_rate_limit(request, scope):
+    """Charge the caller for one call to ``scope``.
+
+    The cost comes from RATE_LIMIT['COSTS'][scope] and is taken from both the
+    caller's IP bucket and, when authenticated, their user bucket. Returns a
+    429 Response with Retry-After when either bucket is short, otherwise None.
+    """
+    config = get_config()
+    if not config['ENABLED']:
+        return None
+
+    cost = config['COSTS'].get(scope, 1)
+    if cost <= 0:
+        return None
+
+    retry_after = get_backend(config).consume(
+        get_bucket_keys(request, config), cost,
+        config['CAPACITY'], config['REFILL_RATE'], config['MAX_LOCAL_KEYS'],
+    )
+    if not retry_after:
+        return None
+
+    retry_after = max(1, math.ceil(retry_after)) if retry_after != math.inf else 3600
+    return Response(
+        {'error': 'Too many requests, please slow down', 'retry_after': retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)},
+    )
+
+
+def rate_limit(scope):
+    """Decorator applying check_rate_limit to a view (place it below @api_view)"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limited = check_rate_limit(request, scope)
+            if limited is not None:
+                return limited
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,74 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from .auth import get_request_user_data
+
+REPLICA_DB_ALIAS = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'replica:pinned:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary for the stickiness window"""
+    if replica_configured():
+        cache.set(_pin_key(user_id), True, settings.READ_REPLICA_STICKINESS)
+
+
+def is_pinned(user_id):
+    return bool(cache.get(_pin_key(user_id)))
+
+
+@contextmanager
+def replica_reads(request=None):
+    """Route ORM reads inside the block to the replica.
+
+    Falls back to the primary when no replica is configured or the calling
+    user wrote recently, so users always read their own writes.
+    """
+    user_data = get_request_user_data(request) if request is not None else None
+    if not replica_configured() or (user_data and is_pinned(user_data['id'])):
+        yield
+        return
+
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """View decorator wrapping the view body in replica_reads()"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Send reads to the replica only inside replica_reads(); everything else,
+    including reads made inside a write transaction, uses the primary."""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
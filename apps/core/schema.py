@@ -0,0 +1,72 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+import yaml
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+_schema = None
+_rendered = {}
+_lock = threading.Lock()
+
+
+def load_schema_file(path):
+    """Read a schema written by ``manage.py spectacular --file``"""
+    text = Path(path).read_text(encoding='utf-8')
+    if str(path).endswith('.json'):
+        return json.loads(text)
+    return yaml.safe_load(text)
+
+
+def reset():
+    """Forget the cached schema, e.g. after swapping SCHEMA_FILE"""
+    global _schema
+    with _lock:
+        _schema = None
+        _rendered.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """The OpenAPI schema, generated once per process and served with an ETag.
+
+    The schema is read from SCHEMA_FILE when it exists (written at build
+    time), otherwise generated on the first request. Each negotiated format
+    is rendered once and kept in memory.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        renderer, media_type = self.perform_content_negotiation(request)
+        with _lock:
+            rendered = _rendered.get(media_type)
+            if rendered is None:
+                content = renderer.render(self._get_schema(request), media_type, {'request': request})
+                rendered = _rendered[media_type] = {
+                    'content': content,
+                    'etag': f'"{hashlib.md5(content).hexdigest()}"',
+                    'filename': self._get_filename(request, None),
+                }
+
+        if request.headers.get('If-None-Match') == rendered['etag']:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(rendered['content'], content_type=media_type)
+            response['Content-Disposition'] = f"inline; filename=\"{rendered['filename']}\""
+        response['ETag'] = rendered['etag']
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    def _get_schema(self, request):
+        # Called with _lock held
+        global _schema
+        if _schema is None:
+            path = settings.SCHEMA_FILE
+            if path and Path(path).exists():
+                _schema = load_schema_file(path)
+            else:
+                generator = self.generator_class(urlconf=self.urlconf, patterns=self.patterns)
+                _schema = generator.get_schema(request=request, public=self.serve_public)
+        return _schema
@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class BatchItemSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=100, help_text="Echoed back to match results to sub-requests")
+    method = serializers.ChoiceField(choices=['GET'], default='GET', help_text="Only reads can be batched")
+    path = serializers.CharField(max_length=2000, help_text="API path, e.g. /api/requests/?status=Pending")
+    params = serializers.DictField(required=False, help_text="Query parameters; list values repeat the parameter")
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = serializers.ListField(child=BatchItemSerializer(), min_length=1)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f'At most {settings.BATCH_MAX_REQUESTS} requests per batch')
+        return value
+
+
+class BatchResultSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    status = serializers.IntegerField(help_text="HTTP status of the sub-request")
+    body = serializers.JSONField(help_text="Its JSON response body")
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    responses = BatchResultSerializer(many=True)
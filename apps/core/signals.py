@@ -0,0 +1,34 @@
+from django.core.management import call_command
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from . import slowlog
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Apply the PRAGMAS from a SQLite database's settings to each new connection"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if not pragmas:
+        return
+    # On the raw sqlite3 connection: connection setup is not a query of
+    # whatever request happened to open it, so execute_wrapper() hooks such as
+    # the query budget and the slow query log must not see it
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def install_slow_query_logger(sender, connection, **kwargs):
+    slowlog.install(connection)
+
+
+@receiver(post_migrate)
+def create_cache_tables(sender, using, verbosity=1, **kwargs):
+    """Have `migrate` - and so gunicorn.conf.py before the workers fork -
+    create the DatabaseCache tables too. Sent once per app; existing tables
+    are left alone."""
+    # One level quieter, or every app would report the table as existing
+    call_command('createcachetable', database=using, verbosity=max(verbosity - 1, 0))
@@ -0,0 +1,244 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+from django.conf import settings
+from .sql import fingerprint, normalize_sql, redact_strings
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+MAX_PARAMS_LENGTH = 1000
+STACK_DEPTH = 8
+# Occurrence counters are per process; past this many shapes start over
+MAX_TRACKED_SHAPES = 10000
+SORT_KEYS = ('total_ms', 'count', 'max_ms')
+
+_local = threading.local()
+_seen = {}
+_seen_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _occurrence(shape):
+    """Count one more occurrence of a query shape in this process"""
+    with _seen_lock:
+        if shape not in _seen and len(_seen) >= MAX_TRACKED_SHAPES:
+            _seen.clear()
+        _seen[shape] = _seen.get(shape, 0) + 1
+        return _seen[shape]
+
+
+def _origin():
+    """Project frames that led to the query, outermost first, and the view among them"""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    view = next((f'{frame.filename[len(root) + 1:]}:{frame.name}'
+                 for frame in frames if frame.filename.endswith('views.py')), None)
+    stack = [f'{frame.filename[len(root) + 1:]}:{frame.lineno} in {frame.name}' for frame in frames[-STACK_DEPTH:]]
+    return view, stack
+
+
+def explain(connection, sql, params):
+    """Run the backend's EXPLAIN for a statement and return the plan lines.
+
+    Runs on a fresh cursor so the caller's pending results are untouched, and
+    inside a savepoint when in a transaction so a failing EXPLAIN cannot
+    poison it.
+    """
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    savepoint = None
+    _local.bypass = True
+    try:
+        if connection.in_atomic_block:
+            savepoint = connection.savepoint()
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        if savepoint:
+            connection.savepoint_commit(savepoint)
+    except Exception as e:
+        if savepoint:
+            connection.savepoint_rollback(savepoint)
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        _local.bypass = False
+    return [' | '.join(str(column) for column in row) for row in rows]
+
+
+def _backup(path):
+    return f'{path}.1'
+
+
+def write_entry(entry):
+    """Append an entry to SLOW_QUERY_LOG_FILE, first moving the file to
+    <file>.1 (replacing the previous one) once it would pass
+    SLOW_QUERY_LOG_MAX_BYTES. A lock file serializes writers across
+    processes, so rotation happens once and lines never interleave."""
+    path = settings.SLOW_QUERY_LOG_FILE
+    if not path:
+        return
+    line = json.dumps(entry, default=str) + '\n'
+    with _write_lock:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(f'{path}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                size = 0
+            if size and size + len(line) > settings.SLOW_QUERY_LOG_MAX_BYTES:
+                os.replace(path, _backup(path))
+            with open(path, 'a', encoding='utf-8') as log_file:
+                log_file.write(line)
+
+
+class SlowQueryLogger:
+    """execute_wrapper() hook logging statements slower than SLOW_QUERY_MS.
+
+    Each slow statement is written to SLOW_QUERY_LOG_FILE as one JSON line
+    with its parameters, the view and project stack it came from, and - for
+    the first SLOW_QUERY_EXPLAIN_LIMIT occurrences of its shape - the query
+    plan. Installed on every connection by apps.core.signals.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.threshold = settings.SLOW_QUERY_MS / 1000
+        self.explain_limit = settings.SLOW_QUERY_EXPLAIN_LIMIT
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'bypass', False):
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                self.log(sql, params, many, elapsed, failed)
+
+    def log(self, sql, params, many, elapsed, failed):
+        shape = fingerprint(sql)
+        occurrence = _occurrence(shape)
+        view, stack = _origin()
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'pid': os.getpid(),
+            'alias': self.connection.alias,
+            'fingerprint': shape,
+            'normalized': normalize_sql(sql),
+            'sql': sql,
+            'params': repr(params)[:MAX_PARAMS_LENGTH],
+            'many': many,
+            'duration_ms': round(elapsed * 1000, 3),
+            'failed': failed,
+            'view': view,
+            'origin': stack[-1] if stack else None,
+            'stack': stack,
+        }
+        if (
+            occurrence <= self.explain_limit
+            and not failed and not many
+            and sql.lstrip().upper().startswith(EXPLAINABLE)
+            and not self.connection.needs_rollback
+        ):
+            entry['explain'] = explain(self.connection, sql, params)
+
+        logger.warning(
+            'Slow query (%.1f ms) [%s] from %s: %s',
+            entry['duration_ms'], shape, entry['origin'] or 'unknown', entry['normalized'][:200],
+        )
+        try:
+            write_entry(entry)
+        except OSError:
+            logger.exception('Could not write slow query log')
+
+
+def install(connection):
+    """Add the slow query logger to a connection once"""
+    if settings.SLOW_QUERY_MS <= 0:
+        return
+    if any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        return
+    # Outermost, so execute_wrapper() contexts pushed and popped later keep
+    # their stack discipline
+    connection.execute_wrappers.insert(0, SlowQueryLogger(connection))
+
+
+def read_entries(path=None):
+    """Entries of the log and its rotated predecessor, oldest first; of a
+    file larger than SLOW_QUERY_LOG_MAX_BYTES only the newest part is read"""
+    path = path or settings.SLOW_QUERY_LOG_FILE
+    if not path:
+        return
+    for name in (_backup(path), path):
+        try:
+            log_file = open(name, 'rb')
+        except FileNotFoundError:
+            continue
+        with log_file:
+            size = os.fstat(log_file.fileno()).st_size
+            if size > settings.SLOW_QUERY_LOG_MAX_BYTES:
+                log_file.seek(size - settings.SLOW_QUERY_LOG_MAX_BYTES)
+                log_file.readline()  # partial line
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(path=None, sort='total_ms', limit=20, with_params=False):
+    """Aggregate the slow query log by fingerprint, worst shapes first.
+
+    Bound values can be anything written to the database (password hashes
+    included), so unless with_params is set the example carries no params
+    and string literals in query plans are replaced with '?'.
+    """
+    shapes = {}
+    for entry in read_entries(path):
+        shape = shapes.get(entry['fingerprint'])
+        if shape is None:
+            shape = shapes[entry['fingerprint']] = {
+                'fingerprint': entry['fingerprint'],
+                'normalized': entry['normalized'],
+                'count': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'views': [],
+                'origins': [],
+                'example': None,
+                'explain': None,
+            }
+        shape['count'] += 1
+        shape['total_ms'] += entry['duration_ms']
+        shape['last_seen'] = entry['time']
+        if entry['duration_ms'] >= shape['max_ms']:
+            shape['max_ms'] = entry['duration_ms']
+            shape['example'] = {'sql': entry['sql'], 'duration_ms': entry['duration_ms']}
+            if with_params:
+                shape['example']['params'] = entry['params']
+        for key, value in (('views', entry.get('view')), ('origins', entry.get('origin'))):
+            if value and value not in shape[key]:
+                shape[key].append(value)
+        if entry.get('explain'):
+            shape['explain'] = entry['explain'] if with_params else [redact_strings(line) for line in entry['explain']]
+
+    for shape in shapes.values():
+        shape['total_ms'] = round(shape['total_ms'], 3)
+        shape['mean_ms'] = round(shape['total_ms'] / shape['count'], 3)
+    return sorted(shapes.values(), key=lambda shape: shape[sort], reverse=True)[:limit]
@@ -0,0 +1,30 @@
+import hashlib
+import re
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES\s*\(.*\)', re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals and placeholders become ?,
+    IN lists and multi-row VALUES collapse, whitespace is squeezed."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _VALUES_LIST.sub('VALUES (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def redact_strings(text):
+    """Replace quoted string literals, e.g. bound values in a query plan"""
+    return _STRING.sub("'?'", text)
+
+
+def fingerprint(sql):
+    """Short stable id for the shape of a statement"""
+    return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()[:16]
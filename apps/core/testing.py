@@ -0,0 +1,35 @@
+"""Test-suite helpers for keeping endpoints within their query budgets.
+
+Decorate a TestCase with ``enforce_query_budgets`` and every request made
+through the test client must stay within QUERY_BUDGETS for its URL name, or
+the request raises QueryBudgetExceeded. ``assert_query_budget`` checks an
+arbitrary block of code the same way.
+"""
+from contextlib import contextmanager
+from django.conf import settings
+from django.test.utils import override_settings
+from .querybudget import QueryBudgetExceeded, QueryInspector
+
+enforce_query_budgets = override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True)
+
+
+@contextmanager
+def assert_query_budget(max_queries=None, repeat_threshold=None, label='block'):
+    """Raise QueryBudgetExceeded if the block runs more than ``max_queries``
+    queries, or repeats one query shape more than ``repeat_threshold`` times
+    (QUERY_REPEAT_THRESHOLD by default)."""
+    if repeat_threshold is None:
+        repeat_threshold = settings.QUERY_REPEAT_THRESHOLD
+    inspector = QueryInspector()
+    with inspector.watch():
+        yield inspector
+    problems = inspector.violations(label, max_queries, repeat_threshold)
+    if problems:
+        raise QueryBudgetExceeded('\n'.join(problems))
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin: ``with self.assertQueryBudget(5): ...``"""
+
+    def assertQueryBudget(self, max_queries=None, repeat_threshold=None):
+        return assert_query_budget(max_queries, repeat_threshold, label=self.id())
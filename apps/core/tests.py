@@ -0,0 +1,468 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+import jwt
+from django.conf import settings
+from django.contrib import admin
+from django.db import connection
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from apps.requests.models import PURPOSE_PREFIX, ArchivedRequest, Request
+from apps.users.models import User
+from . import metrics, slowlog
+from .checks import check_rate_limit_costs
+from .db.pool import ConnectionPool
+from .middleware import ReplicaStickinessMiddleware
+from .models import IdempotencyKey
+from .ratelimit import get_client_ip
+from .testing import enforce_query_budgets
+
+# More rows per user than QUERY_REPEAT_THRESHOLD, so an N+1 shows up
+REQUESTS_PER_USER = 8
+
+
+def token(user):
+    return 'Bearer ' + jwt.encode({'user_id': str(user.user_id)}, settings.JWT_SECRET, algorithm='HS256')
+
+
+def api_url_names():
+    """URL names of every /api/ route"""
+    names = set()
+
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, route)
+            elif isinstance(pattern, URLPattern) and route.startswith('api/') and pattern.name:
+                names.add(pattern.name)
+    walk(get_resolver().url_patterns, '')
+    # Schema and documentation views are not database-backed
+    return names - {'schema', 'swagger-ui', 'redoc'}
+
+
+def make_user(n, role='Employee'):
+    return User.objects.create(
+        first_name=f'User{n}', last_name='Test', email=f'user{n}@example.com', phone=f'+2650000000{n:02d}',
+        role=role, password='password123',
+    )
+
+
+class APITestCase(TestCase):
+    """Users and requests shared by the API tests; files go to a scratch directory"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scratch = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            AUDIT_ASYNC=False, NOTIFICATIONS_ENABLED=True, REPORT_PACK_WORKERS=1,
+            ATTACHMENTS_DIR=f'{cls.scratch}/attachments', PROFILING_DIR=f'{cls.scratch}/profiles',
+            RATE_LIMIT={**settings.RATE_LIMIT, 'ENABLED': False},
+        )
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.scratch, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.partner = make_user(1, 'Partner')
+        cls.other_partner = make_user(2, 'Partner')
+        cls.employee = make_user(3)
+        cls.other_employee = make_user(4)
+        for requester in (cls.employee, cls.other_employee):
+            for i in range(REQUESTS_PER_USER):
+                Request.objects.create(
+                    request_by=requester.user_id, requester_name=str(requester),
+                    approver_id=cls.partner.user_id, approver_name=str(cls.partner),
+                    amount=100 + i, currency='MWK', purpose=f'Fuel for field visit {i}',
+                    status=('Pending', 'Approved', 'Rejected')[i % 3],
+                )
+        cls.pending = Request.objects.filter(request_by=cls.employee.user_id, status='Pending').first()
+
+    def setUp(self):
+        self.called = set()
+
+    def call(self, method, path, user=None, expected=200, **kwargs):
+        if user is not None:
+            kwargs['HTTP_AUTHORIZATION'] = token(user)
+        kwargs.setdefault('content_type', 'application/json')
+        response = getattr(self.client, method)(path, **kwargs)
+        self.assertEqual(response.status_code, expected, f'{method.upper()} {path}: {getattr(response, "content", b"")[:300]}')
+        if response.resolver_match:
+            self.called.add(response.resolver_match.url_name)
+        return response
+
+
+@enforce_query_budgets
+class QueryBudgetTests(APITestCase):
+    """Every API endpoint, called with more rows than QUERY_REPEAT_THRESHOLD,
+    stays within its QUERY_BUDGETS entry and repeats no query shape - any
+    violation raises QueryBudgetExceeded out of the test client."""
+
+    def test_every_endpoint_within_budget(self):
+        partner, employee = self.partner, self.employee
+        req = f'/api/requests/{self.pending.id}/'
+
+        # Users
+        self.call('get', '/api/users/')
+        self.call('get', '/api/users/', data={'search': 'User', 'limit': 2}, content_type=None)
+        self.call('post', '/api/users/login/', data={'email': employee.email, 'password': 'password123'})
+        self.call('post', '/api/users/signup/', data={
+            'first_name': 'New', 'last_name': 'User', 'email': 'new@example.com', 'phone': '+265999999999',
+            'password': 'password123',
+        })
+        self.call('post', '/api/users/import/', partner, data={'users': [
+            {'first_name': f'Imported{n}', 'last_name': 'User', 'email': f'imported{n}@example.com',
+             'phone': f'+26588888888{n}', 'password': 'password123'} for n in range(REQUESTS_PER_USER)
+        ]})
+        self.call('put', '/api/users/edit-user/', employee, data={'first_name': 'Renamed'})
+        self.call('put', '/api/users/update-password/', employee, data={
+            'currentPassword': 'password123', 'newPassword': 'password456',
+        })
+        self.call('post', '/api/users/reset-password/', data={'email': employee.email, 'new_password': 'password123'})
+
+        # Requests
+        self.call('get', '/api/requests/', partner)
+        self.call('get', '/api/requests/', employee)
+        self.call('get', '/api/requests/', partner, data={'search': 'fuel'}, content_type=None)
+        self.call('post', '/api/requests/', employee, expected=201, data={
+            'amount': '10.00', 'currency': 'USD', 'approver_id': str(partner.user_id), 'purpose': 'Stationery',
+        })
+        self.call('get', req, employee)
+        self.call('put', req, employee, data={'purpose': 'Fuel for the generator'})
+        self.call('get', f'{req}history/', employee)
+        self.call('get', '/api/requests/export/', partner)
+        pack = self.call('get', '/api/requests/export/pack/', partner)
+        b''.join(pack.streaming_content)
+
+        # Attachments
+        upload = self.call('post', f'{req}attachments/', employee, expected=201, data={'filename': 'a.txt', 'size': 5})
+        upload_url = f"{req}attachments/uploads/{upload.json()['upload_id']}/"
+        self.call('get', upload_url, employee)
+        attachment = self.call(
+            'put', upload_url, employee, expected=201, data=b'hello',
+            content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes 0-4/5',
+        ).json()
+        self.call('get', f'{req}attachments/', employee)
+        download = self.call('get', f"{req}attachments/{attachment['id']}/", employee)
+        b''.join(download.streaming_content)
+        download.close()
+        self.call('delete', f"{req}attachments/{attachment['id']}/", employee, expected=204)
+        upload = self.call('post', f'{req}attachments/', employee, expected=201, data={'filename': 'b.txt', 'size': 5})
+        self.call('delete', f"{req}attachments/uploads/{upload.json()['upload_id']}/", employee, expected=204)
+
+        # System
+        self.call('get', '/api/system/db-pool/', partner)
+        self.call('get', '/api/system/profiles/', partner)
+        self.call('get', '/api/system/profiles/missing/', partner, expected=404)
+        self.call('get', '/api/system/slow-queries/', partner)
+
+        # Writes that end a request's or a user's life go last
+        self.call('patch', req, partner, data={'status': 'Approved'})
+        other = Request.objects.filter(request_by=employee.user_id, status='Pending').first()
+        self.call('delete', f'/api/requests/{other.id}/', employee, expected=204)
+        self.call('delete', f'/api/users/delete/{self.other_employee.user_id}/', partner)
+        self.call('delete', '/api/users/delete-account/', employee)
+
+        # Batched sub-requests run on other threads, which cannot see this
+        # test's uncommitted rows; BatchTests covers them
+        self.assertEqual(api_url_names() - self.called - {'batch'}, set(), 'API endpoints not covered by this test')
+
+
+@enforce_query_budgets
+class IdempotencyTests(APITestCase):
+    """Keys live in the database, so a retry on any worker process is replayed"""
+
+    def create(self, key, purpose='Stationery', expected=201):
+        return self.call('post', '/api/requests/', self.employee, expected=expected, HTTP_IDEMPOTENCY_KEY=key, data={
+            'amount': '10.00', 'currency': 'USD', 'approver_id': str(self.partner.user_id), 'purpose': purpose,
+        })
+
+    def test_retry_is_replayed(self):
+        first = self.create('retry-1')
+        retry = self.create('retry-1')
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Request.objects.filter(purpose='Stationery').count(), 1)
+        self.create('retry-1', purpose='Printer paper', expected=422)
+
+        approve = {'status': 'Approved'}
+        req = f'/api/requests/{self.pending.id}/'
+        self.call('patch', req, self.partner, HTTP_IDEMPOTENCY_KEY='approve-1', data=approve)
+        retry = self.call('patch', req, self.partner, HTTP_IDEMPOTENCY_KEY='approve-1', data=approve)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_key_held_by_another_call(self):
+        self.create('held')
+        # As if the first call were still running on another worker
+        held = IdempotencyKey.objects.filter(status_code__isnull=False)
+        held.update(status_code=None, data=None, locked_until=timezone.now() + timedelta(minutes=1))
+        self.create('held', expected=409)
+        # A holder that died without finishing lets the next retry run
+        IdempotencyKey.objects.update(locked_until=timezone.now())
+        self.create('held')
+        self.assertEqual(Request.objects.filter(purpose='Stationery').count(), 2)
+
+
+@enforce_query_budgets
+@override_settings(BATCH_WORKERS=2, RATE_LIMIT={**settings.RATE_LIMIT, 'ENABLED': False})
+class BatchTests(TransactionTestCase):
+    """Sub-requests on worker threads, each on its own connection, held to
+    their own query budgets"""
+
+    def setUp(self):
+        self.partner = make_user(1, 'Partner')
+        self.employee = make_user(3)
+        for i in range(REQUESTS_PER_USER):
+            Request.objects.create(
+                request_by=self.employee.user_id, requester_name=str(self.employee),
+                approver_id=self.partner.user_id, approver_name=str(self.partner),
+                amount=100 + i, currency='MWK', purpose=f'Fuel for field visit {i}',
+                status=('Pending', 'Approved')[i % 2],
+            )
+
+    def test_dashboard(self):
+        response = self.client.post('/api/batch/', {'requests': [
+            {'id': 'users', 'path': '/api/users/', 'params': {'role': 'Partner'}},
+            {'id': 'inbox', 'path': '/api/requests/', 'params': {'status': 'Pending', 'limit': 5}},
+        ]}, content_type='application/json', HTTP_AUTHORIZATION=token(self.partner))
+        self.assertEqual(response.status_code, 200)
+        users, inbox = response.json()['responses']
+        self.assertEqual((users['id'], users['status']), ('users', 200))
+        self.assertEqual([user['email'] for user in users['body']], [self.partner.email])
+        self.assertEqual((inbox['id'], inbox['status']), ('inbox', 200))
+        self.assertEqual(inbox['body']['total'], REQUESTS_PER_USER // 2)
+        self.assertEqual(inbox['body']['statusCounts'], {'Pending': 4, 'Approved': 4, 'Rejected': 0})
+        self.assertEqual({req['status'] for req in inbox['body']['data']}, {'Pending'})
+        self.assertEqual(inbox['body']['data'][0]['requested_by']['email'], self.employee.email)
+
+    def test_file_endpoints_are_refused_before_running(self):
+        with mock.patch('apps.core.batch.dispatch') as dispatch:
+            response = self.client.post('/api/batch/', {'requests': [
+                {'path': '/api/users/'}, {'path': '/api/requests/export/'},
+            ]}, content_type='application/json', HTTP_AUTHORIZATION=token(self.partner))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not JSON', response.json()['error'])
+        dispatch.assert_not_called()
+
+
+@override_settings(PROFILING_SECRET='profiling-secret')
+class ProfilingSecretTests(APITestCase):
+    def test_secret_alone_reads_reports(self):
+        self.call('get', '/api/system/profiles/', HTTP_X_PROFILE_SECRET='profiling-secret')
+        self.call('get', '/api/system/profiles/missing/', expected=404, HTTP_X_PROFILE_SECRET='profiling-secret')
+
+    def test_wrong_secret_still_needs_a_token(self):
+        self.call('get', '/api/system/profiles/', expected=401, HTTP_X_PROFILE_SECRET='guess')
+        self.call('get', '/api/system/profiles/', self.partner, HTTP_X_PROFILE_SECRET='guess')
+        self.call('get', '/api/system/profiles/', self.employee, expected=403)
+
+    def test_non_ascii_secret_is_refused(self):
+        self.call('get', '/api/system/profiles/', expected=401, HTTP_X_PROFILE_SECRET='café')
+
+
+class ClientIPTests(SimpleTestCase):
+    def client_ip(self, trusted_proxies, forwarded):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded)
+        return get_client_ip(request, {'TRUSTED_PROXIES': trusted_proxies})
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(self.client_ip(0, '203.0.113.7'), '10.0.0.1')
+
+    def test_address_appended_by_the_outermost_trusted_proxy(self):
+        self.assertEqual(self.client_ip(1, '203.0.113.7'), '203.0.113.7')
+        # A client-supplied entry to the left is not believed
+        self.assertEqual(self.client_ip(1, '198.51.100.1, 203.0.113.7'), '203.0.113.7')
+        self.assertEqual(self.client_ip(2, '198.51.100.1, 203.0.113.7, 10.1.1.1'), '203.0.113.7')
+        self.assertEqual(self.client_ip(2, '203.0.113.7'), '203.0.113.7')
+
+
+class RateLimitCheckTests(SimpleTestCase):
+    def test_cost_above_capacity_is_an_error(self):
+        with override_settings(RATE_LIMIT={**settings.RATE_LIMIT, 'CAPACITY': 10, 'COSTS': {'login': 5, 'export_requests': 20}}):
+            errors = check_rate_limit_costs(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        self.assertIn("'export_requests'", errors[0].msg)
+        self.assertEqual(check_rate_limit_costs(None), [])
+
+
+@mock.patch('apps.core.middleware.replica_configured', return_value=True)
+@mock.patch('apps.core.middleware.pin_to_primary')
+class ReplicaStickinessTests(SimpleTestCase):
+    """/api/users/ writes skip the JWT middleware but must still pin"""
+
+    def write(self, status_code=200, user_id=None, **headers):
+        if user_id:
+            headers['HTTP_AUTHORIZATION'] = 'Bearer ' + jwt.encode({'user_id': user_id}, settings.JWT_SECRET, algorithm='HS256')
+        request = RequestFactory().put('/api/users/edit-user/', **headers)
+        ReplicaStickinessMiddleware(lambda request: HttpResponse(status=status_code))(request)
+
+    def test_token_user_pinned(self, pin, configured):
+        user_id = str(uuid.uuid4())
+        self.write(user_id=user_id)
+        pin.assert_called_once_with(user_id)
+
+    def test_nothing_pinned_without_a_valid_token_or_a_success(self, pin, configured):
+        self.write()
+        self.write(HTTP_AUTHORIZATION='Bearer forged')
+        self.write(status_code=400, user_id=str(uuid.uuid4()))
+        pin.assert_not_called()
+
+
+class FakeConnection:
+    """A DB-API connection whose health check waits for the ``server`` event"""
+
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+        self.info = SimpleNamespace(transaction_status=0)
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql):
+        self.server.wait()
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_health_check_does_not_hold_the_lock(self):
+        server = threading.Event()
+        server.set()
+        self.addCleanup(server.set)
+        pool = ConnectionPool(lambda: FakeConnection(server), max_size=2, health_check_after=0)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+
+        # The server stops answering while another thread checks `first`
+        server.clear()
+        checking = threading.Thread(target=pool.acquire)
+        checking.start()
+        checking.join(0.2)
+        self.assertTrue(checking.is_alive())
+        releasing = threading.Thread(target=pool.release, args=(second,))
+        releasing.start()
+        releasing.join(1)
+        self.assertFalse(releasing.is_alive())
+
+        server.set()
+        checking.join()
+        self.assertEqual(pool.snapshot()['in_use'], 1)
+
+
+class MetricsShardTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_finished_threads_leave_no_shard_behind(self):
+        # As under runserver, which starts a thread per request
+        for _ in range(50):
+            thread = threading.Thread(target=metrics.record, args=('shard_test', 'GET', 200, 0.01, 1, 0.001, 10))
+            thread.start()
+            thread.join()
+        self.assertEqual(metrics.collect()['shard_test'].count, 50)
+        self.assertLessEqual(len(metrics._shards), 1)
+
+    def test_scrape_sums_every_worker(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(setattr, metrics, '_process_file', None)
+        other = metrics.EndpointStats()
+        other.count, other.statuses = 3, {('GET', 200): 3}
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        metrics._write(directory / f'{os.getppid()}-live.json', {'shard_test': other})
+        metrics._write(directory / f'{exited.pid}-gone.json', {'shard_test': other})
+
+        metrics.record('shard_test', 'GET', 200, 0.01, 1, 0.001, 10)
+        with override_settings(METRICS_DIR=str(directory)):
+            self.assertEqual(metrics.collect_all()['shard_test'].count, 7)
+            # The exited worker's counts now live in retired.json, once
+            self.assertFalse((directory / f'{exited.pid}-gone.json').exists())
+            self.assertEqual(metrics.collect_all()['shard_test'].statuses, {('GET', 200): 7})
+
+
+class SlowQueryLogTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = f'{directory}/slow.jsonl'
+
+    def entry(self, duration_ms):
+        return {
+            'time': '2026-01-01T00:00:00Z', 'fingerprint': 'f', 'normalized': 'UPDATE users SET password = ?',
+            'sql': 'UPDATE users SET password = %s', 'params': "('$2b$12$secret',)", 'duration_ms': duration_ms,
+            'explain': ["Update on users  (cost=0.00..1.01 rows=1) | Filter: (password = '$2b$12$secret'::text)"],
+        }
+
+    def test_log_is_rotated_at_its_size_cap(self):
+        with override_settings(SLOW_QUERY_LOG_FILE=self.path, SLOW_QUERY_LOG_MAX_BYTES=2000):
+            for duration_ms in range(20):
+                slowlog.write_entry(self.entry(duration_ms))
+            self.assertLessEqual(os.path.getsize(self.path), 2000)
+            self.assertLessEqual(os.path.getsize(f'{self.path}.1'), 2000)
+            durations = [entry['duration_ms'] for entry in slowlog.read_entries()]
+        # The oldest entries are gone, the rest read back in order
+        self.assertEqual(durations, list(range(20 - len(durations), 20)))
+
+    def test_summary_redacts_bound_values(self):
+        with override_settings(SLOW_QUERY_LOG_FILE=self.path):
+            slowlog.write_entry(self.entry(300))
+            shape, = slowlog.summarize()
+            self.assertNotIn('secret', str(shape))
+            self.assertIn('cost=0.00..1.01', shape['explain'][0])
+            shape, = slowlog.summarize(with_params=True)
+            self.assertEqual(shape['example']['params'], "('$2b$12$secret',)")
+
+
+@skipUnless(connection.vendor == 'postgresql', 'operator classes are PostgreSQL-only')
+class PrefixIndexTests(TestCase):
+    """Prefix searches are served by the text_pattern_ops indexes, which
+    PostgreSQL needs for LIKE under any collation but C"""
+
+    def assertUsesIndexes(self, queryset, *indexes):
+        with connection.cursor() as cursor:
+            # The test tables are tiny; keep the planner off a sequential scan
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        for index in indexes:
+            self.assertIn(index, plan)
+
+    def test_user_directory_search(self):
+        self.assertUsesIndexes(
+            User.objects.filter(Q(first_name__istartswith='ad') | Q(last_name__istartswith='ad') | Q(email__istartswith='ad')),
+            'users_first_name_upper_idx', 'users_last_name_upper_idx', 'users_email_upper_idx',
+        )
+
+    def test_purpose_prefix_search(self):
+        for model, index in ((Request, 'requests_purpose_prefix_idx'), (ArchivedRequest, 'requests_archive_purpose_idx')):
+            self.assertUsesIndexes(model.objects.alias(purpose_prefix=PURPOSE_PREFIX).filter(purpose_prefix__startswith='FUEL'), index)
+
+    def test_request_admin_search(self):
+        # Purpose, requester name or approver name, each by its own index
+        for model, indexes in (
+            (Request, ('requests_purpose_prefix_idx', 'requests_requester_name_idx', 'requests_approver_name_idx')),
+            (ArchivedRequest, ('requests_archive_purpose_idx', 'requests_archive_req_name_idx', 'requests_archive_appr_name_idx')),
+        ):
+            queryset, _ = admin.site._registry[model].get_search_results(None, model.objects.all(), 'Fuel')
+            self.assertUsesIndexes(queryset, *indexes)
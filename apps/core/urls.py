@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('db-pool/', views.db_pool_stats, name='db_pool_stats'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:report_id>/', views.profile_detail, name='profile_detail'),
+    path('slow-queries/', views.slow_queries, name='slow_queries'),
+]
\ No newline at end of file
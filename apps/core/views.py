@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiResponse
+from . import batch as batching
+from .auth import is_partner
+from .db.pool import pool_stats
+from .metrics import render_prometheus
+from .profiling import is_profiling_allowed, list_reports, load_report
+from .serializers import BatchRequestSerializer, BatchResponseSerializer
+from .slowlog import SORT_KEYS, summarize
+
+
+@extend_schema(
+    tags=['System'],
+    summary='Database connection pool usage',
+    description='Per-alias connection pool counters for the worker process that served the call (Partners only). Empty when pooling is disabled.',
+    responses={
+        200: OpenApiResponse(description='Pool counters keyed by database alias'),
+        403: OpenApiResponse(description='Forbidden - Partners only')
+    }
+)
+@api_view(['GET'])
+def db_pool_stats(request):
+    if not is_partner(request):
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(pool_stats())
+
+
+@extend_schema(
+    tags=['System'],
+    summary='List profiling reports',
+    description='Most recent first. Reports are captured by sending X-Profile: 1 (or ?profile=1) on any request; X-Profile: sample uses the sampling profiler.',
+    responses={
+        200: OpenApiResponse(description='Report summaries'),
+        403: OpenApiResponse(description='Forbidden - Partners or X-Profile-Secret only')
+    }
+)
+@api_view(['GET'])
+def profile_list(request):
+    if not is_profiling_allowed(request):
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(list_reports())
+
+
+@extend_schema(
+    tags=['System'],
+    summary='Get profiling report',
+    description='Full report with profiler output and every SQL statement with its timing.',
+    responses={
+        200: OpenApiResponse(description='Profiling report'),
+        403: OpenApiResponse(description='Forbidden - Partners or X-Profile-Secret only'),
+        404: OpenApiResponse(description='Report not found or already evicted')
+    }
+)
+@api_view(['GET'])
+def profile_detail(request, report_id):
+    if not is_profiling_allowed(request):
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    report = load_report(report_id)
+    if report is None:
+        return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(report)
+
+
+@extend_schema(
+    tags=['System'],
+    summary='Slow query shapes',
+    description='Slow statements from the slow query log grouped by normalized SQL fingerprint, with their origin and captured query plan (Partners only).',
+    parameters=[
+        OpenApiParameter('sort', str, enum=list(SORT_KEYS), description='Order by total time (default), count or worst single run'),
+        OpenApiParameter('limit', int, description='Number of shapes to return (default 20)'),
+    ],
+    responses={
+        200: OpenApiResponse(description='Query shapes, worst first'),
+        400: OpenApiResponse(description='Invalid sort or limit'),
+        403: OpenApiResponse(description='Forbidden - Partners only')
+    }
+)
+@api_view(['GET'])
+def slow_queries(request):
+    if not is_partner(request):
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    sort = request.GET.get('sort', 'total_ms')
+    if sort not in SORT_KEYS:
+        return Response({'error': f"sort must be one of: {', '.join(SORT_KEYS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(summarize(sort=sort, limit=max(1, limit)))
+
+
+@extend_schema(
+    tags=['System'],
+    summary='Batch read requests',
+    description='Run several GET calls in one round trip, e.g. everything a dashboard loads at once. The caller is authenticated once and each sub-request is dispatched straight to its view, with the same access rules as calling it directly. Sub-requests run concurrently on up to BATCH_WORKERS threads; results come back in the order given, each with its own status. Only JSON endpoints under /api/ can be batched, at most BATCH_MAX_REQUESTS at a time.',
+    request=BatchRequestSerializer,
+    responses={
+        200: BatchResponseSerializer,
+        400: OpenApiResponse(description='Invalid batch, or a sub-request that is not an /api/ GET'),
+        404: OpenApiResponse(description='A sub-request path does not exist')
+    },
+    examples=[
+        OpenApiExample(
+            'Dashboard',
+            value={'requests': [
+                {'id': 'users', 'path': '/api/users/', 'params': {'role': 'Partner'}},
+                {'id': 'inbox', 'path': '/api/requests/', 'params': {'status': 'Pending', 'limit': 5}},
+            ]},
+            request_only=True
+        )
+    ]
+)
+@api_view(['POST'])
+def batch(request):
+    serializer = BatchRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        results = batching.run(request, serializer.validated_data['requests'])
+    except batching.BatchError as e:
+        return Response({'error': e.message}, status=e.status_code)
+    return Response({'responses': results})
+
+
+def metrics(request):
+    """Prometheus text exposition of the server's metrics, summed over the
+    worker processes sharing METRICS_DIR.
+
+    Exempt from JWT authentication; set METRICS_TOKEN to require a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def healthz(request):
+    """Liveness: the process is up and serving. Touches nothing else."""
+    return JsonResponse({'status': 'ok'})
+
+
+def readyz(request):
+    """Readiness: every configured database answers a trivial query"""
+    databases = {}
+    ready = True
+    for alias in settings.DATABASES:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            databases[alias] = 'ok'
+        except Exception as e:
+            databases[alias] = str(e)
+            ready = False
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'databases': databases},
+        status=200 if ready else 503,
+    )
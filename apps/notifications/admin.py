@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Notification
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['event', 'recipient_email', 'subject', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'event']
+    search_fields = ['recipient_email', '=request_id']
+    readonly_fields = ['created_at', 'sent_at', 'claimed_by', 'claimed_until', 'last_error']
@@ -0,0 +1,79 @@
+import json
+import sys
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+
+class BaseBackend:
+    """Sends a batch of Notifications.
+
+    send_messages() returns one entry per notification: None when it was
+    sent, or the error that should be retried.
+    """
+
+    def send_messages(self, notifications):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    """Print each notification, for development"""
+
+    lock = threading.Lock()
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send_messages(self, notifications):
+        with self.lock:
+            for notification in notifications:
+                self.stream.write(
+                    f'To: {notification.recipient_email}\nSubject: {notification.subject}\n\n{notification.body}\n'
+                    f"{'-' * 79}\n"
+                )
+            self.stream.flush()
+        return [None] * len(notifications)
+
+
+class FileBackend(BaseBackend):
+    """Append each notification to NOTIFICATION_FILE as a JSON line, for testing"""
+
+    lock = threading.Lock()
+
+    def send_messages(self, notifications):
+        path = Path(settings.NOTIFICATION_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = ''.join(
+            json.dumps({
+                'id': notification.id,
+                'event': notification.event,
+                'request_id': str(notification.request_id),
+                'to': notification.recipient_email,
+                'subject': notification.subject,
+                'body': notification.body,
+            }) + '\n'
+            for notification in notifications
+        )
+        with self.lock, open(path, 'a', encoding='utf-8') as log_file:
+            log_file.write(lines)
+        return [None] * len(notifications)
+
+
+class EmailBackend(BaseBackend):
+    """Send through Django's EMAIL_BACKEND, one connection per batch"""
+
+    def send_messages(self, notifications):
+        results = []
+        with get_connection(fail_silently=False) as connection:
+            for notification in notifications:
+                message = EmailMessage(
+                    notification.subject, notification.body, settings.DEFAULT_FROM_EMAIL,
+                    [notification.recipient_email], connection=connection,
+                )
+                try:
+                    message.send()
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+        return results
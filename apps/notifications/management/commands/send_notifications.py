@@ -0,0 +1,72 @@
+import signal
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.notifications import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        'Send queued request notifications with a pool of worker threads. Each worker claims '
+        'a batch of due notifications, sends it through NOTIFICATION_BACKEND and schedules '
+        'failures for retry with exponential backoff. Runs until interrupted unless --once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.NOTIFICATION_WORKERS, help='Worker threads')
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_BATCH_SIZE, help='Notifications claimed per batch')
+        parser.add_argument('--poll', type=float, default=settings.NOTIFICATION_POLL_SECONDS, help='Seconds to wait when nothing is due')
+        parser.add_argument('--once', action='store_true', help='Exit once nothing is due instead of polling')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.totals = {'sent': 0, 'failed': 0}
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop.set())
+
+        threads = [
+            threading.Thread(target=self.worker, name=f'notifications-{index}', daemon=True)
+            for index in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            # Let each worker finish recording the batch it is sending
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {self.totals['sent']} notification(s), {self.totals['failed']} failed"
+        ))
+
+    def worker(self):
+        backend = outbox.get_backend()
+        while not self.stop.is_set():
+            batch = []
+            try:
+                batch = outbox.claim(self.options['batch_size'])
+                if batch:
+                    sent, failed = outbox.deliver(batch, backend)
+                    with self.lock:
+                        self.totals['sent'] += sent
+                        self.totals['failed'] += failed
+            except Exception as e:
+                # Survive database hiccups; rows claimed by a failed batch are
+                # picked up again once their lease lapses
+                self.stderr.write(f'{threading.current_thread().name}: {type(e).__name__}: {e}')
+                batch = []
+            finally:
+                close_old_connections()
+            if not batch:
+                if self.options['once']:
+                    return
+                self.stop.wait(self.options['poll'])
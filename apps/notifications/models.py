@@ -0,0 +1,41 @@
+from django.db import models
+
+class Notification(models.Model):
+    """Outbox of messages about request lifecycle events, sent by `manage.py send_notifications`"""
+    EVENT_CHOICES = [
+        ('request_created', 'request_created'),
+        ('request_approved', 'request_approved'),
+        ('request_rejected', 'request_rejected'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+    
+    event = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    request_id = models.UUIDField()  # References Request.id
+    recipient_id = models.UUIDField()  # References User.user_id
+    recipient_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    # A worker owns the row until claimed_until; a crashed worker's claim lapses
+    claimed_by = models.CharField(max_length=64, blank=True, null=True)
+    claimed_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        db_table = 'notifications'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notifications_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} to {self.recipient_email} ({self.status})"
@@ -0,0 +1,119 @@
+import logging
+import random
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from apps.users.models import User
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+def get_backend():
+    return import_string(settings.NOTIFICATION_BACKEND)()
+
+
+def queue(req, event):
+    """Add the outbox row for a request event: approvers hear about new
+    requests, requesters about decisions.
+
+    Call it inside the transaction that makes the change, so the row commits
+    or rolls back with it and a crash cannot lose it; send_notifications
+    does the delivery. Costs a lookup of the recipient and one INSERT.
+    """
+    if not settings.NOTIFICATIONS_ENABLED:
+        return None
+    recipient_id = req.approver_id if event == 'request_created' else req.request_by
+    recipient = User.objects.filter(user_id=recipient_id).first()
+    if recipient is None:
+        # Nobody is left to tell
+        return None
+    notification = build(event, req, recipient)
+    notification.next_attempt_at = timezone.now()
+    notification.save()
+    return notification
+
+
+def build(event, req, recipient):
+    """The unsaved Notification of an event for its recipient"""
+    summary = f"{req.currency} {req.amount:,.2f} for {req.purpose}"
+
+    if event == 'request_created':
+        return Notification(
+            event=event, request_id=req.id, recipient_id=recipient.user_id, recipient_email=recipient.email,
+            subject=f"Request #{req.request_number} awaits your approval",
+            body=f"Hello {recipient.first_name},\n\n{req.requester_name or 'Unknown'} requested {summary}.\n",
+        )
+
+    decision = req.status.lower()
+    return Notification(
+        event=event, request_id=req.id, recipient_id=recipient.user_id, recipient_email=recipient.email,
+        subject=f"Request #{req.request_number} was {decision}",
+        body=f"Hello {recipient.first_name},\n\nYour request for {summary} was {decision} by {req.approver_name or 'Unknown'}.\n",
+    )
+
+
+def claim(batch_size):
+    """Claim up to batch_size due notifications for this worker.
+
+    A conditional UPDATE stamps the rows with a fresh token, so two workers
+    reading the same due rows cannot both claim one; the loser just gets
+    fewer rows.
+    """
+    now = timezone.now()
+    unclaimed = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    due = list(
+        Notification.objects.filter(unclaimed, status='Pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    token = uuid.uuid4().hex
+    Notification.objects.filter(unclaimed, id__in=due, status='Pending').update(
+        claimed_by=token, claimed_until=now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS),
+    )
+    return list(Notification.objects.filter(claimed_by=token))
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter, capped at an hour"""
+    delay = min(settings.NOTIFICATION_RETRY_SECONDS * 2 ** (attempts - 1), 3600)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+
+def deliver(notifications, backend):
+    """Send a claimed batch and record the outcome of each notification.
+
+    Returns (sent, failed) counts.
+    """
+    try:
+        results = backend.send_messages(notifications)
+    except Exception as e:
+        # The backend could not send anything (e.g. SMTP unreachable)
+        results = [e] * len(notifications)
+
+    now = timezone.now()
+    sent = [notification.id for notification, error in zip(notifications, results) if error is None]
+    if sent:
+        Notification.objects.filter(id__in=sent).update(
+            status='Sent', sent_at=now, attempts=F('attempts') + 1, claimed_by=None, claimed_until=None, last_error=None,
+        )
+
+    failed = 0
+    for notification, error in zip(notifications, results):
+        if error is None:
+            continue
+        failed += 1
+        attempts = notification.attempts + 1
+        gave_up = attempts >= settings.NOTIFICATION_MAX_ATTEMPTS
+        Notification.objects.filter(id=notification.id).update(
+            status='Failed' if gave_up else 'Pending', attempts=attempts,
+            next_attempt_at=now if gave_up else now + retry_delay(attempts),
+            claimed_by=None, claimed_until=None, last_error=f'{type(error).__name__}: {error}'[:2000],
+        )
+        log = logger.error if gave_up else logger.warning
+        log('Notification %s to %s failed (attempt %d): %s', notification.id, notification.recipient_email, attempts, error)
+    return len(sent), failed
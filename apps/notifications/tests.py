@@ -0,0 +1,20 @@
+from apps.core.tests import APITestCase
+from .models import Notification
+
+
+class OutboxTests(APITestCase):
+    def test_rows_written_with_the_change(self):
+        created = self.call('post', '/api/requests/', self.employee, expected=201, data={
+            'amount': '10.00', 'currency': 'USD', 'approver_id': str(self.partner.user_id), 'purpose': 'Stationery',
+        }).json()
+        self.call('patch', f"/api/requests/{created['id']}/", self.partner, data={'status': 'Rejected'})
+        # No audit flush or background thread involved
+        self.assertEqual(
+            list(Notification.objects.values_list('event', 'recipient_email', 'status')),
+            [('request_created', self.partner.email, 'Pending'), ('request_rejected', self.employee.email, 'Pending')],
+        )
+        self.assertIn('was rejected by User1 Test', Notification.objects.last().body)
+
+    def test_no_row_when_the_transition_fails(self):
+        self.call('patch', f'/api/requests/{self.pending.id}/', self.other_partner, expected=403, data={'status': 'Approved'})
+        self.assertFalse(Notification.objects.exists())
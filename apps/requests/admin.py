@@ -1,9 +1,86 @@
 from django.contrib import admin
-from .models import Request
+from django.db.models import Q
+from django.db.models.functions import Upper
+from apps.core.admin import LargeTableAdmin
+from . import names
+from .models import PURPOSE_PREFIX, PURPOSE_PREFIX_LENGTH, ArchivedRequest, Attachment, Request, RequestAudit
+
 
 @admin.register(Request)
-class RequestAdmin(admin.ModelAdmin):
-    list_display = ['request_number', 'purpose', 'amount', 'currency', 'status', 'initiated_on']
-    list_filter = ['status', 'currency', 'initiated_on']
-    search_fields = ['purpose', 'request_number']
-    readonly_fields = ['id', 'request_id', 'request_number', 'created_at', 'updated_at']
\ No newline at end of file
+class RequestAdmin(LargeTableAdmin):
+    list_display = ['request_number', 'purpose', 'amount', 'currency', 'status', 'requester', 'approver', 'updated_at']
+    list_filter = ['status', 'currency']
+    # Only orders an index can serve
+    ordering = ['-updated_at', '-id']
+    sortable_by = ['request_number', 'updated_at']
+    search_fields = ['purpose']
+    search_help_text = 'Request number, or the start of the purpose or of the requester\'s or approver\'s name'
+    readonly_fields = [
+        'id', 'request_id', 'request_number', 'requester_name', 'approver_name', 'created_at', 'updated_at'
+    ]
+    
+    @admin.display(description='Requested by')
+    def requester(self, obj):
+        return obj.requester_name or 'Unknown'
+    
+    @admin.display(description='Approver')
+    def approver(self, obj):
+        return obj.approver_name or 'Unknown'
+    
+    def save_model(self, request, obj, form, change):
+        # Copy the names as the API does on create
+        for field, value in names.for_request(obj.request_by, obj.approver_id).items():
+            setattr(obj, field, value)
+        super().save_model(request, obj, form, change)
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Prefix matches only, each served by an index, instead of icontains scans"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        
+        purpose = Q(purpose_prefix__startswith=term[:PURPOSE_PREFIX_LENGTH].upper())
+        if len(term) > PURPOSE_PREFIX_LENGTH:
+            purpose &= Q(purpose__istartswith=term)
+        upper = term.upper()
+        matches = purpose | Q(requester_upper__startswith=upper) | Q(approver_upper__startswith=upper)
+        if term.isdigit():
+            matches |= Q(request_number=int(term))
+        return queryset.alias(
+            purpose_prefix=PURPOSE_PREFIX, requester_upper=Upper('requester_name'), approver_upper=Upper('approver_name'),
+        ).filter(matches), False
+
+@admin.register(ArchivedRequest)
+class ArchivedRequestAdmin(RequestAdmin):
+    # Rows arrive through archive_requests only
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(RequestAudit)
+class RequestAuditAdmin(LargeTableAdmin):
+    list_display = ['request_id', 'action', 'actor_id', 'created_at']
+    list_filter = ['action']
+    # Newest first by primary key; created_at is not indexed on its own
+    ordering = ['-id']
+    sortable_by = []
+    search_fields = ['=request_id', '=actor_id']
+    
+    # Append-only: entries are written by apps.requests.audit
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Attachment)
+class AttachmentAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'request_id', 'content_type', 'size', 'uploaded_by', 'created_at']
+    search_fields = ['=request_id', 'filename', '=sha256']
+    readonly_fields = ['id', 'request_id', 'uploaded_by', 'filename', 'content_type', 'size', 'sha256', 'created_at']
+    
+    # Files arrive through the upload API, which also stores the bytes
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,173 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import ArchivedRequest, Request
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STATUSES = ('Approved', 'Rejected')
+VERSION_KEY = 'requests:archive:version'
+
+
+def needs_archive(status_filter):
+    """Only closed requests are archived, so Pending-only queries skip the archive"""
+    return status_filter != 'Pending'
+
+
+def find(request_id):
+    """The request with this id from the live table or the archive, or None"""
+    return Request.objects.filter(id=request_id).first() or ArchivedRequest.objects.filter(id=request_id).first()
+
+
+def select(filters, include_archive=True):
+    """Requests matching filters from the live table, plus the archive if asked.
+
+    The UNION ALL is one statement; the result can be ordered and sliced and
+    always yields Request instances.
+    """
+    live = Request.objects.filter(filters)
+    if not include_archive:
+        return live
+    return live.order_by().union(ArchivedRequest.objects.filter(filters).order_by(), all=True)
+
+
+def count(filters, include_archive=True):
+    total = Request.objects.filter(filters).count()
+    if include_archive:
+        total += ArchivedRequest.objects.filter(filters).count()
+    return total
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def cache_is_shared():
+    """Whether invalidate() reaches the web workers. A LocMemCache lives in
+    one process, so archive_requests would only drop its own copy and the
+    workers would serve stale counts for ARCHIVE_COUNTS_CACHE_TIMEOUT."""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def invalidate():
+    """Drop cached archive counts after rows move in or out of the archive"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def archived_status_counts(request_by=None):
+    """Archived requests per status, for everyone or one requester.
+
+    The archive only changes when archive_requests runs, so the GROUP BY over
+    it is cached until then (or ARCHIVE_COUNTS_CACHE_TIMEOUT).
+    """
+    key = f"requests:archive:{_version()}:counts:{request_by or 'all'}"
+    counts = cache.get(key)
+    if counts is None:
+        archived = ArchivedRequest.objects.all()
+        if request_by:
+            archived = archived.filter(request_by=request_by)
+        counts = dict(archived.order_by().values_list('status').annotate(count=Count('id')))
+        cache.set(key, counts, settings.ARCHIVE_COUNTS_CACHE_TIMEOUT)
+    return counts
+
+
+def status_counts(request_by=None):
+    """Requests per status across the live table and the archive"""
+    live = Request.objects.all()
+    if request_by:
+        live = live.filter(request_by=request_by)
+    counts = {'Pending': 0, 'Approved': 0, 'Rejected': 0}
+    for name, value in live.order_by().values_list('status').annotate(count=Count('id')):
+        counts[name] = counts.get(name, 0) + value
+    for name, value in archived_status_counts(request_by).items():
+        counts[name] = counts.get(name, 0) + value
+    return counts
+
+
+def _move(source, target, filters, batch_size, progress=None):
+    """Move rows matching filters from one table to the other in batches.
+
+    Each batch is its own transaction: on PostgreSQL a single
+    DELETE ... RETURNING feeding an INSERT, elsewhere an INSERT ... SELECT
+    and a DELETE of the same ids.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in source._meta.concrete_fields)
+    source_table, target_table = quote(source._meta.db_table), quote(target._meta.db_table)
+    pk = source._meta.pk
+    moved = 0
+
+    while True:
+        batch = source.objects.filter(filters).order_by().values('pk')[:batch_size]
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                batch_sql, params = batch.query.sql_with_params()
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {source_table} WHERE {quote(pk.column)} IN ({batch_sql}) '
+                    f'RETURNING {columns}) INSERT INTO {target_table} ({columns}) SELECT {columns} FROM moved',
+                    params,
+                )
+                count = cursor.rowcount
+            else:
+                ids = [pk.get_db_prep_value(value, connection) for value in batch.values_list('pk', flat=True)]
+                if ids:
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(
+                        f'INSERT INTO {target_table} ({columns}) SELECT {columns} FROM {source_table} '
+                        f'WHERE {quote(pk.column)} IN ({placeholders})',
+                        ids,
+                    )
+                    cursor.execute(f'DELETE FROM {source_table} WHERE {quote(pk.column)} IN ({placeholders})', ids)
+                count = len(ids)
+        if not count:
+            break
+        moved += count
+        if progress:
+            progress(moved)
+    if moved:
+        invalidate()
+    return moved
+
+
+def archive_closed(older_than_days=None, batch_size=None, progress=None):
+    """Move Approved and Rejected requests untouched for older_than_days into the archive"""
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    filters = Q(status__in=CLOSED_STATUSES, updated_at__lt=cutoff)
+    return _move(Request, ArchivedRequest, filters, batch_size or settings.ARCHIVE_BATCH_SIZE, progress)
+
+
+def renumber_duplicates():
+    """Give each archived request whose request_number a live request also
+    has a fresh number, so the two can share the live table.
+
+    Each table has its own unique constraint; across the two, uniqueness is
+    only checked when a number is generated, so rows inserted around that
+    check (e.g. by raw SQL) can share one.
+    """
+    duplicates = ArchivedRequest.objects.filter(
+        request_number__in=Request.objects.values('request_number'),
+    ).order_by().values_list('pk', 'request_number')
+    for pk, number in duplicates:
+        new_number = Request().generate_unique_request_number()
+        ArchivedRequest.objects.filter(pk=pk).update(request_number=new_number)
+        logger.warning('Archived request #%s renumbered #%s: a live request has its number', number, new_number)
+
+
+def restore(batch_size=None, progress=None):
+    """Move every archived request back into the live table"""
+    renumber_duplicates()
+    return _move(ArchivedRequest, Request, Q(), batch_size or settings.ARCHIVE_BATCH_SIZE, progress)
@@ -0,0 +1,341 @@
+import fcntl
+import hashlib
+import mimetypes
+import os
+import re
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from rest_framework import status
+from .models import ArchivedRequest, Attachment, AttachmentUpload, Request
+
+# Bytes read from the request or a file per step, so nothing is ever held whole
+BLOCK_SIZE = 1024 * 1024
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class AttachmentError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        # Where the client should resume, for offset mismatches
+        self.offset = offset
+
+
+def upload_gone():
+    """The upload was cancelled, purged or deleted with its request mid-call"""
+    return AttachmentError('Upload not found', status.HTTP_404_NOT_FOUND)
+
+
+def root():
+    return Path(settings.ATTACHMENTS_DIR)
+
+
+def part_path(upload):
+    return root() / 'uploads' / f'{upload.id}.part'
+
+
+def blob_path(sha256):
+    return root() / 'blobs' / sha256[:2] / sha256[2:4] / sha256
+
+
+@contextmanager
+def blob_lock(*hashes):
+    """Hold exclusive locks on the directories of these hashes' blobs, so
+    storing a blob and removing it once unreferenced cannot interleave across
+    processes. Directories are locked once each, in sorted order."""
+    with ExitStack() as stack:
+        for directory in sorted({blob_path(sha256).parent for sha256 in hashes}):
+            directory.mkdir(parents=True, exist_ok=True)
+            fd = os.open(directory, os.O_RDONLY)
+            stack.callback(os.close, fd)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+
+
+def remove_unused_blobs(hashes):
+    """Remove the blobs no attachment refers to any more. Run after the
+    deleting transaction commits: a concurrent complete_upload() then either
+    committed its row already and keeps the blob, or stores it afresh."""
+    with blob_lock(*hashes):
+        shared = set(Attachment.objects.filter(sha256__in=hashes).values_list('sha256', flat=True))
+        for sha256 in set(hashes) - shared:
+            blob_path(sha256).unlink(missing_ok=True)
+
+
+def start_upload(request_id, user_id, filename, size, content_type=None):
+    if size > settings.ATTACHMENT_MAX_SIZE:
+        raise AttachmentError(
+            f'Attachments are limited to {settings.ATTACHMENT_MAX_SIZE} bytes',
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    upload = AttachmentUpload.objects.create(
+        request_id=request_id, uploaded_by=user_id, filename=filename,
+        content_type=content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream', size=size,
+    )
+    path = part_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def parse_content_range(header, size):
+    """(start, end) from 'bytes start-end/total', end inclusive"""
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise AttachmentError('Content-Range header must be "bytes <start>-<end>/<total>"')
+    start, end, total = (int(value) for value in match.groups())
+    if total != size or end < start or end >= size:
+        raise AttachmentError(f'Content-Range does not fit an upload of {size} bytes')
+    return start, end
+
+
+def append_chunk(upload, stream, content_range, content_length):
+    """Stream one chunk from the request body into the upload's part file.
+
+    The chunk must start where the upload left off. A flock on the part file
+    turns away a concurrent chunk for the same upload. If the client drops
+    mid-chunk, the bytes that did arrive are kept so it can resume from there.
+    Returns the new offset.
+    """
+    start, end = parse_content_range(content_range, upload.size)
+    length = end - start + 1
+    if content_length != length:
+        raise AttachmentError('Content-Length does not match Content-Range')
+
+    try:
+        part = open(part_path(upload), 'r+b')
+    except FileNotFoundError:
+        raise upload_gone()
+    with part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise AttachmentError('Another chunk of this upload is in progress', status.HTTP_409_CONFLICT)
+
+        # Re-read under the lock: another chunk may have just finished
+        try:
+            upload.refresh_from_db(fields=['received'])
+        except AttachmentUpload.DoesNotExist:
+            raise upload_gone()
+        if start != upload.received:
+            raise AttachmentError(
+                f'Expected a chunk starting at byte {upload.received}', status.HTTP_409_CONFLICT,
+                offset=upload.received,
+            )
+
+        part.seek(start)
+        part.truncate()
+        written = 0
+        try:
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+        except OSError:
+            # The client went away mid-chunk; keep what arrived
+            pass
+        finally:
+            part.flush()
+            os.fsync(part.fileno())
+            AttachmentUpload.objects.filter(id=upload.id).update(
+                received=start + written, updated_at=timezone.now(),
+            )
+            upload.received = start + written
+    if written < length:
+        raise AttachmentError(
+            f'Chunk ended after {written} of {length} bytes', offset=upload.received,
+        )
+    return upload.received
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload):
+    """Turn a fully received upload into an Attachment.
+
+    The content is hashed and stored once per hash, so every attachment with
+    that hash shares one blob. The blob is in place before the row commits,
+    and both happen under the hash's blob_lock(): a concurrent delete of the
+    last other attachment with this hash cannot remove it in between.
+
+    The request's row is locked while the attachment is added. A request
+    deleted first is seen and the upload dropped; one deleted after waits for
+    this row to commit and removes the attachment with the rest.
+    """
+    part = part_path(upload)
+    try:
+        sha256 = hash_file(part)
+    except FileNotFoundError:
+        raise upload_gone()
+    blob = blob_path(sha256)
+    with blob_lock(sha256):
+        with transaction.atomic():
+            request_exists = any(
+                model.objects.select_for_update().filter(id=upload.request_id).exists()
+                for model in (Request, ArchivedRequest)
+            )
+            if request_exists:
+                if blob.exists():
+                    part.unlink()
+                else:
+                    os.replace(part, blob)
+                attachment = Attachment.objects.create(
+                    request_id=upload.request_id, uploaded_by=upload.uploaded_by, filename=upload.filename,
+                    content_type=upload.content_type, size=upload.size, sha256=sha256,
+                )
+            upload.delete()
+    if not request_exists:
+        part.unlink(missing_ok=True)
+        raise AttachmentError('Request not found', status.HTTP_404_NOT_FOUND)
+    return attachment
+
+
+def cancel_upload(upload):
+    part_path(upload).unlink(missing_ok=True)
+    upload.delete()
+
+
+def delete_attachment(attachment):
+    """Delete the attachment, and its bytes once nothing else refers to them"""
+    with transaction.atomic():
+        attachment.delete()
+        transaction.on_commit(lambda: remove_unused_blobs([attachment.sha256]))
+
+
+def delete_for_requests(request_ids):
+    """Delete the attachments and unfinished uploads of deleted requests.
+
+    Call it once the requests are deleted, with their ids collected before:
+    an upload that completed meanwhile has committed its attachment by then
+    (see complete_upload). Files go once the transaction commits.
+    """
+    attachments = Attachment.objects.filter(request_id__in=request_ids)
+    uploads = AttachmentUpload.objects.filter(request_id__in=request_ids)
+    hashes = set(attachments.values_list('sha256', flat=True))
+    parts = [part_path(upload) for upload in uploads]
+    if not hashes and not parts:
+        return
+    attachments.delete()
+    uploads.delete()
+
+    def remove_files():
+        for path in parts:
+            path.unlink(missing_ok=True)
+        if hashes:
+            remove_unused_blobs(hashes)
+    transaction.on_commit(remove_files)
+
+
+def purge_stale_uploads(hours):
+    """Drop uploads not touched for the given number of hours; returns how many"""
+    stale = AttachmentUpload.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=hours))
+    count = 0
+    for upload in stale.iterator():
+        cancel_upload(upload)
+        count += 1
+    return count
+
+
+class RangeFile:
+    """A window of an open file. Reads stop at the end of the window, and
+    fileno() lets the server sendfile() it: gunicorn sends Content-Length
+    bytes from the current file position."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) for a single 'bytes=' range, None for the whole file.
+
+    Raises AttachmentError(416) for ranges outside the file.
+    """
+    match = RANGE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise AttachmentError('Requested range not satisfiable', status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+    return start, end
+
+
+def download_response(attachment, range_header=None):
+    """Serve an attachment, honouring a single byte range.
+
+    With ATTACHMENT_SENDFILE_HEADER set, the front-end server (nginx
+    X-Accel-Redirect, Apache/lighttpd X-Sendfile) sends the bytes, ranges
+    included. Otherwise FileResponse hands the open file to the WSGI server,
+    which uses sendfile() where it can.
+    """
+    path = blob_path(attachment.sha256)
+    if not path.exists():
+        raise AttachmentError('Attachment content is missing', status.HTTP_404_NOT_FOUND)
+
+    header = settings.ATTACHMENT_SENDFILE_HEADER
+    if header:
+        response = HttpResponse(content_type=attachment.content_type)
+        if header.lower() == 'x-accel-redirect':
+            response[header] = settings.ATTACHMENT_SENDFILE_PREFIX.rstrip('/') + '/' + str(path.relative_to(root()))
+        else:
+            response[header] = str(path)
+    else:
+        try:
+            byte_range = parse_range(range_header, attachment.size)
+        except AttachmentError:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{attachment.size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=attachment.content_type)
+        else:
+            start, end = byte_range
+            response = FileResponse(
+                RangeFile(open(path, 'rb'), start, end - start + 1),
+                status=status.HTTP_206_PARTIAL_CONTENT, content_type=attachment.content_type,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{attachment.size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = content_disposition_header(True, attachment.filename)
+    # Content is immutable per hash
+    response['ETag'] = f'"{attachment.sha256}"'
+    return response
@@ -0,0 +1,125 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import RequestAudit
+
+logger = logging.getLogger(__name__)
+
+# Sentinel telling the flusher to write what it holds and exit
+_STOP = object()
+
+_lock = threading.Lock()
+_queue = None
+_flusher = None
+_pid = None
+_stats = {'queued': 0, 'written': 0, 'inline': 0, 'failed': 0}
+
+
+def record(request_id, action, actor_id, changes=None):
+    """Log a change to a request once the surrounding transaction commits.
+
+    Outside a transaction the entry is handed over immediately; inside one
+    it is dropped if the transaction rolls back.
+    """
+    entry = RequestAudit(request_id=request_id, action=action, actor_id=actor_id, changes=changes or {})
+    transaction.on_commit(lambda: _enqueue(entry))
+
+
+def _enqueue(entry):
+    entry.created_at = timezone.now()
+    if not settings.AUDIT_ASYNC:
+        _write([entry])
+        return
+    try:
+        _get_queue().put_nowait(entry)
+        _stats['queued'] += 1
+    except queue.Full:
+        # Back-pressure: the caller pays for its own insert rather than the
+        # history losing an entry
+        _stats['inline'] += 1
+        _write([entry])
+
+
+def _get_queue():
+    """Return this process's queue, starting its flusher on first use.
+
+    Checked against the pid so a forked worker starts its own flusher
+    instead of using the parent's, which did not survive the fork.
+    """
+    global _queue, _flusher, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _queue = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+                _flusher = threading.Thread(target=_run, args=(_queue,), name='audit-flusher', daemon=True)
+                _flusher.start()
+                _pid = os.getpid()
+    return _queue
+
+
+def _run(entries):
+    interval = settings.AUDIT_FLUSH_MS / 1000
+    batch_size = settings.AUDIT_BATCH_SIZE
+    stopping = False
+    while not stopping:
+        # Sleep until there is work, then gather up to batch_size entries or
+        # whatever arrives within the flush interval
+        first = entries.get()
+        batch = [] if first is _STOP else [first]
+        stopping = first is _STOP
+        deadline = time.monotonic() + interval
+        while not stopping and len(batch) < batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = entries.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                stopping = True
+            else:
+                batch.append(entry)
+        if batch:
+            _write(batch)
+            close_old_connections()
+        for _ in range(len(batch) + stopping):
+            entries.task_done()
+
+
+def _write(batch):
+    try:
+        RequestAudit.objects.bulk_create(batch)
+        _stats['written'] += len(batch)
+    except Exception:
+        _stats['failed'] += len(batch)
+        # Keep the lost entries recoverable from the logs
+        logger.exception(
+            'Failed to write %d audit entries: %s', len(batch),
+            [(str(e.request_id), e.action, str(e.actor_id), e.changes, e.created_at.isoformat()) for e in batch],
+        )
+
+
+def flush():
+    """Block until every queued entry has been written"""
+    if _queue is not None and _pid == os.getpid():
+        _queue.join()
+
+
+def stats():
+    """Counters for this process, plus the current queue depth"""
+    depth = _queue.qsize() if _queue is not None and _pid == os.getpid() else 0
+    return {**_stats, 'pending': depth}
+
+
+@atexit.register
+def _shutdown():
+    if _flusher is not None and _pid == os.getpid() and _flusher.is_alive():
+        _queue.put(_STOP)
+        _flusher.join(timeout=5)
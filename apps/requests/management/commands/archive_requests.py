@@ -0,0 +1,40 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.requests import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move Approved and Rejected requests not updated for ARCHIVE_AFTER_DAYS into the '
+        'requests_archive table, in batches. List, detail and export read the archive '
+        'transparently. Run it nightly, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help='Archive requests closed longer ago than this')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE, help='Rows moved per transaction')
+        parser.add_argument('--restore', action='store_true', help='Move every archived request back into the live table')
+
+    def handle(self, *args, **options):
+        if not archive.cache_is_shared():
+            raise CommandError(
+                'The web workers cache archive counts; set CACHE_BACKEND to a cache they share '
+                '(the database cache, Redis or Memcached) so this run can invalidate them'
+            )
+        started = time.perf_counter()
+
+        def progress(moved):
+            self.stdout.write(f'  moved {moved}', ending='\r')
+
+        if options['restore']:
+            moved = archive.restore(options['batch_size'], progress)
+            action = 'Restored'
+        else:
+            moved = archive.archive_closed(options['days'], options['batch_size'], progress)
+            action = 'Archived'
+        if moved:
+            self.stdout.write(f'  moved {moved}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {moved} request(s) in {time.perf_counter() - started:.1f}s'
+        ))
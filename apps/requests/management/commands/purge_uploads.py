@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.requests import attachments
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove attachment uploads that were started but not finished within '
+        'ATTACHMENT_UPLOAD_EXPIRY_HOURS, with their partial files. Run it hourly, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=settings.ATTACHMENT_UPLOAD_EXPIRY_HOURS,
+            help='Remove uploads idle for longer than this',
+        )
+
+    def handle(self, *args, **options):
+        purged = attachments.purge_stale_uploads(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {purged} stale upload(s)'))
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['request_by'], name='requests_request_by_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['approver_id', 'status'], name='requests_approver_status_idx'),
+        ),
+    ]
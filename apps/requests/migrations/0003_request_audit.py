@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 15:23
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0002_request_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestAudit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.UUIDField()),
+                ('action', models.CharField(choices=[('create', 'create'), ('status', 'status'), ('edit', 'edit'), ('delete', 'delete')], max_length=10)),
+                ('actor_id', models.UUIDField()),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'request_audit',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['request_id', 'created_at'], name='request_audit_request_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-19 15:29
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0003_request_audit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRequest',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('request_id', models.UUIDField(default=uuid.uuid4, editable=False)),
+                ('request_number', models.IntegerField(unique=True)),
+                ('request_by', models.UUIDField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('currency', models.CharField(choices=[('MWK', 'MWK'), ('USD', 'USD')], max_length=3)),
+                ('approver_id', models.UUIDField()),
+                ('purpose', models.TextField()),
+                ('description', models.TextField(blank=True, null=True)),
+                ('initiated_on', models.DateTimeField(auto_now_add=True)),
+                ('required_on', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected')], default='Pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'requests_archive',
+                'ordering': ['-updated_at'],
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status', 'updated_at'], name='requests_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(fields=['request_by'], name='requests_archive_by_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(fields=['approver_id', 'status'], name='requests_archive_approver_idx'),
+        ),
+    ]
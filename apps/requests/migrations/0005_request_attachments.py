@@ -0,0 +1,50 @@
+# Generated by Django 5.0.1 on 2026-10-19 15:48
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0004_requests_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('request_id', models.UUIDField()),
+                ('uploaded_by', models.UUIDField()),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'request_attachments',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['request_id', 'created_at'], name='request_attachments_req_idx'), models.Index(fields=['sha256'], name='request_attachments_sha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AttachmentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('request_id', models.UUIDField()),
+                ('uploaded_by', models.UUIDField()),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('received', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'request_attachment_uploads',
+                'indexes': [models.Index(fields=['updated_at'], name='attachment_uploads_upd_idx')],
+            },
+        ),
+    ]
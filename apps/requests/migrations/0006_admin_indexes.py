@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:01
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0005_request_attachments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(fields=['updated_at', 'id'], name='requests_archive_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.functions.text.Left('purpose', 100)), name='requests_archive_purpose_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['updated_at', 'id'], name='requests_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(django.db.models.functions.text.Upper(django.db.models.functions.text.Left('purpose', 100)), name='requests_purpose_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.0.1 on 2026-10-19 16:17
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+
+BATCH_SIZE = 10000
+
+
+def backfill_names(apps, schema_editor):
+    """Copy every user's full name onto their requests before the indexes are
+    built. Rows are updated in primary key ranges, each committed on its own, so
+    writers are never held up by more than one batch."""
+    User = apps.get_model('users', 'User')
+
+    def name_of(field):
+        user = User.objects.filter(user_id=OuterRef(field)).annotate(
+            full_name=Concat('first_name', Value(' '), 'last_name', output_field=models.CharField()),
+        )
+        return Coalesce(Subquery(user.values('full_name')[:1]), Value(''))
+
+    for model_name in ('Request', 'ArchivedRequest'):
+        model = apps.get_model('requests', model_name)
+        remaining = model.objects.order_by('pk')
+        while True:
+            ids = list(remaining.values_list('pk', flat=True)[:BATCH_SIZE])
+            if not ids:
+                break
+            model.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(
+                requester_name=name_of('request_by'), approver_name=name_of('approver_id'),
+            )
+            remaining = model.objects.filter(pk__gt=ids[-1]).order_by('pk')
+
+
+class Migration(migrations.Migration):
+    # Lets each backfill batch commit on its own
+    atomic = False
+
+    dependencies = [
+        ('requests', '0006_admin_indexes'),
+        ('users', '0003_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedrequest',
+            name='approver_name',
+            field=models.CharField(blank=True, default='', max_length=201),
+        ),
+        migrations.AddField(
+            model_name='archivedrequest',
+            name='requester_name',
+            field=models.CharField(blank=True, default='', max_length=201),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='approver_name',
+            field=models.CharField(blank=True, default='', max_length=201),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='requester_name',
+            field=models.CharField(blank=True, default='', max_length=201),
+        ),
+        migrations.RunPython(backfill_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(django.db.models.functions.text.Upper('requester_name'), name='requests_archive_req_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=models.Index(django.db.models.functions.text.Upper('approver_name'), name='requests_archive_appr_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(django.db.models.functions.text.Upper('requester_name'), name='requests_requester_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(django.db.models.functions.text.Upper('approver_name'), name='requests_approver_name_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:33
+
+import apps.core.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0007_request_names'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedrequest',
+            name='requests_archive_purpose_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='request',
+            name='requests_purpose_prefix_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper(django.db.models.functions.text.Left('purpose', 100)), name='requests_archive_purpose_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper(django.db.models.functions.text.Left('purpose', 100)), name='requests_purpose_prefix_idx'),
+        ),
+    ]
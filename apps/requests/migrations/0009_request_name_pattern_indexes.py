@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:33
+
+import apps.core.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0008_purpose_prefix_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedrequest',
+            name='requests_archive_req_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='archivedrequest',
+            name='requests_archive_appr_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='request',
+            name='requests_requester_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='request',
+            name='requests_approver_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('requester_name'), name='requests_archive_req_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrequest',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('approver_name'), name='requests_archive_appr_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('requester_name'), name='requests_requester_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('approver_name'), name='requests_approver_name_idx'),
+        ),
+    ]
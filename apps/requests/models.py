@@ -1,9 +1,21 @@
 import uuid
 import random
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Left, Upper
+from apps.core.indexes import PrefixIndex
 from apps.users.models import User
 
-class Request(models.Model):
+# Case-insensitive purpose prefix the admin searches on. The index is on a
+# bounded prefix because a btree entry cannot hold an arbitrarily long text.
+PURPOSE_PREFIX_LENGTH = 100
+PURPOSE_PREFIX = Upper(Left('purpose', PURPOSE_PREFIX_LENGTH))
+# Room for "<first_name> <last_name>"
+NAME_LENGTH = 201
+
+class AbstractRequest(models.Model):
+    """Columns shared by live requests and the archive, kept identical so rows
+    can be moved between the tables and read back with a UNION"""
     CURRENCY_CHOICES = [
         ('MWK', 'MWK'),
         ('USD', 'USD'),
@@ -22,6 +34,10 @@ class Request(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
     approver_id = models.UUIDField()  # References User.user_id
+    # Copies of the users' full names so lists, search and exports need no
+    # user lookups; kept in step by apps.requests.names, blank once a user is gone
+    requester_name = models.CharField(max_length=NAME_LENGTH, blank=True, default='')
+    approver_name = models.CharField(max_length=NAME_LENGTH, blank=True, default='')
     purpose = models.TextField()
     description = models.TextField(blank=True, null=True)
     initiated_on = models.DateTimeField(auto_now_add=True)
@@ -31,9 +47,27 @@ class Request(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        db_table = 'requests'
+        abstract = True
         ordering = ['-updated_at']
     
+    def __str__(self):
+        return f"Request #{self.request_number} - {self.purpose[:50]}"
+
+class Request(AbstractRequest):
+    class Meta(AbstractRequest.Meta):
+        db_table = 'requests'
+        indexes = [
+            models.Index(fields=['request_by'], name='requests_request_by_idx'),
+            models.Index(fields=['approver_id', 'status'], name='requests_approver_status_idx'),
+            # Status-filtered lists in recency order, and picking rows to archive
+            models.Index(fields=['status', 'updated_at'], name='requests_status_updated_idx'),
+            # Admin changelist order and search
+            models.Index(fields=['updated_at', 'id'], name='requests_updated_idx'),
+            PrefixIndex(PURPOSE_PREFIX, name='requests_purpose_prefix_idx'),
+            PrefixIndex(Upper('requester_name'), name='requests_requester_name_idx'),
+            PrefixIndex(Upper('approver_name'), name='requests_approver_name_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
         if not self.request_number:
             self.request_number = self.generate_unique_request_number()
@@ -43,9 +77,90 @@ class Request(models.Model):
         """Generate a unique request number between 10000-99999"""
         for _ in range(10):  # Try up to 10 times
             number = random.randint(10000, 99999)
-            if not Request.objects.filter(request_number=number).exists():
+            if not (Request.objects.filter(request_number=number).exists()
+                    or ArchivedRequest.objects.filter(request_number=number).exists()):
                 return number
         raise ValueError("Failed to generate a unique request number after multiple attempts.")
+
+class ArchivedRequest(AbstractRequest):
+    """Approved and Rejected requests moved out of the live table by
+    apps.requests.archive once they are older than ARCHIVE_AFTER_DAYS"""
+    class Meta(AbstractRequest.Meta):
+        db_table = 'requests_archive'
+        indexes = [
+            models.Index(fields=['request_by'], name='requests_archive_by_idx'),
+            models.Index(fields=['approver_id', 'status'], name='requests_archive_approver_idx'),
+            models.Index(fields=['updated_at', 'id'], name='requests_archive_updated_idx'),
+            PrefixIndex(PURPOSE_PREFIX, name='requests_archive_purpose_idx'),
+            PrefixIndex(Upper('requester_name'), name='requests_archive_req_name_idx'),
+            PrefixIndex(Upper('approver_name'), name='requests_archive_appr_name_idx'),
+        ]
+
+
+class RequestAudit(models.Model):
+    """Append-only history of changes to a request, written by apps.requests.audit"""
+    ACTION_CHOICES = [
+        ('create', 'create'),
+        ('status', 'status'),
+        ('edit', 'edit'),
+        ('delete', 'delete'),
+    ]
+    
+    request_id = models.UUIDField()  # References Request.id; kept after the request is deleted
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    actor_id = models.UUIDField()  # References User.user_id
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()  # When the change committed, not when it was flushed
+    
+    class Meta:
+        db_table = 'request_audit'
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['request_id', 'created_at'], name='request_audit_request_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} on {self.request_id} by {self.actor_id}"
+
+
+class Attachment(models.Model):
+    """A file attached to a request. The bytes live once per distinct sha256
+    under ATTACHMENTS_DIR; identical uploads share them."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    request_id = models.UUIDField()  # References Request.id (live or archived)
+    uploaded_by = models.UUIDField()  # References User.user_id
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'request_attachments'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['request_id', 'created_at'], name='request_attachments_req_idx'),
+            models.Index(fields=['sha256'], name='request_attachments_sha_idx'),
+        ]
     
     def __str__(self):
-        return f"Request #{self.request_number} - {self.purpose[:50]}"
\ No newline at end of file
+        return f"{self.filename} ({self.size} bytes)"
+
+
+class AttachmentUpload(models.Model):
+    """A resumable upload in progress; its bytes so far are in a part file"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    request_id = models.UUIDField()  # References Request.id
+    uploaded_by = models.UUIDField()  # References User.user_id
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'request_attachment_uploads'
+        indexes = [
+            models.Index(fields=['updated_at'], name='attachment_uploads_upd_idx'),
+        ]
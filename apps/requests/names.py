@@ -0,0 +1,44 @@
+import uuid
+from apps.users.models import User
+from .models import ArchivedRequest, Request
+
+
+def full_name(user):
+    return f"{user.first_name} {user.last_name}"
+
+
+def full_names(user_ids):
+    """{user_id: full name} for the given users, in one query"""
+    return {
+        user_id: f"{first_name} {last_name}"
+        for user_id, first_name, last_name in
+        User.objects.filter(user_id__in=user_ids).values_list('user_id', 'first_name', 'last_name')
+    }
+
+
+def for_request(request_by, approver_id):
+    """The requester_name and approver_name columns for a new or re-assigned
+    request; blank for a user that does not exist"""
+    # The requester usually comes from the token as a string
+    request_by, approver_id = uuid.UUID(str(request_by)), uuid.UUID(str(approver_id))
+    names = full_names({request_by, approver_id})
+    return {
+        'requester_name': names.get(request_by, ''),
+        'approver_name': names.get(approver_id, ''),
+    }
+
+
+def refresh(user_id, name, requester=True):
+    """Rewrite a user's name on every request that carries it, live and archived.
+
+    Set-based UPDATEs on the request_by and approver_id indexes, one per
+    column and table. updated_at is left alone: a renamed user does not
+    make their requests newer. Pass requester=False when the user's own
+    requests are already gone.
+    """
+    updated = 0
+    for model in (Request, ArchivedRequest):
+        if requester:
+            updated += model.objects.filter(request_by=user_id).update(requester_name=name)
+        updated += model.objects.filter(approver_id=user_id).update(approver_name=name)
+    return updated
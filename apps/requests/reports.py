@@ -0,0 +1,134 @@
+import concurrent.futures
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from itertools import groupby
+from django.conf import settings
+from . import archive, workbooks
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def workers():
+    return settings.REPORT_PACK_WORKERS or os.cpu_count() or 1
+
+
+def get_pool():
+    """This process's report pack pool, started on first use.
+
+    Workers are forked from a forkserver that has only imported the workbook
+    builder, never from a threaded server process, and are reused across
+    packs. A server worker that forks gets its own pool.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['apps.requests.workbooks'])
+            _pool = concurrent.futures.ProcessPoolExecutor(workers(), mp_context=context)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def member_name(requester_name, request_by):
+    """ZIP member name for a requester's workbook, unique per requester"""
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', requester_name).strip('-').lower() or 'unknown'
+    return f'{slug}-{str(request_by)[:8]}.xlsx'
+
+
+def partitions(filters):
+    """(member name, workbook rows) per requester, from one query ordered by request_by.
+
+    Rows are streamed from the database and grouped as they arrive, so only
+    one requester's rows are held at a time. Names come from the rows
+    themselves; the users table is not read.
+    """
+    rows = archive.select(filters).order_by('request_by', '-initiated_on').values_list(
+        'request_by', 'requester_name', 'currency', 'amount', 'approver_name', 'purpose', 'initiated_on',
+    )
+    for request_by, group in groupby(rows.iterator(chunk_size=settings.REPORT_PACK_CHUNK_SIZE), key=lambda row: row[0]):
+        group = list(group)
+        yield member_name(group[0][1] or 'Unknown', request_by), [
+            workbooks.export_row(
+                requester_name or 'Unknown', currency, amount, approver_name or 'Unknown', purpose, initiated_on,
+            )
+            for _, requester_name, currency, amount, approver_name, purpose, initiated_on in group
+        ]
+
+
+class ZipSink:
+    """Unseekable write target for ZipFile that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_pack(filters):
+    """Yield a ZIP of one workbook per requester, piece by piece as workbooks finish.
+
+    Requesters go to the process pool as they are read, at most two per
+    worker in flight, so memory stays flat however many there are. Finished
+    workbooks are written in completion order, stored rather than deflated
+    since .xlsx is already compressed. With a single worker they are built
+    inline.
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as pack:
+        if workers() <= 1:
+            for name, rows in partitions(filters):
+                pack.writestr(name, workbooks.build_workbook(rows))
+                yield sink.drain()
+        else:
+            yield from _stream_parallel(pack, sink, partitions(filters))
+    yield sink.drain()
+
+
+def _stream_parallel(pack, sink, parts):
+    pool = get_pool()
+    limit = workers() * 2
+    pending = {}
+
+    def write(done):
+        for future in done:
+            pack.writestr(pending.pop(future), future.result())
+        return sink.drain()
+
+    try:
+        for name, rows in parts:
+            pending[pool.submit(workbooks.build_workbook, rows)] = name
+            if len(pending) >= limit:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                yield write(done)
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            yield write(done)
+    except concurrent.futures.process.BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool next time
+        _discard_pool()
+        raise
+    finally:
+        # The client went away or a workbook failed: drop what is queued
+        for future in pending:
+            future.cancel()
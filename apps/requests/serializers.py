@@ -1,38 +1,57 @@
+import uuid
+from django.db import models
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
-from .models import Request
+from .models import Attachment, Request, RequestAudit
 from apps.users.models import User
 from apps.users.serializers import UserSerializer
 
+def users_by_id(requests):
+    """{user_id: User} for the requesters and approvers of the given requests, in one query"""
+    user_ids = {uuid.UUID(str(req.request_by)) for req in requests} | {uuid.UUID(str(req.approver_id)) for req in requests}
+    return User.objects.in_bulk(user_ids, field_name='user_id')
+
+class RequestListSerializer(serializers.ListSerializer):
+    """Looks up the users of a whole page of requests at once instead of two per row"""
+    def to_representation(self, data):
+        requests = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.users = users_by_id(requests)
+        return super().to_representation(requests)
+
 class RequestSerializer(serializers.ModelSerializer):
     approver = serializers.SerializerMethodField()
     requested_by = serializers.SerializerMethodField()
     
     class Meta:
         model = Request
+        list_serializer_class = RequestListSerializer
         fields = [
             'id', 'request_id', 'request_number', 'request_by', 'amount', 
             'currency', 'approver_id', 'purpose', 'description', 
             'initiated_on', 'required_on', 'status', 'created_at', 
-            'updated_at', 'approver', 'requested_by'
+            'updated_at', 'approver', 'requested_by', 'requester_name', 'approver_name'
+        ]
+        read_only_fields = [
+            'id', 'request_id', 'request_number', 'requester_name', 'approver_name', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'request_id', 'request_number', 'created_at', 'updated_at']
+    
+    def to_representation(self, instance):
+        if not isinstance(self.parent, RequestListSerializer):
+            # A single request: both users in one query
+            self.users = users_by_id([instance])
+        return super().to_representation(instance)
+    
+    def nested_user(self, user_id):
+        user = self.users.get(uuid.UUID(str(user_id)))
+        return UserSerializer(user).data if user is not None else None
     
     @extend_schema_field(UserSerializer)
     def get_approver(self, obj):
-        try:
-            user = User.objects.get(user_id=obj.approver_id)
-            return UserSerializer(user).data
-        except User.DoesNotExist:
-            return None
+        return self.nested_user(obj.approver_id)
     
     @extend_schema_field(UserSerializer)
     def get_requested_by(self, obj):
-        try:
-            user = User.objects.get(user_id=obj.request_by)
-            return UserSerializer(user).data
-        except User.DoesNotExist:
-            return None
+        return self.nested_user(obj.request_by)
 
 class RequestCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,6 +62,9 @@ class RequestCreateSerializer(serializers.ModelSerializer):
         ]
 
 class RequestUpdateSerializer(serializers.ModelSerializer):
+    # The model default would otherwise make status optional
+    status = serializers.ChoiceField(choices=Request.STATUS_CHOICES, required=True)
+    
     class Meta:
         model = Request
         fields = ['status']
@@ -56,6 +78,27 @@ class RequestEditSerializer(serializers.ModelSerializer):
             'description', 'required_on'
         ]
 
+class RequestAuditSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RequestAudit
+        fields = ['id', 'request_id', 'action', 'actor_id', 'changes', 'created_at']
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Attachment
+        fields = ['id', 'request_id', 'uploaded_by', 'filename', 'content_type', 'size', 'sha256', 'created_at']
+
+class AttachmentUploadStartSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    size = serializers.IntegerField(min_value=1, help_text="Total size of the file in bytes")
+
+class AttachmentUploadSerializer(serializers.Serializer):
+    upload_id = serializers.UUIDField()
+    offset = serializers.IntegerField(help_text="Bytes received so far; send the next chunk from here")
+    size = serializers.IntegerField()
+    chunk_size = serializers.IntegerField(help_text="Suggested chunk size in bytes")
+
 class RequestListResponseSerializer(serializers.Serializer):
     page = serializers.IntegerField(help_text="Current page number")
     limit = serializers.IntegerField(help_text="Items per page")
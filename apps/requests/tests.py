@@ -0,0 +1,163 @@
+import io
+import shutil
+import tempfile
+import threading
+import uuid
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from apps.core.tests import APITestCase
+from . import archive, attachments, transitions
+from .models import ArchivedRequest, Attachment, AttachmentUpload, Request
+
+
+class ArchiveCommandTests(SimpleTestCase):
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_refuses_process_local_cache(self):
+        # The web workers' cached archive counts could not be invalidated
+        with self.assertRaisesMessage(CommandError, 'CACHE_BACKEND'):
+            call_command('archive_requests')
+
+
+class RestoreTests(TransactionTestCase):
+    def test_archived_request_sharing_a_live_number_is_renumbered(self):
+        fields = dict(request_by=uuid.uuid4(), approver_id=uuid.uuid4(), amount=10, currency='MWK', purpose='Fuel')
+        live = Request.objects.create(request_number=12345, **fields)
+        archived = ArchivedRequest.objects.create(request_number=12345, status='Approved', **fields)
+        with self.assertLogs('apps.requests.archive', 'WARNING'):
+            self.assertEqual(archive.restore(), 1)
+        self.assertEqual(Request.objects.get(pk=live.pk).request_number, 12345)
+        self.assertNotEqual(Request.objects.get(pk=archived.pk).request_number, 12345)
+
+
+class TransitionTests(APITestCase):
+    """Approvals and deletions are single conditional writes; when one matches
+    no row, explain_failure() works out why"""
+
+    def url(self, req):
+        return f'/api/requests/{req.id}/'
+
+    def closed(self):
+        return Request.objects.filter(request_by=self.employee.user_id).exclude(status='Pending').first()
+
+    def test_second_decision_loses(self):
+        self.call('patch', self.url(self.pending), self.partner, data={'status': 'Approved'})
+        response = self.call('patch', self.url(self.pending), self.partner, expected=400, data={'status': 'Rejected'})
+        self.assertIn('status "Approved"', response.json()['error'])
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'Approved')
+
+    def test_write_losing_to_a_concurrent_change_is_a_conflict(self):
+        # The UPDATE matched nothing, yet the request reads back as pending
+        with mock.patch.object(QuerySet, 'update', return_value=0):
+            response = self.call('patch', self.url(self.pending), self.partner, expected=409, data={'status': 'Approved'})
+        self.assertEqual(response.json()['error'], 'Request was modified concurrently, please retry')
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'Pending')
+
+    def test_only_the_approver_decides(self):
+        response = self.call('patch', self.url(self.pending), self.other_partner, expected=403, data={'status': 'Approved'})
+        self.assertEqual(response.json()['error'], 'Not authorized to update status')
+
+    def test_only_pending_requests_are_decided(self):
+        closed = self.closed()
+        response = self.call('patch', self.url(closed), self.partner, expected=400, data={'status': 'Approved'})
+        self.assertIn(f'status "{closed.status}"', response.json()['error'])
+
+    def test_delete_pending(self):
+        self.call('delete', self.url(self.pending), self.other_employee, expected=403)
+        self.call('delete', self.url(self.closed()), self.employee, expected=400)
+        self.call('delete', self.url(self.pending), self.employee, expected=204)
+        self.call('delete', self.url(self.pending), self.employee, expected=404)
+
+    def test_explain_failure(self):
+        closed = self.closed()
+        cases = [
+            (uuid.uuid4(), self.employee, 404, 'Request not found'),
+            (self.pending.id, self.other_employee, 403, 'not yours'),
+            (closed.id, self.employee, 400, f'not pending: {closed.status}'),
+            (self.pending.id, self.employee, 409, 'Request was modified concurrently, please retry'),
+        ]
+        for request_id, user, status_code, message in cases:
+            with self.subTest(status_code=status_code):
+                with self.assertRaises(transitions.TransitionError) as raised:
+                    transitions.explain_failure(
+                        request_id, 'request_by', user.user_id,
+                        not_authorized='not yours', not_pending='not pending: {status}',
+                    )
+                self.assertEqual((raised.exception.status_code, raised.exception.message), (status_code, message))
+
+
+class AttachmentBlobTests(TransactionTestCase):
+    """Blobs are shared by hash; deleting one attachment must never remove
+    the bytes of another, however the two interleave"""
+
+    def setUp(self):
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch, ignore_errors=True)
+        override = override_settings(ATTACHMENTS_DIR=scratch)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.request = Request.objects.create(
+            request_by=uuid.uuid4(), approver_id=uuid.uuid4(), amount=10, currency='MWK', purpose='Fuel',
+        )
+
+    def upload(self, content=b'same bytes'):
+        upload = attachments.start_upload(self.request.id, uuid.uuid4(), 'a.txt', len(content))
+        attachments.part_path(upload).write_bytes(content)
+        return upload
+
+    def attach(self, content=b'same bytes'):
+        return attachments.complete_upload(self.upload(content))
+
+    def test_blob_removed_with_its_last_attachment(self):
+        first, second = self.attach(), self.attach()
+        blob = attachments.blob_path(first.sha256)
+        attachments.delete_attachment(first)
+        self.assertEqual(blob.read_bytes(), b'same bytes')
+        attachments.delete_attachment(second)
+        self.assertFalse(blob.exists())
+
+    def test_upload_completing_after_the_last_delete_committed(self):
+        first = self.attach()
+        first.delete()
+        # The delete's blob cleanup has not run yet when the same bytes arrive
+        second = self.attach()
+        attachments.remove_unused_blobs([first.sha256])
+        self.assertEqual(attachments.blob_path(second.sha256).read_bytes(), b'same bytes')
+
+    def test_cleanup_waits_for_an_upload_in_progress(self):
+        first = self.attach()
+        first.delete()
+        cleanup = threading.Thread(target=attachments.remove_unused_blobs, args=([first.sha256],))
+        # As complete_upload(): the blob is in place, its row not yet committed
+        with attachments.blob_lock(first.sha256):
+            cleanup.start()
+            cleanup.join(0.2)
+            self.assertTrue(cleanup.is_alive())
+            Attachment.objects.create(
+                request_id=first.request_id, uploaded_by=first.uploaded_by, filename='b.txt',
+                content_type='text/plain', size=first.size, sha256=first.sha256,
+            )
+        cleanup.join()
+        self.assertTrue(attachments.blob_path(first.sha256).exists())
+
+    def test_upload_completing_after_its_request_was_deleted(self):
+        upload = self.upload()
+        self.request.delete()
+        attachments.delete_for_requests([self.request.id])
+        with self.assertRaises(attachments.AttachmentError) as raised:
+            attachments.complete_upload(upload)
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assertFalse(Attachment.objects.exists())
+        self.assertFalse([path for path in attachments.root().rglob('*') if path.is_file()])
+
+    def test_chunk_for_a_vanished_upload(self):
+        cancelled, deleted = self.upload(), self.upload()
+        attachments.cancel_upload(cancelled)
+        AttachmentUpload.objects.filter(id=deleted.id).delete()
+        for upload in (cancelled, deleted):
+            with self.assertRaises(attachments.AttachmentError) as raised:
+                attachments.append_chunk(upload, io.BytesIO(b'x'), f'bytes 0-0/{upload.size}', 1)
+            self.assertEqual(raised.exception.status_code, 404)
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from apps.notifications import outbox
+from . import attachments, audit, names
+from .models import ArchivedRequest, Request
+
+PENDING = 'Pending'
+
+
+class TransitionError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def explain_failure(request_id, owner_field, user_id, not_authorized, not_pending):
+    """Work out why a conditional write matched no row, with one query, or
+    two when the request is not in the live table.
+
+    Raises the TransitionError matching the checks the write enforced, in the
+    order the views have always reported them: missing, not yours, not pending.
+    """
+    row = (
+        Request.objects.filter(id=request_id).values(owner_field, 'status').first()
+        # Archived requests are closed, so they fail the status check below
+        or ArchivedRequest.objects.filter(id=request_id).values(owner_field, 'status').first()
+    )
+    if row is None:
+        raise TransitionError('Request not found', status.HTTP_404_NOT_FOUND)
+    if str(row[owner_field]) != str(user_id):
+        raise TransitionError(not_authorized, status.HTTP_403_FORBIDDEN)
+    if row['status'] != PENDING:
+        raise TransitionError(not_pending.format(status=row['status']))
+    # Matched every condition now, so it changed between the write and this read
+    raise TransitionError('Request was modified concurrently, please retry', status.HTTP_409_CONFLICT)
+
+
+def set_status(request_id, approver_id, new_status):
+    """Approve or reject a pending request with a single conditional UPDATE,
+    and return the request as updated.
+
+    Two approvers acting at once can no longer both succeed: the second
+    UPDATE finds the request no longer pending and matches nothing. The
+    request is read back and the requester's notification queued in the same
+    transaction, while the UPDATE still holds the row.
+    """
+    with transaction.atomic():
+        updated = Request.objects.filter(id=request_id, approver_id=approver_id, status=PENDING).update(
+            status=new_status, updated_at=timezone.now(),
+        )
+        if not updated:
+            explain_failure(
+                request_id, 'approver_id', approver_id,
+                not_authorized='Not authorized to update status',
+                not_pending='Cannot update status of request with status "{status}". Only pending requests can be approved or rejected.',
+            )
+        req = Request.objects.get(id=request_id)
+        outbox.queue(req, f'request_{new_status.lower()}')
+        audit.record(request_id, 'status', approver_id, {'status': [PENDING, new_status]})
+    return req
+
+
+def edit_pending(request_id, requester_id, changes):
+    """Apply validated field changes to the requester's own pending request"""
+    columns = dict(changes)
+    if 'approver_id' in changes:
+        columns['approver_name'] = names.for_request(requester_id, changes['approver_id'])['approver_name']
+    updated = Request.objects.filter(id=request_id, request_by=requester_id, status=PENDING).update(
+        **columns, updated_at=timezone.now(),
+    )
+    if not updated:
+        explain_failure(
+            request_id, 'request_by', requester_id,
+            not_authorized='Not authorized to edit this request',
+            not_pending='Cannot edit request with status "{status}". Only pending requests can be edited.',
+        )
+    audit.record(request_id, 'edit', requester_id, changes)
+
+
+def delete_pending(request_id, requester_id):
+    """Delete the requester's own pending request with a single conditional DELETE"""
+    deleted, _ = Request.objects.filter(id=request_id, request_by=requester_id, status=PENDING).delete()
+    if not deleted:
+        explain_failure(
+            request_id, 'request_by', requester_id,
+            not_authorized='Not authorized to delete this request',
+            not_pending='Cannot delete request with status "{status}". Only pending requests can be deleted.',
+        )
+    attachments.delete_for_requests([request_id])
+    audit.record(request_id, 'delete', requester_id)
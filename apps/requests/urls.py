@@ -4,5 +4,16 @@ from . import views
 urlpatterns = [
     path('', views.requests_list_create, name='requests_list_create'),
     path('export/', views.export_requests, name='export_requests'),
+    path('export/pack/', views.export_report_pack, name='export_report_pack'),
     path('<uuid:request_id>/', views.request_detail_update, name='request_detail_update'),
+    path('<uuid:request_id>/history/', views.request_history, name='request_history'),
+    path('<uuid:request_id>/attachments/', views.request_attachments, name='request_attachments'),
+    path(
+        '<uuid:request_id>/attachments/uploads/<uuid:upload_id>/',
+        views.attachment_upload, name='attachment_upload',
+    ),
+    path(
+        '<uuid:request_id>/attachments/<uuid:attachment_id>/',
+        views.request_attachment, name='request_attachment',
+    ),
 ]
\ No newline at end of file
@@ -1,15 +1,23 @@
 import math
-from django.db.models import Q, Count
-from django.http import HttpResponse
+from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiResponse
 from drf_spectacular.openapi import OpenApiTypes
 from openpyxl import Workbook
-from .models import Request
-from .serializers import RequestSerializer, RequestCreateSerializer, RequestUpdateSerializer, RequestEditSerializer, RequestListResponseSerializer
-from apps.users.models import User
+from apps.core.idempotency import idempotent
+from apps.core.ratelimit import check_rate_limit, rate_limit
+from apps.core.routers import read_from_replica, replica_reads
+from apps.notifications import outbox
+from . import archive, attachments, audit, names, reports, transitions, workbooks
+from .models import ArchivedRequest, Attachment, AttachmentUpload, Request, RequestAudit
+from .serializers import RequestSerializer, RequestCreateSerializer, RequestUpdateSerializer, RequestEditSerializer, RequestListResponseSerializer, RequestAuditSerializer, AttachmentSerializer, AttachmentUploadStartSerializer, AttachmentUploadSerializer
 
 def get_user_data(request):
     """Helper function to get user_data from request, compatible with both Django and DRF requests"""
@@ -37,6 +45,7 @@ def get_user_data(request):
         OpenApiParameter('page', int, description='Page number for pagination'),
         OpenApiParameter('limit', int, description='Number of items per page'),
         OpenApiParameter('search', str, description='Search in purpose, amount, or user names'),
+        OpenApiParameter('Idempotency-Key', str, location=OpenApiParameter.HEADER, required=False, description='POST only: a retry with the same key replays the first response instead of creating another request'),
     ],
     request=RequestCreateSerializer,
     responses={
@@ -64,6 +73,7 @@ def requests_list_create(request):
     elif request.method == 'POST':
         return create_request(request)
 
+@read_from_replica
 def get_requests(request):
     status_filter = request.query_params.get('status')
     page = int(request.query_params.get('page', 1))
@@ -84,6 +94,11 @@ def get_requests(request):
     
     # Search functionality
     if search:
+        # icontains scans are expensive - charge them against the caller's budget
+        limited = check_rate_limit(request, 'search')
+        if limited is not None:
+            return limited
+        
         search_filters = Q(purpose__icontains=search)
         
         # Amount search
@@ -93,32 +108,28 @@ def get_requests(request):
         except ValueError:
             pass
         
-        # Name search
-        matched_users = User.objects.filter(
-            Q(first_name__icontains=search) | Q(last_name__icontains=search)
-        ).values_list('user_id', flat=True)
-        
-        if matched_users:
-            search_filters |= Q(request_by__in=matched_users) | Q(approver_id__in=matched_users)
+        # Name search, on the names copied onto each request
+        search_filters |= Q(requester_name__icontains=search) | Q(approver_name__icontains=search)
         
         filters &= search_filters
     
-    # Get total count and requests
-    total = Request.objects.filter(filters).count()
-    
-    # Pagination
-    offset = (page - 1) * limit
-    requests = Request.objects.filter(filters)[offset:offset + limit]
+    # Closed requests may have been moved to the archive table
+    include_archive = archive.needs_archive(status_filter)
     
     # Status counts (with role-based access)
-    status_base_filter = Q()
-    if user_data['role'] != 'Partner':
-        status_base_filter = Q(request_by=user_data['id'])
+    status_summary = archive.status_counts(None if user_data['role'] == 'Partner' else user_data['id'])
     
-    status_counts = Request.objects.filter(status_base_filter).values('status').annotate(count=Count('status'))
-    status_summary = {'Pending': 0, 'Approved': 0, 'Rejected': 0}
-    for item in status_counts:
-        status_summary[item['status']] = item['count']
+    # Get total count and requests; without a search the counts already hold the total
+    if search:
+        total = archive.count(filters, include_archive)
+    elif status_filter:
+        total = status_summary.get(status_filter, 0)
+    else:
+        total = sum(status_summary.values())
+    
+    # Pagination - ties on updated_at are broken by id so pages never overlap
+    offset = (page - 1) * limit
+    requests = archive.select(filters, include_archive).order_by('-updated_at', '-id')[offset:offset + limit]
     
     # Serialize requests
     serializer = RequestSerializer(requests, many=True)
@@ -140,10 +151,13 @@ def get_requests(request):
         200: OpenApiResponse(
             response=OpenApiTypes.BINARY,
             description='Excel file download'
-        )
+        ),
+        429: OpenApiResponse(description='Export budget exhausted - retry after the Retry-After header')
     }
 )
 @api_view(['GET'])
+@rate_limit('export_requests')
+@read_from_replica
 def export_requests(request):
     # Only approved requests
     filters = Q(status='Approved')
@@ -153,7 +167,7 @@ def export_requests(request):
     if user_data['role'] != 'Partner':
         filters &= Q(request_by=user_data['id'])
     
-    requests = Request.objects.filter(filters).order_by('-initiated_on')
+    requests = archive.select(filters).order_by('-initiated_on')
     
     # Create workbook
     wb = Workbook()
@@ -161,30 +175,14 @@ def export_requests(request):
     ws.title = 'Approved Requests'
     
     # Headers
-    headers = ['Requested By', 'Amount', 'Approved By', 'Purpose', 'Date']
-    ws.append(headers)
+    ws.append(workbooks.HEADERS)
     
     # Data rows
     for req in requests:
-        try:
-            requester = User.objects.get(user_id=req.request_by)
-            requester_name = f"{requester.first_name} {requester.last_name}"
-        except User.DoesNotExist:
-            requester_name = "Unknown"
-        
-        try:
-            approver = User.objects.get(user_id=req.approver_id)
-            approver_name = f"{approver.first_name} {approver.last_name}"
-        except User.DoesNotExist:
-            approver_name = "Unknown"
-        
-        ws.append([
-            requester_name,
-            f"{req.currency} {req.amount:,.2f}",
-            approver_name,
-            req.purpose,
-            req.initiated_on.strftime('%Y-%m-%d')
-        ])
+        ws.append(workbooks.export_row(
+            req.requester_name or "Unknown", req.currency, req.amount, req.approver_name or "Unknown",
+            req.purpose, req.initiated_on
+        ))
     
     # Create response
     response = HttpResponse(
@@ -195,16 +193,60 @@ def export_requests(request):
     wb.save(response)
     return response
 
+@extend_schema(
+    tags=['Requests'],
+    summary='Export a report pack',
+    description='ZIP archive with one Excel workbook of approved requests per requester, for Partners. The workbooks are built in parallel worker processes and the archive is streamed as they finish. Pass `month` to limit it to requests initiated that month.',
+    parameters=[
+        OpenApiParameter(name='month', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, description='Month to export, as YYYY-MM', required=False)
+    ],
+    responses={
+        (200, 'application/zip'): OpenApiTypes.BINARY,
+        400: OpenApiResponse(description='Invalid month'),
+        403: OpenApiResponse(description='Forbidden - Partners only'),
+        429: OpenApiResponse(description='Export budget exhausted - retry after the Retry-After header')
+    }
+)
+@api_view(['GET'])
+@rate_limit('export_requests')
+def export_report_pack(request):
+    user_data = get_user_data(request)
+    if user_data['role'] != 'Partner':
+        return Response({'error': 'Only Partners can export report packs'}, status=status.HTTP_403_FORBIDDEN)
+    
+    filters = Q(status='Approved')
+    month = request.GET.get('month')
+    if month:
+        try:
+            start = timezone.make_aware(datetime.strptime(month, '%Y-%m'))
+        except ValueError:
+            return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        filters &= Q(initiated_on__gte=start, initiated_on__lt=end)
+    
+    # The body is produced after the view returns, so route its reads here
+    def stream():
+        with replica_reads(request):
+            yield from reports.stream_pack(filters)
+    
+    response = StreamingHttpResponse(stream(), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="approved-requests-{month or "all"}.zip"'
+    return response
+
 @extend_schema(
     tags=['Requests'],
     summary='Get, update, or delete request',
     description='GET: Retrieve detailed information about a specific request. PATCH: Update request status (approvers only) or edit request details (requesters only for pending requests). DELETE: Delete pending requests (requesters only).',
+    parameters=[
+        OpenApiParameter('Idempotency-Key', str, location=OpenApiParameter.HEADER, required=False, description='PATCH only: a retry with the same key replays the first response instead of updating again'),
+    ],
     responses={
         200: RequestSerializer,
         204: OpenApiResponse(description='Request deleted successfully'),
         400: OpenApiResponse(description='Bad request - cannot modify non-pending request'),
         403: OpenApiResponse(description='Forbidden - not authorized'),
-        404: OpenApiResponse(description='Request not found')
+        404: OpenApiResponse(description='Request not found'),
+        409: OpenApiResponse(description='Request was modified concurrently, please retry')
     },
     examples=[
         OpenApiExample(
@@ -235,9 +277,8 @@ def request_detail_update(request, request_id):
         return delete_request(request, request_id)
 
 def get_request_by_id(request, request_id):
-    try:
-        req = Request.objects.get(id=request_id)
-    except Request.DoesNotExist:
+    req = archive.find(request_id)
+    if req is None:
         return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
     
     # Access control
@@ -248,6 +289,7 @@ def get_request_by_id(request, request_id):
     serializer = RequestSerializer(req)
     return Response(serializer.data)
 
+@idempotent
 def create_request(request):
     serializer = RequestCreateSerializer(data=request.data)
     if not serializer.is_valid():
@@ -255,81 +297,278 @@ def create_request(request):
     
     # Create request with current user as requester
     user_data = get_user_data(request)
-    req = serializer.save(request_by=user_data['id'])
+    with transaction.atomic():
+        req = serializer.save(
+            request_by=user_data['id'], **names.for_request(user_data['id'], serializer.validated_data['approver_id'])
+        )
+        # The approver's notification commits with the request or not at all
+        outbox.queue(req, 'request_created')
+        audit.record(req.id, 'create', user_data['id'], serializer.validated_data)
     
     # Return with populated data
     response_serializer = RequestSerializer(req)
     return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
+@idempotent
 def update_request_status(request, request_id):
-    try:
-        req = Request.objects.get(id=request_id)
-    except Request.DoesNotExist:
-        return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Only the approver can update status
-    user_data = get_user_data(request)
-    if user_data['id'] != str(req.approver_id):
-        return Response({'error': 'Not authorized to update status'}, status=status.HTTP_403_FORBIDDEN)
-    
-    serializer = RequestUpdateSerializer(req, data=request.data, partial=True)
+    serializer = RequestUpdateSerializer(data=request.data)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer.save()
+    # Only the approver can update status, and only while it is pending -
+    # checked by the UPDATE itself so concurrent approvers cannot both win
+    user_data = get_user_data(request)
+    try:
+        req = transitions.set_status(request_id, user_data['id'], serializer.validated_data['status'])
+    except transitions.TransitionError as e:
+        return Response({'error': e.message}, status=e.status_code)
     
-    # Return updated request with populated data
+    # Return updated request with populated data, as read in the transition's transaction
     response_serializer = RequestSerializer(req)
     return Response(response_serializer.data)
 
 def edit_request(request, request_id):
     """Edit request details (only for pending requests by the requester)"""
-    try:
-        req = Request.objects.get(id=request_id)
-    except Request.DoesNotExist:
-        return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Only the requester can edit their own request
-    user_data = get_user_data(request)
-    if user_data['id'] != str(req.request_by):
-        return Response({'error': 'Not authorized to edit this request'}, status=status.HTTP_403_FORBIDDEN)
-    
-    # Only pending requests can be edited
-    if req.status != 'Pending':
-        return Response({
-            'error': f'Cannot edit request with status "{req.status}". Only pending requests can be edited.'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Create serializer for editing (allows more fields than status update)
-    serializer = RequestEditSerializer(req, data=request.data, partial=True)
+    serializer = RequestEditSerializer(data=request.data, partial=True)
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer.save()
+    # Only the requester can edit their own pending request
+    user_data = get_user_data(request)
+    try:
+        transitions.edit_pending(request_id, user_data['id'], serializer.validated_data)
+    except transitions.TransitionError as e:
+        return Response({'error': e.message}, status=e.status_code)
     
-    # Return updated request with populated data
+    # Return updated request with populated data; it may have been deleted since
+    req = Request.objects.filter(id=request_id).first()
+    if req is None:
+        return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
     response_serializer = RequestSerializer(req)
     return Response(response_serializer.data)
 
 def delete_request(request, request_id):
     """Delete request (only for pending requests by the requester)"""
+    user_data = get_user_data(request)
     try:
-        req = Request.objects.get(id=request_id)
-    except Request.DoesNotExist:
+        transitions.delete_pending(request_id, user_data['id'])
+    except transitions.TransitionError as e:
+        return Response({'error': e.message}, status=e.status_code)
+    
+    return Response({'message': 'Request deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+@extend_schema(
+    tags=['Requests'],
+    summary='Request history',
+    description='Audit trail of a request: who created it, edited it, changed its status or deleted it, oldest first. Partners and the requester may read it; the history of a deleted request stays readable by Partners. Entries are written in the background and can lag a change by up to AUDIT_FLUSH_MS.',
+    responses={
+        200: RequestAuditSerializer(many=True),
+        403: OpenApiResponse(description='Forbidden - not authorized'),
+        404: OpenApiResponse(description='Request not found')
+    }
+)
+@api_view(['GET'])
+def request_history(request, request_id):
+    user_data = get_user_data(request)
+    entries = RequestAudit.objects.filter(request_id=request_id)
+    
+    req = (
+        Request.objects.filter(id=request_id).values('request_by').first()
+        or ArchivedRequest.objects.filter(id=request_id).values('request_by').first()
+    )
+    if req is None:
+        # Deleted requests keep their history, for Partners only
+        entries = list(entries) if user_data['role'] == 'Partner' else []
+        if not entries:
+            return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
+    elif user_data['role'] != 'Partner' and str(req['request_by']) != user_data['id']:
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = RequestAuditSerializer(entries, many=True)
+    return Response(serializer.data)
+
+def check_request_access(request, request_id):
+    """None if the caller may see the request, else the error Response.
+
+    Same rules as get_request_by_id: Partners and the requester.
+    """
+    req = (
+        Request.objects.filter(id=request_id).values('request_by').first()
+        or ArchivedRequest.objects.filter(id=request_id).values('request_by').first()
+    )
+    if req is None:
         return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
+    user_data = get_user_data(request)
+    if user_data['role'] != 'Partner' and str(req['request_by']) != user_data['id']:
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+def attachment_error(e):
+    body = {'error': e.message}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return Response(body, status=e.status_code)
+
+@extend_schema(
+    methods=['GET'],
+    tags=['Requests'],
+    summary='List attachments',
+    description='Receipts, quotes and other files attached to a request, oldest first. Partners and the requester may read them.',
+    responses={
+        200: AttachmentSerializer(many=True),
+        403: OpenApiResponse(description='Forbidden - not authorized'),
+        404: OpenApiResponse(description='Request not found')
+    }
+)
+@extend_schema(
+    methods=['POST'],
+    tags=['Requests'],
+    summary='Start an attachment upload',
+    description='Announce a file and get an upload id. Then PUT the bytes to `attachments/uploads/{upload_id}/` in chunks of about `chunk_size` bytes, each with a `Content-Range: bytes <start>-<end>/<size>` header. The last chunk returns the attachment.',
+    request=AttachmentUploadStartSerializer,
+    responses={
+        201: AttachmentUploadSerializer,
+        400: OpenApiResponse(description='Bad request - validation errors'),
+        403: OpenApiResponse(description='Forbidden - not authorized'),
+        404: OpenApiResponse(description='Request not found'),
+        413: OpenApiResponse(description='File larger than ATTACHMENT_MAX_SIZE')
+    }
+)
+@api_view(['GET', 'POST'])
+def request_attachments(request, request_id):
+    denied = check_request_access(request, request_id)
+    if denied:
+        return denied
+    
+    if request.method == 'GET':
+        entries = Attachment.objects.filter(request_id=request_id).order_by('created_at')
+        return Response(AttachmentSerializer(entries, many=True).data)
+    
+    serializer = AttachmentUploadStartSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    # Only the requester can delete their own request
     user_data = get_user_data(request)
-    if user_data['id'] != str(req.request_by):
-        return Response({'error': 'Not authorized to delete this request'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        upload = attachments.start_upload(request_id, user_data['id'], **serializer.validated_data)
+    except attachments.AttachmentError as e:
+        return attachment_error(e)
     
-    # Only pending requests can be deleted
-    if req.status != 'Pending':
-        return Response({
-            'error': f'Cannot delete request with status "{req.status}". Only pending requests can be deleted.'
-        }, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'upload_id': upload.id,
+        'offset': 0,
+        'size': upload.size,
+        'chunk_size': settings.ATTACHMENT_CHUNK_SIZE,
+    }, status=status.HTTP_201_CREATED)
+
+@extend_schema(
+    methods=['GET'],
+    tags=['Requests'],
+    summary='Upload progress',
+    description='How many bytes of an unfinished upload have been received, i.e. where to resume.',
+    responses={
+        200: AttachmentUploadSerializer,
+        404: OpenApiResponse(description='Upload not found')
+    }
+)
+@extend_schema(
+    methods=['PUT'],
+    tags=['Requests'],
+    summary='Upload a chunk',
+    description='Send the next chunk as the raw request body with `Content-Range: bytes <start>-<end>/<size>`. The chunk must start at the current offset; otherwise 409 with the offset to resume from. The body is streamed to disk, never held in memory. The final chunk completes the upload and returns the attachment.',
+    request={'application/octet-stream': OpenApiTypes.BINARY},
+    responses={
+        200: AttachmentUploadSerializer,
+        201: AttachmentSerializer,
+        400: OpenApiResponse(description='Bad Content-Range or a chunk cut short; resume from offset'),
+        404: OpenApiResponse(description='Upload not found'),
+        409: OpenApiResponse(description='Chunk does not start at the current offset, or another chunk is in progress')
+    }
+)
+@extend_schema(
+    methods=['DELETE'],
+    tags=['Requests'],
+    summary='Cancel an upload',
+    responses={
+        204: OpenApiResponse(description='Upload cancelled'),
+        404: OpenApiResponse(description='Upload not found')
+    }
+)
+@api_view(['GET', 'PUT', 'DELETE'])
+def attachment_upload(request, request_id, upload_id):
+    # Uploads are private to whoever started them
+    user_data = get_user_data(request)
+    upload = AttachmentUpload.objects.filter(
+        id=upload_id, request_id=request_id, uploaded_by=user_data['id']
+    ).first()
+    if upload is None:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'DELETE':
+        attachments.cancel_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    if request.method == 'PUT':
+        # Read the raw body as a stream; request.data would parse it into memory
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        try:
+            attachments.append_chunk(upload, request.stream, request.META.get('HTTP_CONTENT_RANGE'), content_length)
+            if upload.received == upload.size:
+                attachment = attachments.complete_upload(upload)
+                return Response(AttachmentSerializer(attachment).data, status=status.HTTP_201_CREATED)
+        except attachments.AttachmentError as e:
+            return attachment_error(e)
     
-    # Delete the request
-    req.delete()
+    return Response({
+        'upload_id': upload.id,
+        'offset': upload.received,
+        'size': upload.size,
+        'chunk_size': settings.ATTACHMENT_CHUNK_SIZE,
+    })
+
+@extend_schema(
+    methods=['GET'],
+    tags=['Requests'],
+    summary='Download an attachment',
+    description='The file itself. A single `Range: bytes=<start>-<end>` gets 206 with that part. The body is sent from the file without copying it through Python where the server supports sendfile, or by the front-end server when ATTACHMENT_SENDFILE_HEADER is set.',
+    responses={
+        (200, 'application/octet-stream'): OpenApiTypes.BINARY,
+        (206, 'application/octet-stream'): OpenApiTypes.BINARY,
+        403: OpenApiResponse(description='Forbidden - not authorized'),
+        404: OpenApiResponse(description='Attachment not found'),
+        416: OpenApiResponse(description='Range not satisfiable')
+    }
+)
+@extend_schema(
+    methods=['DELETE'],
+    tags=['Requests'],
+    summary='Delete an attachment',
+    description='Only the user who uploaded it may delete it.',
+    responses={
+        204: OpenApiResponse(description='Attachment deleted'),
+        403: OpenApiResponse(description='Forbidden - not the uploader'),
+        404: OpenApiResponse(description='Attachment not found')
+    }
+)
+@api_view(['GET', 'DELETE'])
+def request_attachment(request, request_id, attachment_id):
+    denied = check_request_access(request, request_id)
+    if denied:
+        return denied
+    attachment = Attachment.objects.filter(id=attachment_id, request_id=request_id).first()
+    if attachment is None:
+        return Response({'error': 'Attachment not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'DELETE':
+        if str(attachment.uploaded_by) != get_user_data(request)['id']:
+            return Response({'error': 'Not authorized to delete this attachment'}, status=status.HTTP_403_FORBIDDEN)
+        attachments.delete_attachment(attachment)
+        return Response(status=status.HTTP_204_NO_CONTENT)
     
-    return Response({'message': 'Request deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    try:
+        return attachments.download_response(attachment, request.META.get('HTTP_RANGE'))
+    except attachments.AttachmentError as e:
+        return attachment_error(e)
@@ -0,0 +1,25 @@
+"""Excel workbooks for request exports.
+
+Free of Django imports, so report pack worker processes can load it without
+setting Django up.
+"""
+import io
+from openpyxl import Workbook
+
+HEADERS = ['Requested By', 'Amount', 'Approved By', 'Purpose', 'Date']
+
+
+def export_row(requester_name, currency, amount, approver_name, purpose, initiated_on):
+    return [requester_name, f"{currency} {amount:,.2f}", approver_name, purpose, initiated_on.strftime('%Y-%m-%d')]
+
+
+def build_workbook(rows, title='Approved Requests'):
+    """An .xlsx file with the export headers and the given rows, as bytes"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(HEADERS)
+    for row in rows:
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
@@ -1,9 +1,20 @@
 from django.contrib import admin
+from django.db import transaction
+from apps.core.admin import LargeTableAdmin
+from apps.requests import names as request_names
 from .models import User
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LargeTableAdmin):
     list_display = ['first_name', 'last_name', 'email', 'role', 'created_at']
-    list_filter = ['role', 'created_at']
-    search_fields = ['first_name', 'last_name', 'email']
-    readonly_fields = ['user_id', 'created_at', 'updated_at']
\ No newline at end of file
+    list_filter = ['role']
+    sortable_by = ['email']
+    # Case-insensitive prefix search, served by the UPPER() indexes
+    search_fields = ['^first_name', '^last_name', '^email']
+    readonly_fields = ['user_id', 'created_at', 'updated_at']
+    
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {'first_name', 'last_name'} & set(form.changed_data):
+            request_names.refresh(obj.user_id, request_names.full_name(obj))
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from apps.requests import archive, attachments, names
+from apps.requests.models import ArchivedRequest, Request
+from .models import User
+
+
+class UserDeletionError(Exception):
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def least_loaded_partner(exclude_user_id):
+    """Partner with the fewest pending approvals, in a single query"""
+    pending = Request.objects.filter(
+        approver_id=OuterRef('user_id'), status='Pending'
+    ).order_by().values('approver_id').annotate(count=Count('id')).values('count')
+
+    return User.objects.filter(role='Partner').exclude(user_id=exclude_user_id).annotate(
+        pending_count=Coalesce(Subquery(pending, output_field=IntegerField()), 0)
+    ).order_by('pending_count', 'id').first()
+
+
+@transaction.atomic
+def delete_user_account(current_user_id, target_user_id, reassign_to=None):
+    """Delete a user, their requests, and hand their pending approvals to a Partner.
+
+    Everything runs in one transaction with a fixed number of set-based
+    statements, so the cost does not grow with the number of requests. Counts
+    come from the affected row counts of the UPDATE and DELETE themselves.
+
+    Raises UserDeletionError when the caller may not delete the target or the
+    requested reassignment is invalid.
+    """
+    current_user_id = str(current_user_id)
+    target_user_id = str(target_user_id)
+
+    users = {
+        str(user.user_id): user
+        for user in User.objects.select_for_update().filter(user_id__in={current_user_id, target_user_id})
+    }
+    current_user = users.get(current_user_id)
+    target_user = users.get(target_user_id)
+
+    if current_user is None:
+        raise UserDeletionError('Current user not found', status.HTTP_404_NOT_FOUND)
+    if target_user is None:
+        raise UserDeletionError('User to delete not found', status.HTTP_404_NOT_FOUND)
+
+    # Authorization checks
+    if target_user_id != current_user_id:
+        # Trying to delete another user - only Partners can do this
+        if current_user.role != 'Partner':
+            raise UserDeletionError('Only Partners can delete other user accounts', status.HTTP_403_FORBIDDEN)
+
+        # Prevent Partners from deleting other Partners (optional safety measure)
+        if target_user.role == 'Partner':
+            raise UserDeletionError('Partners cannot delete other Partner accounts', status.HTTP_403_FORBIDDEN)
+
+    # Pick who inherits the pending approvals
+    if reassign_to:
+        new_approver = User.objects.filter(user_id=reassign_to, role='Partner').exclude(user_id=target_user_id).first()
+        if new_approver is None:
+            raise UserDeletionError('reassign_to must be another Partner', status.HTTP_400_BAD_REQUEST)
+    else:
+        new_approver = least_loaded_partner(target_user_id)
+
+    # Delete the user's own requests first so they are not needlessly reassigned.
+    # The rows go before their attachments: an upload completing meanwhile
+    # either commits first, and its attachment is deleted below, or waits on
+    # the deleted row and finds it gone (attachments.complete_upload)
+    own_request_ids = [
+        request_id for model in (Request, ArchivedRequest)
+        for request_id in model.objects.filter(request_by=target_user_id).values_list('id', flat=True)
+    ]
+    deleted_requests, _ = Request.objects.filter(request_by=target_user_id).delete()
+    deleted_archived, _ = ArchivedRequest.objects.filter(request_by=target_user_id).delete()
+    attachments.delete_for_requests(own_request_ids)
+    if deleted_archived:
+        transaction.on_commit(archive.invalidate)
+        deleted_requests += deleted_archived
+
+    reassigned_approvals = 0
+    orphaned_approvals = 0
+    pending_approvals = Request.objects.filter(approver_id=target_user_id, status='Pending')
+    if new_approver is not None:
+        reassigned_approvals = pending_approvals.update(
+            approver_id=new_approver.user_id, approver_name=names.full_name(new_approver), updated_at=timezone.now()
+        )
+    else:
+        # No other Partner exists to take them over
+        orphaned_approvals = pending_approvals.count()
+
+    # Approvals still naming the user now show them as unknown; their own
+    # requests were deleted above
+    names.refresh(target_user_id, '', requester=False)
+    User.objects.filter(pk=target_user.pk).delete()
+
+    return {
+        'user': target_user,
+        'deleted_requests': deleted_requests,
+        'reassigned_approvals': reassigned_approvals,
+        'orphaned_approvals': orphaned_approvals,
+        'new_approver': new_approver if reassigned_approvals else None,
+    }
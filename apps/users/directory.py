@@ -0,0 +1,133 @@
+import base64
+import binascii
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.utils.http import parse_etags
+from .models import User
+from .serializers import UserSerializer
+
+VERSION_KEY = 'users:directory:version'
+DIRECTORY_FIELDS = UserSerializer.Meta.fields
+
+
+def get_directory_version():
+    """Return the current directory generation, seeding it if the cache was flushed"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed with a timestamp so a flushed version key can never collide with
+        # snapshots still cached under an older generation
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_directory():
+    """Drop every cached directory snapshot by moving to a new generation"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_snapshot(role=None):
+    """Return the serialized directory for a role (or everyone) and its ETag"""
+    key = f"users:directory:{get_directory_version()}:{role or 'all'}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        # Always build from the primary - a snapshot taken from a lagging
+        # replica would stay stale for the whole cache timeout
+        users = User.objects.using(DEFAULT_DB_ALIAS).all()
+        if role:
+            users = users.filter(role=role)
+        data = UserSerializer(users.order_by('id'), many=True).data
+        payload = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        snapshot = {
+            'etag': hashlib.md5(payload).hexdigest(),
+            'data': data,
+        }
+        cache.set(key, snapshot, settings.USER_DIRECTORY_CACHE_TIMEOUT)
+    return snapshot
+
+
+def parse_fields(value):
+    """Parse a ?fields= projection, returning None for all fields.
+
+    Raises ValueError on unknown field names.
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in DIRECTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def project(rows, fields):
+    if fields is None:
+        return rows
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def make_etag(snapshot_etag, fields):
+    if fields is None:
+        return f'"{snapshot_etag}"'
+    digest = hashlib.md5(f"{snapshot_etag}:{','.join(fields)}".encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(etag, if_none_match):
+    """Whether an If-None-Match header lists the ETag (weak comparison)"""
+    etags = parse_etags(if_none_match or '')
+    return '*' in etags or etag in (tag.removeprefix('W/') for tag in etags)
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(str(pk).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into the last seen primary key.
+
+    Raises ValueError on malformed cursors.
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii'))
+    except (binascii.Error, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def get_page(role=None, search='', cursor=None, limit=50, fields=None):
+    """Keyset-paginated directory page ordered by primary key.
+
+    Search is a case-insensitive prefix match on first name, last name and
+    email, served by the UPPER() expression indexes on the users table.
+    """
+    users = User.objects.all()
+    if role:
+        users = users.filter(role=role)
+    if search:
+        users = users.filter(
+            Q(first_name__istartswith=search) |
+            Q(last_name__istartswith=search) |
+            Q(email__istartswith=search)
+        )
+    if cursor:
+        users = users.filter(id__gt=decode_cursor(cursor))
+
+    # Fetch one extra row to know whether there is a next page
+    rows = list(users.order_by('id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    data = project(UserSerializer(rows, many=True).data, fields)
+    return {
+        'limit': limit,
+        'next_cursor': encode_cursor(rows[-1].id) if has_more else None,
+        'data': data,
+    }
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import serializers
+from .models import User
+from .passwords import hash_password
+
+DEFAULT_BATCH_SIZE = 500
+
+# Below this many passwords the cost of starting worker processes outweighs
+# the parallel speed-up, so hashing stays in-process
+PARALLEL_HASH_THRESHOLD = 16
+
+
+class UserImportRowSerializer(serializers.ModelSerializer):
+    """Per-row validation for bulk imports.
+
+    The unique validators on email and phone are dropped because they run one
+    exists() query per row; uniqueness is checked for the whole file at once.
+    """
+    class Meta:
+        model = User
+        fields = ['first_name', 'last_name', 'email', 'phone', 'role', 'password', 'github_username']
+        extra_kwargs = {
+            'password': {'write_only': True},
+            'email': {'validators': []},
+            'phone': {'validators': []},
+        }
+
+
+def parse_rows(content, fmt):
+    """Parse CSV or JSON import content into a list of dicts"""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    if fmt == 'csv':
+        try:
+            return [
+                {key.strip(): (value.strip() if isinstance(value, str) else value)
+                 for key, value in row.items() if key}
+                for row in csv.DictReader(io.StringIO(content))
+            ]
+        except csv.Error as e:
+            raise ValueError(f'Invalid CSV: {e}')
+
+    if fmt == 'json':
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get('users', [])
+        if not isinstance(data, list):
+            raise ValueError('JSON import must be a list of users or {"users": [...]}')
+        return data
+
+    raise ValueError(f'Unsupported import format "{fmt}"')
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash passwords in a process pool, preserving order.
+
+    Every password is hashed, including ones that look like bcrypt hashes:
+    an import cannot plant a hash of its choosing. The workers come from a
+    forkserver that has only imported apps.users.passwords, never forked
+    from a threaded server process, as for report packs.
+    """
+    workers = workers or os.cpu_count() or 1
+    if len(passwords) < PARALLEL_HASH_THRESHOLD or workers == 1:
+        return [hash_password(password) for password in passwords]
+
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['apps.users.passwords'])
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        return list(executor.map(hash_password, passwords, chunksize=chunksize))
+
+
+def import_users(rows, batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """Validate, hash and bulk insert users.
+
+    Rows that fail validation or collide with an existing (or earlier) email or
+    phone are reported in ``errors`` by their 1-based row number; the rest are
+    still imported.
+    """
+    errors = []
+    valid = []
+
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'errors': {'non_field_errors': ['Expected an object']}})
+            continue
+        serializer = UserImportRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            errors.append({'row': number, 'errors': serializer.errors})
+
+    # One set-based query for every email and phone in the file
+    emails = {data['email'] for _, data in valid}
+    phones = {data['phone'] for _, data in valid}
+    taken_emails = set()
+    taken_phones = set()
+    if valid:
+        for email, phone in User.objects.filter(
+            Q(email__in=emails) | Q(phone__in=phones)
+        ).values_list('email', 'phone'):
+            taken_emails.add(email)
+            taken_phones.add(phone)
+
+    pending = []
+    for number, data in valid:
+        if data['email'] in taken_emails:
+            errors.append({'row': number, 'errors': {'email': ['Email already taken']}})
+        elif data['phone'] in taken_phones:
+            errors.append({'row': number, 'errors': {'phone': ['Phone already taken']}})
+        else:
+            # Later rows in the same file must not reuse these either
+            taken_emails.add(data['email'])
+            taken_phones.add(data['phone'])
+            pending.append((number, data))
+
+    hashed = hash_passwords([data['password'] for _, data in pending], workers=workers)
+
+    created = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        users = [
+            User(**{**data, 'password': password})
+            for (_, data), password in zip(batch, hashed[start:start + batch_size])
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            created += len(users)
+        except IntegrityError:
+            # A concurrent signup took one of the values - retry row by row so
+            # only the conflicting rows are reported
+            for (number, _), user in zip(batch, users):
+                try:
+                    with transaction.atomic():
+                        user.save()
+                    created += 1
+                except IntegrityError:
+                    errors.append({'row': number, 'errors': {'non_field_errors': ['Email or phone already taken']}})
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'total': len(rows),
+        'created': created,
+        'failed': len(errors),
+        'errors': errors,
+    }
@@ -0,0 +1,36 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from apps.users import directory, importer
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON file with first_name, last_name, email, phone, role and password')
+        parser.add_argument('--format', choices=['csv', 'json'], help='File format (defaults to the file extension)')
+        parser.add_argument('--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE, help='Rows per bulk insert')
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (defaults to CPU count)')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'File not found: {path}')
+
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        try:
+            rows = importer.parse_rows(path.read_bytes(), fmt)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        result = importer.import_users(rows, batch_size=options['batch_size'], workers=options['workers'])
+        if result['created']:
+            directory.invalidate_directory()
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} of {result['total']} user(s), {result['failed']} failed"
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 17:33
+
+import apps.core.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='users_first_name_upper_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='users_last_name_upper_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='users_email_upper_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('first_name'), name='users_first_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('last_name'), name='users_last_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=apps.core.indexes.PrefixIndex(django.db.models.functions.text.Upper('email'), name='users_email_upper_idx'),
+        ),
+    ]
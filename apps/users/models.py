@@ -1,6 +1,8 @@
 import uuid
 import bcrypt
 from django.db import models
+from django.db.models.functions import Upper
+from apps.core.indexes import PrefixIndex
 
 class User(models.Model):
     ROLE_CHOICES = [
@@ -21,6 +23,12 @@ class User(models.Model):
     
     class Meta:
         db_table = 'users'
+        indexes = [
+            # Back the case-insensitive prefix search on the user directory
+            PrefixIndex(Upper('first_name'), name='users_first_name_upper_idx'),
+            PrefixIndex(Upper('last_name'), name='users_last_name_upper_idx'),
+            PrefixIndex(Upper('email'), name='users_email_upper_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         # Hash password if it's being set/changed and it's not already hashed
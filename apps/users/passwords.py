@@ -0,0 +1,10 @@
+"""bcrypt hashing for bulk imports.
+
+Free of Django imports, so import worker processes can load it without
+setting Django up.
+"""
+import bcrypt
+
+
+def hash_password(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
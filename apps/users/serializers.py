@@ -34,4 +34,14 @@ class UserUpdateSerializer(serializers.Serializer):
     first_name = serializers.CharField(required=False, help_text="User's first name")
     last_name = serializers.CharField(required=False, help_text="User's last name") 
     email = serializers.EmailField(required=False, help_text="User's email address")
-    github_username = serializers.CharField(required=False, allow_blank=True, allow_null=True, help_text="User's GitHub username")
\ No newline at end of file
+    github_username = serializers.CharField(required=False, allow_blank=True, allow_null=True, help_text="User's GitHub username")
+
+class UserImportErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField(help_text="1-based row number in the import")
+    errors = serializers.DictField(help_text="Validation errors for the row")
+
+class UserImportResponseSerializer(serializers.Serializer):
+    total = serializers.IntegerField(help_text="Number of rows received")
+    created = serializers.IntegerField(help_text="Number of users created")
+    failed = serializers.IntegerField(help_text="Number of rows rejected")
+    errors = UserImportErrorSerializer(many=True, help_text="Per-row errors")
\ No newline at end of file
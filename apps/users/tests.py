@@ -0,0 +1,118 @@
+from unittest import mock
+import bcrypt
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import override_settings
+from django.test.client import MULTIPART_CONTENT
+from apps.core.tests import APITestCase, make_user
+from apps.requests.models import Request
+from .models import User
+
+
+def import_row(n, **fields):
+    return {
+        'first_name': 'Imported', 'last_name': f'User{n}', 'email': f'imported{n}@example.com',
+        'phone': f'+2659900000{n:02d}', 'role': 'Employee', 'password': 'password123', **fields,
+    }
+
+
+class ImportTests(APITestCase):
+    def test_hash_like_password_is_hashed(self):
+        planted = bcrypt.hashpw(b'attacker', bcrypt.gensalt()).decode()
+        self.call('post', '/api/users/import/', self.partner, data=[import_row(1, password=planted)])
+        user = User.objects.get(email='imported1@example.com')
+        self.assertNotEqual(user.password, planted)
+        self.assertTrue(user.check_password(planted))
+        self.assertFalse(user.check_password('attacker'))
+
+    def test_malformed_csv_is_a_bad_request(self):
+        content = b'first_name,last_name\n"' + b'x' * 200000 + b'",Test\n'
+        self.call('post', '/api/users/import/', self.partner, expected=400, content_type=MULTIPART_CONTENT,
+                  data={'file': SimpleUploadedFile('users.csv', content)})
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2)
+    def test_row_cap(self):
+        self.call('post', '/api/users/import/', self.partner, expected=400, data=[import_row(n) for n in range(3)])
+        self.assertFalse(User.objects.filter(first_name='Imported').exists())
+
+
+class DeletionTests(APITestCase):
+    """A deleted Partner's pending approvals go to the Partner chosen, or
+    else to the one with the fewest pending approvals"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.idle_partner = make_user(5, 'Partner')
+        Request.objects.create(
+            request_by=cls.employee.user_id, requester_name=str(cls.employee),
+            approver_id=cls.other_partner.user_id, approver_name=str(cls.other_partner),
+            amount=100, currency='MWK', purpose='Fuel', status='Pending',
+        )
+        cls.awaiting = set(Request.objects.filter(approver_id=cls.partner.user_id, status='Pending').values_list('id', flat=True))
+
+    def assertApprover(self, partner):
+        approvers = set(Request.objects.filter(id__in=self.awaiting).values_list('approver_id', 'approver_name'))
+        self.assertEqual(approvers, {(partner.user_id, f'{partner.first_name} {partner.last_name}')})
+
+    def test_approvals_go_to_the_least_loaded_partner(self):
+        result = self.call('delete', '/api/users/delete-account/', self.partner).json()
+        self.assertEqual(result['new_approver_id'], str(self.idle_partner.user_id))
+        self.assertEqual((result['deleted_requests'], result['reassigned_approvals'], result['orphaned_approvals']),
+                         (0, len(self.awaiting), 0))
+        self.assertApprover(self.idle_partner)
+
+    def test_approvals_go_to_the_chosen_partner(self):
+        result = self.call('delete', f'/api/users/delete-account/?reassign_to={self.other_partner.user_id}',
+                           self.partner).json()
+        self.assertEqual(result['new_approver_id'], str(self.other_partner.user_id))
+        self.assertEqual(result['reassigned_approvals'], len(self.awaiting))
+        self.assertApprover(self.other_partner)
+
+    def test_own_requests_are_counted(self):
+        Request.objects.filter(id__in=self.awaiting).update(request_by=self.partner.user_id)
+        result = self.call('delete', '/api/users/delete-account/', self.partner).json()
+        self.assertEqual((result['deleted_requests'], result['reassigned_approvals']), (len(self.awaiting), 0))
+        self.assertIsNone(result['new_approver_id'])
+
+    def test_chosen_partner_must_be_another_partner(self):
+        self.call('delete', f'/api/users/delete-account/?reassign_to={self.employee.user_id}', self.partner, expected=400)
+        self.call('delete', f'/api/users/delete-account/?reassign_to={self.partner.user_id}', self.partner, expected=400)
+
+
+class EditUserTests(APITestCase):
+    def test_rename_is_kept_with_the_names_on_requests(self):
+        self.call('put', '/api/users/edit-user/', self.employee, data={'first_name': 'Renamed'})
+        self.assertEqual(set(Request.objects.filter(request_by=self.employee.user_id).values_list('requester_name', flat=True)),
+                         {'Renamed Test'})
+
+    def test_rename_rolls_back_when_the_names_cannot_follow(self):
+        with mock.patch('apps.requests.names.refresh', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.call('put', '/api/users/edit-user/', self.employee, data={'first_name': 'Renamed'})
+        self.employee.refresh_from_db()
+        self.assertEqual(self.employee.first_name, 'User3')
+
+
+class DirectoryTests(APITestCase):
+    def test_cursor_pages_cover_the_directory_once(self):
+        emails, cursor = [], None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            page = self.call('get', '/api/users/', self.employee, data=params).json()
+            emails += [user['email'] for user in page['data']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(emails, list(User.objects.order_by('id').values_list('email', flat=True)))
+
+    def test_unchanged_directory_is_not_modified(self):
+        etag = self.call('get', '/api/users/', self.employee)['ETag']
+        self.call('get', '/api/users/', self.employee, expected=304, HTTP_IF_NONE_MATCH=f'"stale", W/{etag}')
+        # Only whole ETags match, not a header that merely contains one
+        self.call('get', '/api/users/', self.employee, HTTP_IF_NONE_MATCH=f'"x{etag}"')
+        self.call('get', '/api/users/?fields=email', self.employee, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unknown_role_is_refused(self):
+        self.call('get', '/api/users/?role=Nobody', self.employee, expected=400)
+        self.call('get', '/api/users/?role=Nobody&limit=5', self.employee, expected=400)
+        self.assertEqual(len(self.call('get', '/api/users/?role=Partner', self.employee).json()), 2)
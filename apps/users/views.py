@@ -1,21 +1,36 @@
 import jwt
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiResponse
 from drf_spectacular.openapi import OpenApiParameter
+from apps.core.ratelimit import rate_limit
+from apps.core.routers import read_from_replica
+from apps.requests import names as request_names
+from . import directory, importer
+from .deletion import UserDeletionError, delete_user_account
 from .models import User
 from .serializers import (
     UserSerializer, UserCreateSerializer, LoginSerializer,
     PasswordUpdateSerializer, PasswordResetSerializer, TokenResponseSerializer,
-    MessageResponseSerializer, UserUpdateSerializer
+    MessageResponseSerializer, UserUpdateSerializer, UserImportResponseSerializer
 )
 
+DEFAULT_DIRECTORY_PAGE_SIZE = 50
+MAX_DIRECTORY_PAGE_SIZE = 200
+
 @extend_schema(
     tags=['Users'],
     summary='Get all users',
-    description='Retrieve a list of all users with optional role filtering',
+    description=(
+        'Retrieve the user directory with optional role filtering. Without paging or search '
+        'parameters the full directory is returned from a cached snapshot with an ETag; send '
+        'If-None-Match to get a 304 when it has not changed. Passing search, limit or cursor '
+        'switches to a cursor-paginated response.'
+    ),
     parameters=[
         OpenApiParameter(
             name='role',
@@ -24,8 +39,36 @@ from .serializers import (
             type=str,
             enum=['Employee', 'Partner']
         ),
+        OpenApiParameter(
+            name='search',
+            description='Case-insensitive prefix search on first name, last name or email',
+            required=False,
+            type=str
+        ),
+        OpenApiParameter(
+            name='cursor',
+            description='Cursor returned as next_cursor by the previous page',
+            required=False,
+            type=str
+        ),
+        OpenApiParameter(
+            name='limit',
+            description=f'Page size (max {MAX_DIRECTORY_PAGE_SIZE})',
+            required=False,
+            type=int
+        ),
+        OpenApiParameter(
+            name='fields',
+            description='Comma-separated list of fields to return, e.g. user_id,first_name,last_name',
+            required=False,
+            type=str
+        ),
     ],
-    responses={200: UserSerializer(many=True)},
+    responses={
+        200: UserSerializer(many=True),
+        304: OpenApiResponse(description='Directory unchanged since the ETag sent in If-None-Match'),
+        400: MessageResponseSerializer
+    },
     examples=[
         OpenApiExample(
             'Success Response',
@@ -46,16 +89,43 @@ from .serializers import (
     ]
 )
 @api_view(['GET'])
+@read_from_replica
 def get_users(request):
     role = request.query_params.get('role')
+    search = request.query_params.get('search', '').strip()
+    cursor = request.query_params.get('cursor')
+    limit = request.query_params.get('limit')
     
-    if role:
-        users = User.objects.filter(role=role)
+    roles = [value for value, _ in User.ROLE_CHOICES]
+    if role and role not in roles:
+        return Response({'message': f"role must be one of: {', '.join(roles)}"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        fields = directory.parse_fields(request.query_params.get('fields'))
+    except ValueError as e:
+        return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Paged / search path - served straight from the indexed table
+    if search or cursor or limit:
+        try:
+            limit = min(max(int(limit or DEFAULT_DIRECTORY_PAGE_SIZE), 1), MAX_DIRECTORY_PAGE_SIZE)
+            page = directory.get_page(role=role, search=search, cursor=cursor, limit=limit, fields=fields)
+        except ValueError:
+            return Response({'message': 'Invalid limit or cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page)
+    
+    # Full directory - served from the cached per-role snapshot
+    snapshot = directory.get_snapshot(role)
+    etag = directory.make_etag(snapshot['etag'], fields)
+    
+    if directory.etag_matches(etag, request.headers.get('If-None-Match')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
     else:
-        users = User.objects.all()
+        response = Response(directory.project(snapshot['data'], fields))
     
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 @extend_schema(
     tags=['Authentication'],
@@ -65,7 +135,8 @@ def get_users(request):
     responses={
         200: TokenResponseSerializer,
         400: MessageResponseSerializer,
-        404: MessageResponseSerializer
+        404: MessageResponseSerializer,
+        429: OpenApiResponse(description='Too many login attempts - retry after the Retry-After header')
     },
     examples=[
         OpenApiExample(
@@ -78,6 +149,7 @@ def get_users(request):
     ]
 )
 @api_view(['POST'])
+@rate_limit('login')
 def login(request):
     serializer = LoginSerializer(data=request.data)
     if not serializer.is_valid():
@@ -145,8 +217,66 @@ def signup(request):
         return Response({'message': 'Phone already taken'}, status=status.HTTP_400_BAD_REQUEST)
     
     user = serializer.save()
+    directory.invalidate_directory()
     return Response({'message': "You're all set."})
 
+@extend_schema(
+    tags=['Users'],
+    summary='Bulk import users',
+    description=(
+        'Create many users in one call (Partners only). Send a JSON list of users (or {"users": [...]}), '
+        'or upload a CSV/JSON file in the "file" form field. Email and phone uniqueness is checked for '
+        'the whole batch at once and invalid rows are reported without aborting the import.'
+    ),
+    request=UserCreateSerializer(many=True),
+    responses={
+        200: UserImportResponseSerializer,
+        400: MessageResponseSerializer,
+        401: MessageResponseSerializer,
+        403: MessageResponseSerializer
+    }
+)
+@api_view(['POST'])
+def import_users(request):
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return Response({'message': 'Authorization header missing'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    try:
+        token = auth_header.split(' ')[1]
+        decoded = jwt.decode(token, settings.JWT_SECRET, algorithms=['HS256'])
+        current_user_id = decoded['user_id']
+    except (jwt.InvalidTokenError, IndexError, KeyError):
+        return Response({'message': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
+    
+    if not User.objects.filter(user_id=current_user_id, role='Partner').exists():
+        return Response({'message': 'Only Partners can import users'}, status=status.HTTP_403_FORBIDDEN)
+    
+    upload = request.FILES.get('file')
+    try:
+        if upload:
+            fmt = 'csv' if upload.name.lower().endswith('.csv') else 'json'
+            rows = importer.parse_rows(upload.read(), fmt)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            rows = request.data.get('users', [])
+    except (ValueError, UnicodeDecodeError) as e:
+        return Response({'message': f'Could not parse import file: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not isinstance(rows, list) or not rows:
+        return Response({'message': 'No users to import'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > settings.USER_IMPORT_MAX_ROWS:
+        return Response(
+            {'message': f'At most {settings.USER_IMPORT_MAX_ROWS} users per import; use manage.py import_users for larger files'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    
+    result = importer.import_users(rows)
+    if result['created']:
+        directory.invalidate_directory()
+    return Response(result)
+
 @extend_schema(
     tags=['Users'],
     summary='Update user profile',
@@ -176,6 +306,7 @@ def edit_user(request):
         return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
     
     # Update user information
+    old_name = request_names.full_name(user)
     if 'first_name' in request.data:
         user.first_name = request.data['first_name']
     if 'last_name' in request.data:
@@ -185,7 +316,12 @@ def edit_user(request):
     if 'github_username' in request.data:
         user.github_username = request.data['github_username']
     
-    user.save()
+    # The copied names on the user's requests change with the user or not at all
+    with transaction.atomic():
+        user.save()
+        if request_names.full_name(user) != old_name:
+            request_names.refresh(user.user_id, request_names.full_name(user))
+    directory.invalidate_directory()
     
     # Generate new token
     payload = {
@@ -276,7 +412,20 @@ def reset_password(request):
 @extend_schema(
     tags=['Users'],
     summary='Delete user account',
-    description='Delete user account. Users can delete their own account, Partners can delete any user account. Note: This action is irreversible and will also delete all associated requests.',
+    description=(
+        'Delete user account. Users can delete their own account, Partners can delete any user account. '
+        'Pending requests awaiting the deleted user\'s approval are reassigned to the Partner given in '
+        'reassign_to, or to the Partner with the fewest pending approvals. Runs in a single transaction. '
+        'Note: This action is irreversible and will also delete all associated requests.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='reassign_to',
+            description='user_id of the Partner who takes over pending approvals',
+            required=False,
+            type=str
+        ),
+    ],
     responses={
         200: MessageResponseSerializer,
         401: MessageResponseSerializer,
@@ -307,62 +456,26 @@ def delete_user(request, user_id=None):
         return Response({'message': 'Invalid token'}, status=status.HTTP_401_UNAUTHORIZED)
     
     # Determine which user to delete
-    target_user_id = user_id if user_id else current_user_id
-    
-    # Get current user for authorization checks
-    try:
-        current_user = User.objects.get(user_id=current_user_id)
-    except User.DoesNotExist:
-        return Response({'message': 'Current user not found'}, status=status.HTTP_404_NOT_FOUND)
+    target_user_id = str(user_id) if user_id else current_user_id
     
-    # Get target user to delete
     try:
-        target_user = User.objects.get(user_id=target_user_id)
-    except User.DoesNotExist:
-        return Response({'message': 'User to delete not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    # Authorization checks
-    if target_user_id != current_user_id:
-        # Trying to delete another user - only Partners can do this
-        if current_user.role != 'Partner':
-            return Response({
-                'message': 'Only Partners can delete other user accounts'
-            }, status=status.HTTP_403_FORBIDDEN)
-        
-        # Prevent Partners from deleting other Partners (optional safety measure)
-        if target_user.role == 'Partner' and current_user.role == 'Partner':
-            return Response({
-                'message': 'Partners cannot delete other Partner accounts'
-            }, status=status.HTTP_403_FORBIDDEN)
-    
-    # Check and handle associated requests
-    from apps.requests.models import Request
-    user_requests = Request.objects.filter(request_by=target_user_id)
-    request_count = user_requests.count()
-    
-    # Also check for requests where this user is the approver
-    approver_requests = Request.objects.filter(approver_id=target_user_id, status='Pending')
-    approver_count = approver_requests.count()
-    
-    # Store user info for response
-    deleted_user_name = f"{target_user.first_name} {target_user.last_name}"
-    deleted_user_email = target_user.email
-    
-    # Delete associated requests first (since there's no proper FK cascade)
-    if request_count > 0:
-        user_requests.delete()
+        result = delete_user_account(
+            current_user_id, target_user_id, reassign_to=request.query_params.get('reassign_to')
+        )
+    except UserDeletionError as e:
+        return Response({'message': e.message}, status=e.status_code)
+    except ValidationError:
+        return Response({'message': 'Invalid reassign_to user id'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Handle requests where this user was the approver (set to null or reassign)
-    if approver_count > 0:
-        # For now, we'll leave these requests as orphaned (you might want to reassign them)
-        # In a production system, you'd want to reassign to another Partner
-        pass
+    directory.invalidate_directory()
     
-    # Delete the user
-    target_user.delete()
+    deleted_user = result['user']
+    request_count = result['deleted_requests']
+    reassigned_count = result['reassigned_approvals']
+    orphaned_count = result['orphaned_approvals']
     
     # Prepare response message
-    base_message = f'User account for {deleted_user_name} ({deleted_user_email}) has been deleted successfully'
+    base_message = f'User account for {deleted_user.first_name} {deleted_user.last_name} ({deleted_user.email}) has been deleted successfully'
     if target_user_id == current_user_id:
         base_message = 'Your account has been deleted successfully'
     
@@ -370,7 +483,17 @@ def delete_user(request, user_id=None):
     if request_count > 0:
         base_message += f' along with {request_count} associated request(s)'
     
-    if approver_count > 0:
-        base_message += f' (Note: {approver_count} pending request(s) were left without an approver)'
+    if reassigned_count > 0:
+        new_approver = result['new_approver']
+        base_message += f' ({reassigned_count} pending request(s) were reassigned to {new_approver.first_name} {new_approver.last_name})'
+    
+    if orphaned_count > 0:
+        base_message += f' (Note: {orphaned_count} pending request(s) were left without an approver)'
     
-    return Response({'message': base_message})
\ No newline at end of file
+    return Response({
+        'message': base_message,
+        'deleted_requests': request_count,
+        'reassigned_approvals': reassigned_count,
+        'orphaned_approvals': orphaned_count,
+        'new_approver_id': str(result['new_approver'].user_id) if result['new_approver'] else None,
+    })
\ No newline at end of file
@@ -20,22 +20,34 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'drf_spectacular',
+    'apps.core',
     'apps.users',
     'apps.requests',
+    'apps.notifications',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'apps.core.metrics.MetricsMiddleware',
+    'apps.core.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.core.middleware.CsrfViewMiddleware',
+    'apps.core.middleware.AuthenticationMiddleware',
+    'apps.core.middleware.MessageMiddleware',
+    'apps.core.middleware.XFrameOptionsMiddleware',
     'apps.requests.middleware.JWTAuthenticationMiddleware',
+    'apps.core.middleware.ReplicaStickinessMiddleware',
+    'apps.core.profiling.ProfilingMiddleware',
 ]
 
+# Sessions, CSRF, auth, messages and clickjacking middleware above only run
+# for paths outside API_PATH_PREFIX (the admin and HTML pages); the JWT-only
+# API skips them. Set LEAN_API_MIDDLEWARE=False to run them everywhere.
+LEAN_API_MIDDLEWARE = config('LEAN_API_MIDDLEWARE', default=True, cast=bool)
+API_PATH_PREFIX = '/api/'
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -59,11 +71,44 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # SQLite Database for development
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'apps.core.db.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when an atomic() block starts so concurrent
+            # writers queue on busy_timeout instead of failing mid-transaction
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Applied to every new connection (see apps.core.signals). WAL lets
+        # readers run alongside a writer; NORMAL sync is durable in WAL mode
+        # except for the last commits on power loss.
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': config('SQLITE_MMAP_SIZE', default=268435456, cast=int),
+            # Negative values are in KiB - 64 MiB of page cache per connection
+            'cache_size': config('SQLITE_CACHE_SIZE', default=-65536, cast=int),
+            'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+            'temp_store': 'MEMORY',
+        },
     }
 }
 
+# Optional read replica - point DB_REPLICA_NAME at a second SQLite file to try
+# the replica routing locally
+if config('DB_REPLICA_NAME', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['apps.core.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write
+READ_REPLICA_STICKINESS = config('READ_REPLICA_STICKINESS', default=5, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -101,11 +146,181 @@ CORS_ALLOWED_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'x-api-key',
+    'idempotency-key',
 ]
 
 # JWT settings
 JWT_SECRET = config('JWT_SECRET', default='bintel')
 
+# Cache settings. Gunicorn runs several worker processes, and the user
+# directory, archive counts, replica pins and the 'cache' rate limiter must
+# be seen by all of them - so the default is the database
+# cache, whose table `migrate` creates. Point CACHE_BACKEND at Redis or
+# Memcached to take that load off the database; LocMemCache is only safe
+# with a single process.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config('CACHE_LOCATION', default='cache_table'),
+    }
+}
+
+# Responses to calls carrying an Idempotency-Key are kept in the
+# idempotency_keys table this many seconds for replay; a duplicate arriving
+# while the first is still running gets a 409 until it finishes or
+# IDEMPOTENCY_LOCK_TIMEOUT passes
+IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', default=86400, cast=int)
+IDEMPOTENCY_LOCK_TIMEOUT = config('IDEMPOTENCY_LOCK_TIMEOUT', default=60, cast=int)
+
+# Seconds a cached user directory snapshot lives before being rebuilt
+USER_DIRECTORY_CACHE_TIMEOUT = config('USER_DIRECTORY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Most rows POST /api/users/import/ accepts; every row costs a bcrypt hash
+# inside the request. Larger files go through `manage.py import_users`.
+USER_IMPORT_MAX_ROWS = config('USER_IMPORT_MAX_ROWS', default=1000, cast=int)
+
+# Rate limiting - token buckets per user and per client IP. Each call draws
+# COSTS[scope] tokens (default 1) from a bucket of CAPACITY tokens refilled at
+# REFILL_RATE tokens/second (a cost above CAPACITY fails the system checks,
+# as it could never be paid). Use BACKEND='cache' with a shared CACHE_BACKEND
+# so all workers draw from the same buckets. Behind reverse proxies, set
+# TRUSTED_PROXIES to how many append to X-Forwarded-For (1 on Render);
+# otherwise every caller shares the proxy's address bucket.
+RATE_LIMIT = {
+    'ENABLED': config('RATE_LIMIT_ENABLED', default=True, cast=bool),
+    'BACKEND': config('RATE_LIMIT_BACKEND', default='local'),
+    'CAPACITY': config('RATE_LIMIT_CAPACITY', default=60, cast=int),
+    'REFILL_RATE': config('RATE_LIMIT_REFILL_RATE', default=1.0, cast=float),
+    'COSTS': {
+        'login': config('RATE_LIMIT_COST_LOGIN', default=5, cast=int),
+        'export_requests': config('RATE_LIMIT_COST_EXPORT', default=20, cast=int),
+        'search': config('RATE_LIMIT_COST_SEARCH', default=2, cast=int),
+    },
+    'TRUSTED_PROXIES': config('RATE_LIMIT_TRUSTED_PROXIES', default=0, cast=int),
+}
+
+# Bearer token required to scrape /metrics (open when empty)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Directory where each server process writes its metrics so a scrape of any
+# one of them reports the totals of all; gunicorn.conf.py provides a fresh
+# one per server start. Empty: /metrics covers the serving process only
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=5, cast=float)
+
+# On-demand request profiling (X-Profile: 1). Partners may always profile;
+# PROFILING_SECRET additionally allows it via the X-Profile-Secret header.
+PROFILING_SECRET = config('PROFILING_SECRET', default='')
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILING_MAX_REPORTS = config('PROFILING_MAX_REPORTS', default=50, cast=int)
+
+# Statements slower than SLOW_QUERY_MS are logged as JSON lines with their
+# origin; the first SLOW_QUERY_EXPLAIN_LIMIT of each shape also get a plan.
+# Set SLOW_QUERY_MS to 0 to disable, SLOW_QUERY_LOG_FILE to '' to only log.
+# Past SLOW_QUERY_LOG_MAX_BYTES the file is rotated to <file>.1.
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200, cast=float)
+SLOW_QUERY_EXPLAIN_LIMIT = config('SLOW_QUERY_EXPLAIN_LIMIT', default=3, cast=int)
+SLOW_QUERY_LOG_FILE = config('SLOW_QUERY_LOG_FILE', default=str(BASE_DIR / 'logs' / 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_MAX_BYTES = config('SLOW_QUERY_LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+
+# Query budgets per URL name. A request over its budget, or running one query
+# shape more than QUERY_REPEAT_THRESHOLD times (an N+1), is logged - or raises
+# QueryBudgetExceeded when QUERY_BUDGET_RAISE is on, as in apps/core/tests.py.
+QUERY_BUDGET_ENABLED = config('QUERY_BUDGET_ENABLED', default=True, cast=bool)
+QUERY_BUDGET_RAISE = config('QUERY_BUDGET_RAISE', default=False, cast=bool)
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=20, cast=int)
+QUERY_REPEAT_THRESHOLD = config('QUERY_REPEAT_THRESHOLD', default=5, cast=int)
+QUERY_BUDGETS = {
+    # Writes with an Idempotency-Key: 3 queries on idempotency_keys on top,
+    # and 2 for the notification queued in the same transaction
+    'requests_list_create': 11,
+    'request_detail_update': 10,
+    'export_requests': 6,
+    'export_report_pack': 2,
+    'batch': 2,
+    'request_history': 3,
+    'request_attachments': 3,
+    'attachment_upload': 8,
+    'request_attachment': 7,
+    'get_users': 4,
+    'login': 2,
+    'signup': 5,
+    'edit_user': 7,
+    'update_password': 4,
+    'reset_password': 4,
+    'delete_own_account': 12,
+    'delete_user_by_id': 12,
+}
+
+# Closed requests not updated for ARCHIVE_AFTER_DAYS are moved to the archive
+# table by `manage.py archive_requests`, ARCHIVE_BATCH_SIZE rows per
+# transaction. Archive status counts are cached until the next run, or for
+# ARCHIVE_COUNTS_CACHE_TIMEOUT seconds; the command refuses to run with a
+# LocMemCache, which it could not invalidate for the web workers.
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=180, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=5000, cast=int)
+ARCHIVE_COUNTS_CACHE_TIMEOUT = config('ARCHIVE_COUNTS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Request audit trail. Entries are queued once their transaction commits and
+# written by a background thread in batches of up to AUDIT_BATCH_SIZE, at
+# least every AUDIT_FLUSH_MS. When AUDIT_QUEUE_SIZE entries are waiting, the
+# writer inserts its own entry. AUDIT_ASYNC=False writes inline (tests).
+AUDIT_ASYNC = config('AUDIT_ASYNC', default=True, cast=bool)
+AUDIT_QUEUE_SIZE = config('AUDIT_QUEUE_SIZE', default=10000, cast=int)
+AUDIT_BATCH_SIZE = config('AUDIT_BATCH_SIZE', default=200, cast=int)
+AUDIT_FLUSH_MS = config('AUDIT_FLUSH_MS', default=500, cast=int)
+
+# Request notifications. When enabled, new requests and decisions add an
+# outbox row in the same transaction; `manage.py send_notifications` sends them
+# through NOTIFICATION_BACKEND (ConsoleBackend, FileBackend writing JSON lines
+# to NOTIFICATION_FILE, or EmailBackend using Django's EMAIL_* settings).
+# Failed sends are retried after NOTIFICATION_RETRY_SECONDS, doubling each
+# time, up to NOTIFICATION_MAX_ATTEMPTS.
+NOTIFICATIONS_ENABLED = config('NOTIFICATIONS_ENABLED', default=False, cast=bool)
+NOTIFICATION_BACKEND = config('NOTIFICATION_BACKEND', default='apps.notifications.backends.ConsoleBackend')
+NOTIFICATION_FILE = config('NOTIFICATION_FILE', default=str(BASE_DIR / 'logs' / 'notifications.jsonl'))
+NOTIFICATION_WORKERS = config('NOTIFICATION_WORKERS', default=2, cast=int)
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=50, cast=int)
+NOTIFICATION_POLL_SECONDS = config('NOTIFICATION_POLL_SECONDS', default=2.0, cast=float)
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=5, cast=int)
+NOTIFICATION_RETRY_SECONDS = config('NOTIFICATION_RETRY_SECONDS', default=30, cast=int)
+NOTIFICATION_LEASE_SECONDS = config('NOTIFICATION_LEASE_SECONDS', default=300, cast=int)
+
+# Request attachments live under ATTACHMENTS_DIR: partial uploads in uploads/,
+# finished files once per SHA-256 in blobs/. Clients upload in chunks of about
+# ATTACHMENT_CHUNK_SIZE up to ATTACHMENT_MAX_SIZE bytes; uploads idle for
+# ATTACHMENT_UPLOAD_EXPIRY_HOURS are removed by `manage.py purge_uploads`.
+# Set ATTACHMENT_SENDFILE_HEADER to X-Accel-Redirect (nginx, with an internal
+# location at ATTACHMENT_SENDFILE_PREFIX) or X-Sendfile to let the front-end
+# server send downloads.
+ATTACHMENTS_DIR = config('ATTACHMENTS_DIR', default=str(BASE_DIR / 'media' / 'attachments'))
+ATTACHMENT_MAX_SIZE = config('ATTACHMENT_MAX_SIZE', default=25 * 1024 * 1024, cast=int)
+ATTACHMENT_CHUNK_SIZE = config('ATTACHMENT_CHUNK_SIZE', default=1024 * 1024, cast=int)
+ATTACHMENT_UPLOAD_EXPIRY_HOURS = config('ATTACHMENT_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+ATTACHMENT_SENDFILE_HEADER = config('ATTACHMENT_SENDFILE_HEADER', default='')
+ATTACHMENT_SENDFILE_PREFIX = config('ATTACHMENT_SENDFILE_PREFIX', default='/protected/attachments/')
+
+# Report packs (one workbook per requester, zipped) are built by a pool of
+# REPORT_PACK_WORKERS processes per server process (0 = one per CPU), fed
+# from a query read REPORT_PACK_CHUNK_SIZE rows at a time.
+REPORT_PACK_WORKERS = config('REPORT_PACK_WORKERS', default=0, cast=int)
+REPORT_PACK_CHUNK_SIZE = config('REPORT_PACK_CHUNK_SIZE', default=2000, cast=int)
+
+# Admin changelists on big tables show PostgreSQL's row estimate instead of
+# running COUNT(*) once it reaches ADMIN_EXACT_COUNT_THRESHOLD rows.
+ADMIN_EXACT_COUNT_THRESHOLD = config('ADMIN_EXACT_COUNT_THRESHOLD', default=10000, cast=int)
+
+# POST /api/batch/ runs up to BATCH_MAX_REQUESTS GET sub-requests per call on
+# a pool of BATCH_WORKERS threads per process (1 runs them in turn). Each
+# thread keeps its own database connection, subject to CONN_MAX_AGE.
+BATCH_WORKERS = config('BATCH_WORKERS', default=4, cast=int)
+BATCH_MAX_REQUESTS = config('BATCH_MAX_REQUESTS', default=10, cast=int)
+
+# OpenAPI schema written at build time by
+# `manage.py spectacular --format openapi-json --file <path>`. When unset or
+# missing, /api/schema/ generates it on first request and caches it.
+SCHEMA_FILE = config('SCHEMA_FILE', default='')
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [],
@@ -128,5 +343,6 @@ SPECTACULAR_SETTINGS = {
         {'name': 'Authentication', 'description': 'User authentication endpoints'},
         {'name': 'Users', 'description': 'User management operations'},
         {'name': 'Requests', 'description': 'Request management operations'},
+        {'name': 'System', 'description': 'Operational and diagnostic endpoints'},
     ],
 }
\ No newline at end of file
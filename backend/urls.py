@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+from apps.core.schema import CachedSpectacularAPIView
+from apps.core.views import batch, healthz, metrics, readyz
 
 def home_view(request):
     return JsonResponse({
@@ -17,13 +19,18 @@ def home_view(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', home_view, name='home'),
+    path('metrics', metrics, name='metrics'),
+    path('healthz', healthz, name='healthz'),
+    path('readyz', readyz, name='readyz'),
     
     # API Documentation
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', CachedSpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     
     # API Endpoints
     path('api/users/', include('apps.users.urls')),
     path('api/requests/', include('apps.requests.urls')),
+    path('api/system/', include('apps.core.urls')),
+    path('api/batch/', batch, name='batch'),
 ]
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Production server configuration.
+
+    gunicorn -c gunicorn.conf.py
+
+Gunicorn picks this file up automatically when started from the project
+root. Every value can be overridden from the environment (or .env):
+
+- SERVER_MODE: ``wsgi`` (default, gthread workers) or ``asgi`` (uvicorn workers)
+- PORT: port to bind on 0.0.0.0, default 5100
+- WEB_CONCURRENCY: worker processes, default 2 x CPU cores + 1 (WSGI) or one per core (ASGI)
+- GUNICORN_THREADS: threads per WSGI worker, default 1
+- GUNICORN_MAX_REQUESTS / GUNICORN_MAX_REQUESTS_JITTER: recycle workers after ~N requests
+- GUNICORN_TIMEOUT / GUNICORN_GRACEFUL_TIMEOUT: seconds before a stuck worker is killed, and
+  how long in-flight requests get to finish when a worker is recycled or stopped
+- RUN_MIGRATIONS: apply migrations once in the master before workers fork, default on
+- METRICS_DIR: where workers share their /metrics totals, default a fresh temporary directory
+"""
+import os
+import shutil
+import tempfile
+import decouple
+
+
+def cpu_count():
+    # Honour CPU affinity (containers, taskset) where the platform reports it
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+SERVER_MODE = decouple.config('SERVER_MODE', default='wsgi').lower()
+if SERVER_MODE not in ('wsgi', 'asgi'):
+    raise ValueError(f"SERVER_MODE must be 'wsgi' or 'asgi', not {SERVER_MODE!r}")
+
+bind = f"0.0.0.0:{decouple.config('PORT', default=5100, cast=int)}"
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = decouple.config('WEB_CONCURRENCY', default=cpu_count(), cast=int)
+else:
+    wsgi_app = 'backend.wsgi:application'
+    threads = decouple.config('GUNICORN_THREADS', default=1, cast=int)
+    # gthread even with one thread: its main loop keeps beating while a
+    # request runs, where a sync worker is killed after GUNICORN_TIMEOUT
+    # in the middle of a long download such as a report pack
+    worker_class = 'gthread'
+    workers = decouple.config('WEB_CONCURRENCY', default=cpu_count() * 2 + 1, cast=int)
+
+# Recycle workers to cap slow memory growth; the jitter keeps them from all
+# restarting at once
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=1000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=100, cast=int)
+
+# Load Django once in the master so workers fork with it already imported
+preload_app = True
+
+timeout = decouple.config('GUNICORN_TIMEOUT', default=60, cast=int)
+graceful_timeout = decouple.config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = decouple.config('GUNICORN_KEEPALIVE', default=5, cast=int)
+
+# Each scrape of /metrics lands on one worker; they pool their counts here so
+# it reports the server's totals. Counts start over with the server
+_metrics_dir = None
+if not decouple.config('METRICS_DIR', default=''):
+    _metrics_dir = os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='gunicorn-metrics-')
+
+accesslog = '-'
+errorlog = '-'
+loglevel = decouple.config('GUNICORN_LOG_LEVEL', default='info')
+
+
+def on_starting(server):
+    """Run the system checks and apply migrations once, in the master,
+    before any worker exists"""
+    if not decouple.config('RUN_MIGRATIONS', default=True, cast=bool):
+        return
+    import django
+    from django.core.management import call_command
+    from django.db import connections
+
+    django.setup()
+    server.log.info('Applying migrations')
+    # With the system checks, so misconfiguration stops the server here
+    call_command('migrate', interactive=False, verbosity=1, skip_checks=False)
+    # Workers must not inherit the master's database sockets
+    connections.close_all()
+
+
+
+def on_exit(server):
+    if _metrics_dir:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
@@ -20,10 +20,11 @@ echo "✅ PostgreSQL is up - executing command"
 sleep 5
 
 # Run migrations
-echo "🔄 Running migrations..."
+echo "🔄 Creating migrations..."
 python manage.py makemigrations users --noinput
 python manage.py makemigrations requests --noinput
-python manage.py migrate --noinput
 
-echo "🚀 Starting Django server..."
-exec python manage.py runserver 0.0.0.0:5100
\ No newline at end of file
+# gunicorn applies migrations once in the master before forking workers
+# (see gunicorn.conf.py)
+echo "🚀 Starting gunicorn..."
+exec gunicorn -c gunicorn.conf.py
\ No newline at end of file